@@ -1,329 +1,698 @@
-from flask import Flask, jsonify, request
+import atexit
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import Flask, Response, g, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from game.world import World
-from game.agent import Agent
-from game.logic import get_best_move
+from game.book import BOOK
+from game.history import RECENT_WINDOW
+from game.knowledge import Knowledge
+from game.logic import decide
+from game.metrics import METRICS
+from game.persistence import SnapshotStore
+from game.planner import DEFAULT_BUDGET as DEFAULT_PLAN_BUDGET
+from game.pool import FILTERS as POOL_FILTERS, WorldPool
+from game.probability import cache_stats as hazard_cache_stats
+from game.preview import PreviewSolver
+from game.profiling import PROFILER
+from game.session import GameStore
+from game.speculation import SPECULATOR
+from game.utils import board_labels, pos_to_label
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON encoding, timed as the "json_encode" phase."""
+    def dumps(self, obj, **kwargs):
+        with METRICS.timer("json_encode"):
+            return super().dumps(obj, **kwargs)
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 CORS(app, origins=["http://localhost:3000"])
 
-world = World(size=5)
-agent = Agent(world)
-
-def get_best_move_and_reason(visible_grid, agent_pos):
+def env_limit(name, default, kind=int):
+    """Numeric setting from the environment; 0 means no limit (None)."""
+    value = kind(os.environ.get(name, default))
+    return value or None
+
+# Games are snapshotted to this SQLite file after every move and reloaded
+# on first access after a restart; WUMPUS_DB= (empty) keeps them in memory.
+# Snapshots not saved for WUMPUS_SNAPSHOT_TTL seconds (a week) are deleted.
+SNAPSHOT_DB = os.environ.get("WUMPUS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "games.db"))
+
+# Batch pool workers (see get_batch_pool) import this module as __mp_main__
+# when the server runs as a script. They only run game functions, so they
+# skip the snapshot store and the background board generation.
+IN_WORKER = __name__ == "__mp_main__"
+snapshots = None
+if SNAPSHOT_DB and not IN_WORKER:
+    snapshots = SnapshotStore(SNAPSHOT_DB, max_age=env_limit("WUMPUS_SNAPSHOT_TTL", 7 * 86400, float))
+    atexit.register(snapshots.close)
+
+# One World/Agent pair per client session, no shared game globals. Games
+# idle for WUMPUS_SESSION_TTL seconds, or the least recently used beyond
+# WUMPUS_MAX_SESSIONS, leave memory (see GameStore), idle ones swept out
+# every WUMPUS_SWEEP_INTERVAL seconds; only the WUMPUS_HOT_SESSIONS most
+# recent keep their solver state.
+games = GameStore(
+    size=5,
+    snapshots=snapshots,
+    max_sessions=env_limit("WUMPUS_MAX_SESSIONS", 200000),
+    idle_ttl=env_limit("WUMPUS_SESSION_TTL", 3600, float),
+    hot_sessions=env_limit("WUMPUS_HOT_SESSIONS", 10000),
+    sweep_interval=None if IN_WORKER else env_limit("WUMPUS_SWEEP_INTERVAL", 60, float),
+)
+
+# Boards for /api/init, pre-generated in the background: WUMPUS_POOL_SIZE
+# ready boards per configuration (0 disables the pool), generated at up to
+# WUMPUS_POOL_RATE a second (0: no limit), only those passing
+# WUMPUS_POOL_FILTER ("solvable": gold reachable without a hazard) if set
+world_pool = WorldPool(
+    size=0 if IN_WORKER else int(os.environ.get("WUMPUS_POOL_SIZE", 32)),
+    rate=float(os.environ.get("WUMPUS_POOL_RATE", 200)),
+    filter=POOL_FILTERS.get(os.environ.get("WUMPUS_POOL_FILTER", "")),
+    configs=[(games.size, games.pit_count, games.wumpus_count, games.gold_count)],
+)
+
+# Symmetry-canonicalised memo of preview decisions, shared by all clients
+preview_solver = PreviewSolver(maxsize=4096, ttl=600)
+
+@app.before_request
+def start_request_timer():
+    if METRICS.enabled:
+        g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    # Streaming responses are timed until their first byte is ready
+    start = g.pop("request_start", None)
+    if start is not None:
+        METRICS.observe_request(request.endpoint or "unknown", time.perf_counter() - start)
+    return response
+
+# Shared secret for the admin endpoints and the X-Profile header; when unset
+# they are open, which is fine for the local dev server only
+ADMIN_TOKEN = os.environ.get("WUMPUS_ADMIN_TOKEN")
+
+def is_admin():
+    return not ADMIN_TOKEN or request.headers.get("X-Admin-Token") == ADMIN_TOKEN
+
+@app.before_request
+def start_profile():
+    # 1 in WUMPUS_PROFILE_EVERY requests, or any request sent with X-Profile: 1
+    forced = request.headers.get("X-Profile") == "1" and is_admin()
+    g.profile = PROFILER.start(force=forced)
+
+@app.after_request
+def stop_profile(response):
+    record = PROFILER.stop(g.pop("profile", None), request.endpoint or "unknown")
+    if record is not None:
+        response.headers["X-Profile-Id"] = str(record.id)
+    return response
+
+@app.teardown_request
+def abandon_profile(exc):
+    # after_request is skipped when the handler raised: finish the profile
+    # here so it does not keep every later request from being profiled
+    PROFILER.stop(g.pop("profile", None), request.endpoint or "unknown")
+
+def get_session_id():
+    """
+    Session id sent by the client: X-Session-Id header, ?session_id= query
+    parameter, or "sessionId" in the JSON body.
+    """
+    session_id = request.headers.get("X-Session-Id") or request.args.get("session_id")
+    if not session_id:
+        data = request.get_json(silent=True) or {}
+        session_id = data.get("sessionId")
+    return session_id
+
+def unknown_session():
+    return jsonify({"error": "Unknown or missing session id, call /api/init first"}), 404
+
+def valid_pos(pos, rows, cols):
+    return (
+        isinstance(pos, list) and len(pos) == 2
+        and all(isinstance(v, int) and not isinstance(v, bool) for v in pos)
+        and 0 <= pos[0] < rows and 0 <= pos[1] < cols
+    )
+
+def get_best_move_and_reason(visible_grid, agent_pos, prev_cell=None, knowledge=None):
     """
     Returns (best_move, best_reason) where best_move is [row, col] and best_reason is a string explanation.
+    prev_cell is where the agent came from, used to avoid bouncing back to it.
+    Pass the game's Knowledge to skip rebuilding it from visible_grid.
     """
-    from collections import deque
-
-    rows = len(visible_grid)
-    cols = len(visible_grid[0]) if rows > 0 else 0
-    directions = [(-1,0),(1,0),(0,-1),(0,1),(-1,-1),(-1,1),(1,-1),(1,1)]
-
-    visited = set()
-    safe = set()
-    risky = set()
-    dangerous = set()
-
-    # 1. Mark visited cells
-    for r in range(rows):
-        for c in range(cols):
-            cell = visible_grid[r][c]
-            if cell != "unknown":
-                visited.add((r, c))
-                if cell in ("pit", "wumpus"):
-                    dangerous.add((r, c))
-
-    # 2. Deduce safe/risky/dangerous for unknown cells
-    for r in range(rows):
-        for c in range(cols):
-            if visible_grid[r][c] != "unknown":
-                continue
-            neighbor_percepts = []
-            has_white_neighbor = False
-            all_neighbors_breeze_or_stench = True
-            has_visited_neighbor = False
-            for dr, dc in directions:
-                nr, nc = r + dr, c + dc
-                if 0 <= nr < rows and 0 <= nc < cols and (nr, nc) in visited:
-                    has_visited_neighbor = True
-                    neighbor_cell = visible_grid[nr][nc]
-                    neighbor_percepts.append(neighbor_cell)
-                    if neighbor_cell not in ("pit", "wumpus", "gold") and "breeze" not in neighbor_cell and "stench" not in neighbor_cell:
-                        has_white_neighbor = True
-                    if "breeze" not in neighbor_cell and "stench" not in neighbor_cell:
-                        all_neighbors_breeze_or_stench = False
-            if not has_visited_neighbor:
-                continue
-            if has_white_neighbor:
-                safe.add((r, c))
-            elif all_neighbors_breeze_or_stench:
-                dangerous.add((r, c))
-            elif any("breeze" in n or "stench" in n for n in neighbor_percepts):
-                risky.add((r, c))
-
-    risky = risky - safe - dangerous
-
-    r, c = agent_pos
-    unvisited_neighbors = []
-    visited_neighbors = []
-    for dr, dc in directions:
-        nr, nc = r + dr, c + dc
-        if 0 <= nr < rows and 0 <= nc < cols:
-            if visible_grid[nr][nc] == "unknown":
-                unvisited_neighbors.append((nr, nc))
-            elif (nr, nc) in visited and visible_grid[nr][nc] not in ("pit", "wumpus"):
-                visited_neighbors.append((nr, nc))
-
-    all_unvisited_not_safe = all((nbr not in safe) for nbr in unvisited_neighbors) if unvisited_neighbors else False
-
-    prev_cell = None
-    if hasattr(agent, "move_history") and agent.move_history and len(agent.move_history) > 1:
-        prev_label = agent.move_history[-2][0]
-        cols_labels = ['A', 'B', 'C', 'D', 'E'][:cols]
-        col = cols_labels.index(prev_label[0])
-        row = int(prev_label[1:]) - 1
-        prev_cell = (row, col)
-
-    best_move = None
-    best_reason = ""
-    # Try to explain the logic for the best move
-    if all_unvisited_not_safe and visited_neighbors:
-        if len(visited_neighbors) == 1 and prev_cell and visited_neighbors[0] == prev_cell:
-            all_dangerous = True
-            for dr, dc in directions:
-                nr, nc = r + dr, c + dc
-                if 0 <= nr < rows and 0 <= nc < cols:
-                    cell = visible_grid[nr][nc]
-                    if cell not in ("pit", "wumpus") and (nr, nc) != prev_cell:
-                        all_dangerous = False
-                        break
-            if all_dangerous:
-                best_move = list(prev_cell)
-                best_reason = (
-                    f"All unvisited neighbors are not marked safe and only one visited neighbor exists, "
-                    f"which is the previous cell ({prev_cell}). All other neighbors are dangerous, so the best move is to return to the previous cell."
-                )
-        else:
-            for nbr in visited_neighbors:
-                if prev_cell is None or nbr != prev_cell:
-                    best_move = list(nbr)
-                    best_reason = (
-                        f"All unvisited neighbors are not marked safe. There are multiple visited neighbors. "
-                        f"Choosing a visited neighbor ({nbr}) that is not the previous cell to avoid danger."
-                    )
-                    break
-
-    if best_move is None:
-        # BFS to find shortest path to an unvisited safe cell
-        queue = deque()
-        queue.append((tuple(agent_pos), []))
-        explored = set()
-        while queue:
-            (r0, c0), path = queue.popleft()
-            if (r0, c0) in explored:
-                continue
-            explored.add((r0, c0))
-            if (r0, c0) in safe and visible_grid[r0][c0] == "unknown":
-                if path:
-                    best_move = list(path[0])
-                    best_reason = (
-                        f"Found a path to an unvisited safe cell at {path[-1]}. "
-                        f"The first step towards it is {path[0]}. Safe cells are deduced from neighbors with no breeze or stench."
-                    )
-                else:
-                    best_move = [r0, c0]
-                    best_reason = (
-                        f"Current cell is an unvisited safe cell. Staying in place."
-                    )
-                break
-            for dr, dc in directions:
-                nr, nc = r0 + dr, c0 + dc
-                if 0 <= nr < rows and 0 <= nc < cols:
-                    if (nr, nc) in dangerous:
-                        continue
-                    if (nr, nc) not in explored:
-                        queue.append(((nr, nc), path + [(nr, nc)]))
-
-    if best_move is None:
-        # If no unvisited safe cell, try risky unknown cells (but not definite pits/wumpus)
-        queue = deque()
-        queue.append((tuple(agent_pos), []))
-        explored = set()
-        while queue:
-            (r0, c0), path = queue.popleft()
-            if (r0, c0) in explored:
-                continue
-            explored.add((r0, c0))
-            if (r0, c0) in risky and visible_grid[r0][c0] == "unknown":
-                if path:
-                    best_move = list(path[0])
-                    best_reason = (
-                        f"No unvisited safe cells found. "
-                        f"Found a path to a risky cell at {path[-1]}, which is not definitely dangerous but may have some risk. "
-                        f"The first step towards it is {path[0]}."
-                    )
-                else:
-                    best_move = [r0, c0]
-                    best_reason = (
-                        f"No unvisited safe cells found. Current cell is a risky cell."
-                    )
-                break
-            for dr, dc in directions:
-                nr, nc = r0 + dr, c0 + dc
-                if 0 <= nr < rows and 0 <= nc < cols:
-                    if (nr, nc) in dangerous:
-                        continue
-                    if (nr, nc) not in explored:
-                        queue.append(((nr, nc), path + [(nr, nc)]))
-
-    if best_move is None:
-        best_move = list(agent_pos)
-        best_reason = (
-            f"No safe or risky moves found. Staying in place."
-        )
+    if knowledge is None:
+        knowledge = Knowledge.from_visible_grid(visible_grid)
+    decision = decide(knowledge, agent_pos, prev_cell)
+    return decision.move, decision.reason
 
-    return best_move, best_reason
+MAX_VIEWPORT = 256
 
-def label_from_pos(pos, cols=5):
-    col_labels = ['A', 'B', 'C', 'D', 'E'][:cols]
-    row, col = pos
-    return f"{col_labels[col]}{row+1}"
-
-def build_response(move_reason=""):
-    # Add persistent percepts for all visited cells
-    cell_percepts = {
-        f"{r},{c}": percepts
-        for (r, c), percepts in world.visited_percepts.items()
-    }
-    return {
-        "visible_grid": world.get_visible_grid(),
+def get_viewport():
+    """
+    Board window the client wants to see, as "viewport" {top, left, height,
+    width} in the JSON body or ?viewport=top,left,height,width. None uses
+    the world's default window. Height and width are capped at MAX_VIEWPORT.
+    """
+    data = request.get_json(silent=True) or {}
+    viewport = data.get("viewport")
+    try:
+        if isinstance(viewport, dict):
+            window = [int(viewport[key]) for key in ("top", "left", "height", "width")]
+        elif request.args.get("viewport"):
+            window = [int(v) for v in request.args["viewport"].split(",")]
+        else:
+            return None
+    except (KeyError, TypeError, ValueError):
+        return None
+    if len(window) != 4:
+        return None
+    top, left, height, width = window
+    return top, left, min(height, MAX_VIEWPORT), min(width, MAX_VIEWPORT)
+
+def get_since():
+    """
+    (epoch, state_version) the client already holds, sent as "epoch" and
+    "stateVersion" in the JSON body. None asks for a full snapshot.
+    """
+    data = request.get_json(silent=True) or {}
+    epoch = data.get("epoch")
+    version = data.get("stateVersion")
+    if isinstance(epoch, int) and isinstance(version, int):
+        return epoch, version
+    return None
+
+def build_response(game, move_reason="", since=None, viewport=None):
+    """
+    Full game snapshot, or a delta against `since` (see get_since) when the
+    client's version belongs to the current game: only the cells revealed,
+    percepts gained and history entries added after that version.
+    History is capped to the last RECENT_WINDOW moves, /api/history has
+    the rest.
+    A snapshot's visible_grid and board_labels cover `viewport` (see
+    get_viewport) or the world's default window; "viewport" says which.
+    """
+    world = game.world
+    agent = game.agent
+    response = {
         "agent_pos": agent.pos,
-        "board_labels": {
-            "cols": ['A', 'B', 'C', 'D', 'E'][:world.size],
-            "rows": list(range(1, world.size + 1))
-        },
         "percepts": world.get_percepts(agent.pos),
         "game_over": agent.game_over,
         "move_reason": move_reason,
-        "move_history": agent.move_history,
-        "cell_percepts": cell_percepts  # <-- Add this line
+        "session_id": game.id,
+        "epoch": agent.epoch,
+        "state_version": agent.state_version,
+        "history_total": agent.history.total,
     }
 
+    checkpoint = None
+    if since is not None and since[0] == agent.epoch:
+        checkpoint = agent.checkpoint(since[1])
+    if checkpoint is not None and viewport is None:
+        # The default window follows the agent on large boards: once it has
+        # moved on from the client's, send a full snapshot of the new one
+        moves_made = checkpoint[1]
+        before = agent.history.position(moves_made - 1) if moves_made else (0, 0)
+        if before is None or world.default_window(before) != world.default_window():
+            checkpoint = None
+
+    if checkpoint is None:
+        window = world.clip_window(viewport or world.default_window())
+        top, left, height, width = window
+        with METRICS.timer("visible_grid"):
+            visible_grid = world.get_visible_grid(window)
+        response.update({
+            "delta": False,
+            "board_size": world.size,
+            "viewport": {"top": top, "left": left, "height": height, "width": width},
+            "visible_grid": visible_grid,
+            "board_labels": board_labels(*window),
+            "move_history": agent.history.recent(),
+            # Persistent percepts for all visited cells
+            "cell_percepts": world.cell_percepts(),
+        })
+        return response
+
+    world_version, moves_made = checkpoint
+    revealed = world.revealed(world_version)
+    response.update({
+        "delta": True,
+        "base_version": since[1],
+        "changed_cells": [[r, c, world.get_visible_cell((r, c))] for r, c in revealed],
+        "cell_percepts": world.cell_percepts(revealed),
+        "move_history": agent.history.entries(max(moves_made, agent.history.total - RECENT_WINDOW)),
+    })
+    return response
+
+MAX_BOARD_SIZE = 4096
+# Pits, wumpuses and golds together; placing this many takes about a second
+MAX_PLACED = 65536
+BOARD_PARAMS = {"size": "size", "pits": "pit_count", "wumpus": "wumpus_count", "gold": "gold_count"}
+
+def get_board_config():
+    """
+    Board settings passed to /api/init as ?size=&pits=&wumpus=&gold=, as
+    World keyword arguments. Empty when none was given. Raises ValueError
+    for a setting that is not a valid count.
+    """
+    config = {}
+    for param, key in BOARD_PARAMS.items():
+        value = request.args.get(param)
+        if value is None:
+            continue
+        try:
+            config[key] = int(value)
+        except ValueError:
+            raise ValueError(f"{param} must be an integer")
+        if config[key] < 0:
+            raise ValueError(f"{param} must not be negative")
+    size = config.get("size", games.size)
+    if not 1 <= size <= MAX_BOARD_SIZE:
+        raise ValueError(f"size must be between 1 and {MAX_BOARD_SIZE}")
+    placed = sum(config.get(key, getattr(games, key)) for key in BOARD_PARAMS.values() if key != "size")
+    if placed > size * size - 1:
+        raise ValueError("Too many pits, wumpuses and golds for the board size")
+    if placed > MAX_PLACED:
+        raise ValueError(f"At most {MAX_PLACED} pits, wumpuses and golds in total")
+    return config
+
 @app.route("/api/init", methods=["GET"])
 def init_game():
-    world.reset()
-    agent.reset()
-    
-    # Make sure agent and world track the agent position consistently
-    world.agent_pos = agent.pos  # or use whichever you have
-    
-    return jsonify(build_response(move_reason="Game started"))
+    try:
+        config = get_board_config()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    game = games.get_or_create(get_session_id())
+    with game.lock, METRICS.timer("world_reset"):
+        # Without settings the session replays its current board settings
+        defaults = games if config else game.world
+        board = tuple(config.get(key, getattr(defaults, key)) for key in BOARD_PARAMS.values())
+        world = world_pool.take(board)
+        if world is not None:
+            game.replace_world(world)
+        elif config:
+            # New board settings for this session: a fresh world and agent
+            game.replace_world(games.new_world(**config))
+        else:
+            game.world.reset()
+            game.agent.reset()
 
-@app.route("/api/next-move", methods=["POST"])
-def next_move():
-    if agent.game_over:
-        return jsonify(build_response(move_reason="Game already over"))
+        # Make sure agent and world track the agent position consistently
+        game.world.agent_pos = game.agent.pos
+        games.save(game)
+        SPECULATOR.schedule(game)
 
-    # Save current state for best move calculation
-    visible_grid = world.get_visible_grid()
-    agent_pos = agent.pos.copy()
-    cols = world.size
+        return jsonify(build_response(game, move_reason="Game started", viewport=get_viewport()))
 
-    # Get best move and reason before making the move
-    best_move, best_reason = get_best_move_and_reason(visible_grid, agent_pos)
-    best_move_label = label_from_pos(best_move, cols)
-    best_move_detail = f"Best move at this position: {best_move_label}. Reason: {best_reason}"
+def auto_move(game, plan_budget=None):
+    """
+    Play one auto move for a game whose lock is held and return the
+    explanation text for the response. With a plan_budget (seconds) the
+    move is checked by the rollout planner first.
+    """
+    agent = game.agent
 
-    # Call make_move to update the game state internally
-    move_result = agent.make_move()  # auto move
-
-    # Try to get move_reason if agent.make_move() returns dict or object with 'move_reason'
-    move_reason = ""
-    chosen_move_label = label_from_pos(agent.pos, cols)
-    if isinstance(move_result, dict):
-        move_reason = move_result.get("move_reason", "")
-    elif hasattr(move_result, "move_reason"):
-        move_reason = getattr(move_result, "move_reason", "")
+    # One decision for this state: the auto move and its explanation
+    if plan_budget:
+        decision = agent.plan(plan_budget, executor=get_batch_pool(), workers=BATCH_WORKERS)
     else:
-        move_reason = "Agent performed auto move"
+        decision = SPECULATOR.lookup(game) or agent.decide()
+    best_move = decision.move
+    best_move_label = pos_to_label(best_move)
+
+    # Call make_move to update the game state internally
+    move_reason = agent.make_move(decision=decision)  # auto move
+    games.save(game)
+    chosen_move_label = pos_to_label(agent.pos)
 
     # Compare chosen move to best move
     if agent.pos == best_move:
-        explanation = (
+        return (
             f"Auto-move chosen: {chosen_move_label}. This is the best move according to the agent's knowledge. "
-            f"Reason for best move: {best_reason}"
-        )
-    else:
-        explanation = (
-            f"Auto-move chosen: {chosen_move_label}. This is NOT the best move according to the agent's knowledge. "
-            f"The best move would have been {best_move_label}. "
-            f"Reason for best move: {best_reason}. "
-            f"Reason for chosen move: {move_reason}"
+            f"Reason for best move: {decision.reason}"
         )
+    return (
+        f"Auto-move chosen: {chosen_move_label}. This is NOT the best move according to the agent's knowledge. "
+        f"The best move would have been {best_move_label}. "
+        f"Reason for best move: {decision.reason}. "
+        f"Reason for chosen move: {move_reason}"
+    )
 
-    return jsonify(build_response(move_reason=explanation))
+PLAN_MAX_BUDGET_MS = 2000
 
-@app.route("/api/manual-move", methods=["POST"])
-def manual_move():
-    data = request.get_json()
-    move = data.get("move")
+def get_plan_budget():
+    """
+    Rollout planner budget in seconds: "planBudgetMs" in the JSON body (or
+    "planner": "rollout" for the default), capped at PLAN_MAX_BUDGET_MS.
+    None plays the decision engine's move directly.
+    """
+    data = request.get_json(silent=True) or {}
+    budget_ms = data.get("planBudgetMs")
+    if budget_ms is None:
+        return DEFAULT_PLAN_BUDGET if data.get("planner") == "rollout" else None
+    if not isinstance(budget_ms, (int, float)) or isinstance(budget_ms, bool) or budget_ms <= 0:
+        return None
+    return min(budget_ms, PLAN_MAX_BUDGET_MS) / 1000
 
-    if agent.game_over:
-        return jsonify(build_response(move_reason="Game already over"))
+@app.route("/api/next-move", methods=["POST"])
+def next_move():
+    game = games.get(get_session_id())
+    if game is None:
+        return unknown_session()
 
-    if not move or not isinstance(move, list) or len(move) != 2:
-        return jsonify({"error": "Invalid move format"}), 400
+    with game.lock:
+        agent = game.agent
+        since = get_since()
+        if agent.game_over:
+            return jsonify(build_response(game, move_reason="Game already over", since=since, viewport=get_viewport()))
 
-    # Save current state for best move calculation
-    visible_grid = world.get_visible_grid()
-    agent_pos = agent.pos.copy()
-    cols = world.size
+        explanation = auto_move(game, plan_budget=get_plan_budget())
+        SPECULATOR.schedule(game)
+        return jsonify(build_response(game, move_reason=explanation, since=since, viewport=get_viewport()))
 
-    # Get best move and reason before making the move
-    best_move, best_reason = get_best_move_and_reason(visible_grid, agent_pos)
-    best_move_label = label_from_pos(best_move, cols)
-    best_move_detail = f"Best move at this position: {best_move_label}. Reason: {best_reason}"
+@app.route("/api/manual-move", methods=["POST"])
+def manual_move():
+    game = games.get(get_session_id())
+    if game is None:
+        return unknown_session()
 
-    # Call make_move with manual_pos to update game state
-    move_result = agent.make_move(manual_pos=tuple(move))
+    data = request.get_json(silent=True) or {}
+    move = data.get("move")
 
-    move_reason = ""
-    chosen_move_label = label_from_pos(move, cols)
-    if isinstance(move_result, dict):
-        move_reason = move_result.get("move_reason", "")
-    elif hasattr(move_result, "move_reason"):
-        move_reason = getattr(move_result, "move_reason", "")
-    else:
-        move_reason = f"Agent manually moved to {move}"
+    with game.lock:
+        world = game.world
+        agent = game.agent
+        since = get_since()
+        if agent.game_over:
+            return jsonify(build_response(game, move_reason="Game already over", since=since, viewport=get_viewport()))
+
+        if not valid_pos(move, world.size, world.size):
+            return jsonify({"error": "move must be [row, col] on the board"}), 400
+
+        # Best move for this state, to compare the manual move against
+        decision = SPECULATOR.lookup(game) or agent.decide()
+        best_move = decision.move
+        best_move_label = pos_to_label(best_move)
+
+        # The player overrides the agent: drop its speculation and queue the
+        # decision for wherever the manual move leads
+        SPECULATOR.invalidate(game)
+        move_reason = agent.make_move(manual_pos=tuple(move))
+        games.save(game)
+        SPECULATOR.schedule(game)
+        chosen_move_label = pos_to_label(move)
+
+        # Compare chosen move to best move
+        if list(move) == best_move:
+            explanation = (
+                f"Manual move chosen: {chosen_move_label}. This is the best move according to the agent's knowledge. "
+                f"Reason for best move: {decision.reason}"
+            )
+        else:
+            explanation = (
+                f"Manual move chosen: {chosen_move_label}. This is NOT the best move according to the agent's knowledge. "
+                f"The best move would have been {best_move_label}. "
+                f"Reason for best move: {decision.reason}. "
+                f"Reason for chosen move: {move_reason}"
+            )
 
-    # Compare chosen move to best move
-    if list(move) == best_move:
-        explanation = (
-            f"Manual move chosen: {chosen_move_label}. This is the best move according to the agent's knowledge. "
-            f"Reason for best move: {best_reason}"
-        )
-    else:
-        explanation = (
-            f"Manual move chosen: {chosen_move_label}. This is NOT the best move according to the agent's knowledge. "
-            f"The best move would have been {best_move_label}. "
-            f"Reason for best move: {best_reason}. "
-            f"Reason for chosen move: {move_reason}"
-        )
+        return jsonify(build_response(game, move_reason=explanation, since=since, viewport=get_viewport()))
 
-    return jsonify(build_response(move_reason=explanation))
+HISTORY_PAGE_MAX = 1000
 
-@app.route('/api/preview-best-move', methods=['POST'])
-def preview_best_move():
-    data = request.get_json()
+@app.route("/api/history", methods=["GET"])
+def move_history():
+    """
+    The current game's moves, ?offset= (move number, default 0) and
+    ?limit= (default 100). Moves older than the kept history are dropped,
+    "first_kept" says where it starts; "next_offset" is null on the last page.
+    """
+    game = games.get(get_session_id())
+    if game is None:
+        return unknown_session()
+    try:
+        offset = int(request.args.get("offset", 0))
+        limit = int(request.args.get("limit", 100))
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
+    if offset < 0 or not 0 < limit <= HISTORY_PAGE_MAX:
+        return jsonify({"error": f"offset must be >= 0 and limit 1..{HISTORY_PAGE_MAX}"}), 400
+    with game.lock:
+        page = game.agent.history.page(offset, limit)
+        page["epoch"] = game.agent.epoch
+    return jsonify(page)
+
+AUTOPLAY_MAX_DELAY = 5.0
+AUTOPLAY_MAX_STEPS = 10000
+
+def format_event(event, payload, fmt):
+    data = json.dumps(payload)
+    if fmt == "ndjson":
+        return data + "\n"
+    return f"event: {event}\ndata: {data}\n\n"
+
+@app.route("/api/autoplay", methods=["GET", "POST"])
+def autoplay():
+    """
+    Run the agent on the server until the game ends or max_steps moves
+    were played, streaming every move as a Server-Sent Event ("move"
+    events, then one "done" event) or, with format=ndjson, as one JSON
+    object per line. Each move event is a delta response against the
+    previous move. delay (seconds) paces the stream. The game lock is only
+    held while a move is computed, and a client that disconnects stops the
+    run before its next move.
+    """
+    game = games.get(get_session_id())
+    if game is None:
+        return unknown_session()
+
+    params = dict(request.args)
+    params.update(request.get_json(silent=True) or {})
+    try:
+        max_steps = min(int(params.get("max_steps", AUTOPLAY_MAX_STEPS)), AUTOPLAY_MAX_STEPS)
+        delay = float(params.get("delay", 0))
+        # nan would get through the clamp below and fail time.sleep mid-stream
+        if not math.isfinite(delay):
+            raise ValueError(delay)
+        delay = min(max(delay, 0.0), AUTOPLAY_MAX_DELAY)
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"error": "max_steps must be an integer and delay a finite number"}), 400
+    fmt = "ndjson" if params.get("format") == "ndjson" else "sse"
+
+    def stream():
+        steps = 0
+        with game.lock:
+            epoch = game.agent.epoch
+        try:
+            while steps < max_steps:
+                with game.lock:
+                    agent = game.agent
+                    # Stop if the game was restarted or finished by another request
+                    if agent.epoch != epoch or agent.game_over:
+                        break
+                    since = (agent.epoch, agent.state_version)
+                    explanation = auto_move(game)
+                    payload = build_response(game, move_reason=explanation, since=since)
+                steps += 1
+                payload["step"] = steps
+                yield format_event("move", payload, fmt)
+                if delay and not payload["game_over"]:
+                    time.sleep(delay)
+
+            with game.lock:
+                done = {
+                    "steps": steps,
+                    "game_over": game.agent.game_over,
+                    "agent_pos": game.agent.pos,
+                    "epoch": game.agent.epoch,
+                    "state_version": game.agent.state_version,
+                }
+            yield format_event("done", done, fmt)
+        except GeneratorExit:
+            # Client went away: nothing is held between moves, just stop
+            app.logger.info("autoplay for session %s cancelled after %d moves", game.id, steps)
+            raise
+
+    mimetype = "application/x-ndjson" if fmt == "ndjson" else "text/event-stream"
+    return Response(stream(), mimetype=mimetype, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def preview_item(data):
+    """
+    (visibleGrid, agentPos) of a preview request body or batch item.
+    Raises ValueError with the message for the client if either is invalid.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Item must be an object with visibleGrid and agentPos")
     visible_grid = data.get('visibleGrid')
     agent_pos = data.get('agentPos')
 
     if not visible_grid or not agent_pos:
-        return jsonify({"error": "Missing visibleGrid or agentPos"}), 400
+        raise ValueError("Missing visibleGrid or agentPos")
+    if not isinstance(visible_grid, list) or not all(isinstance(row, list) for row in visible_grid):
+        raise ValueError("visibleGrid must be a list of rows")
+    if not all(isinstance(cell, str) for row in visible_grid for cell in row):
+        raise ValueError("visibleGrid cells must be strings")
+    if not valid_pos(agent_pos, len(visible_grid), len(visible_grid[0])):
+        raise ValueError("agentPos must be [row, col] inside visibleGrid")
+    return visible_grid, agent_pos
+
+@app.route('/api/preview-best-move', methods=['POST'])
+def preview_best_move():
+    try:
+        visible_grid, agent_pos = preview_item(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # A preview of a session's live state is answered by the game itself, so
+    # it always matches the next auto move. Any other state goes through the
+    # shared symmetry-canonical cache, which may break ties between equally
+    # good moves differently.
+    game = games.get(get_session_id())
+    if game is not None:
+        with game.lock:
+            world = game.world
+            agent = game.agent
+            # Clients hold the default window and send it in its own
+            # coordinates; the cheap checks go before the grid comparison
+            window = world.default_window()
+            top, left, height, width = window
+            if (agent_pos == [agent.pos[0] - top, agent.pos[1] - left]
+                    and len(visible_grid) == height and len(visible_grid[0]) == width
+                    and visible_grid == world.get_visible_grid(window)):
+                decision = SPECULATOR.lookup(game) or agent.decide()
+                move = decision.move
+                return jsonify({"best_move": [move[0] - top, move[1] - left], "reason": decision.reason})
+
+    try:
+        decision = preview_solver.decide(visible_grid, agent_pos)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"best_move": decision.move, "reason": decision.reason})
+
+BATCH_MAX_ITEMS = 1000
+BATCH_WORKERS = os.cpu_count() or 1
+batch_pool = None
+
+def get_batch_pool():
+    """
+    Process pool for batch previews and rollouts, started on first use; None
+    on a single CPU. Workers come from a fork server (spawned where there is
+    none) rather than being forked from this multithreaded process, where a
+    child could inherit a lock held by another thread and hang on it.
+    """
+    global batch_pool
+    if batch_pool is None and BATCH_WORKERS > 1:
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            # The server itself loads only the game code the workers run
+            context.set_forkserver_preload(["game.planner", "game.preview"])
+        else:
+            context = multiprocessing.get_context("spawn")
+        batch_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=context)
+    return batch_pool
 
-    best_move, best_reason = get_best_move_and_reason(visible_grid, agent_pos)
-    return jsonify({"best_move": best_move, "reason": best_reason})
+@app.route('/api/preview-best-move/batch', methods=['POST'])
+def preview_best_move_batch():
+    """
+    Evaluate many {visibleGrid, agentPos} items in one request. Returns
+    {"results": [...], "stats": {...}} with one {"best_move", "reason"}
+    or {"error"} per item, in input order.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list):
+        return jsonify({"error": "items must be a list of {visibleGrid, agentPos}"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}), 400
+
+    results = [None] * len(items)
+    valid = []
+    for i, item in enumerate(items):
+        try:
+            valid.append((i, preview_item(item)))
+        except ValueError as e:
+            results[i] = {"error": str(e)}
+
+    decisions, stats = preview_solver.decide_many(
+        [item for _, item in valid], executor=get_batch_pool(), workers=BATCH_WORKERS)
+    for (i, _), decision in zip(valid, decisions):
+        if isinstance(decision, ValueError):
+            results[i] = {"error": str(decision)}
+        else:
+            results[i] = {"best_move": decision.move, "reason": decision.reason}
+    stats["items"] = len(items)
+    stats["errors"] = sum(1 for result in results if "error" in result)
+    return jsonify({"results": results, "stats": stats})
+
+@app.route('/api/preview-best-move/stats', methods=['GET'])
+def preview_cache_stats():
+    return jsonify(preview_solver.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text format: request and phase latencies, decision and outcome counters, cache gauges."""
+    preview = preview_solver.stats()
+    hazards = hazard_cache_stats()
+    opening = BOOK.stats()
+    sessions = games.stats()
+    pool = world_pool.stats()
+    gauges = [
+        ("wumpus_sessions", "Games held in memory.", sessions["sessions"]),
+        ("wumpus_sessions_hot", "Games in memory that hold their solver state.", sessions["hot"]),
+        ("wumpus_sessions_evicted", "Games evicted from memory since startup.", sessions["evictions"]),
+        ("wumpus_preview_cache_entries", "Entries in the preview decision cache.", preview["size"]),
+        ("wumpus_preview_cache_hit_ratio", "Hit ratio of the preview decision cache.", preview["hit_rate"]),
+        ("wumpus_hazard_cache_entries", "Solved frontier components in the hazard cache.", hazards["size"]),
+        ("wumpus_hazard_cache_hit_ratio", "Hit ratio of the hazard component cache.", hazards["hit_rate"]),
+        ("wumpus_opening_book_entries", "States in the opening book, 0 when none is loaded.", opening["entries"]),
+        ("wumpus_opening_book_hit_ratio", "Hit ratio of opening book lookups.", opening["hit_rate"]),
+        ("wumpus_snapshots_pending", "Game snapshots waiting to be written to SQLite.",
+         snapshots.stats()["pending"] if snapshots is not None else 0),
+        ("wumpus_speculation_pending", "Speculative decisions queued or being computed.", SPECULATOR.pending()),
+        ("wumpus_world_pool_ready", "Pre-generated boards ready for /api/init.", pool["ready"]),
+        ("wumpus_world_pool_hit_ratio", "Share of /api/init calls served from the board pool.", pool["hit_rate"]),
+        ("wumpus_world_pool_misses", "/api/init calls that found the board pool empty.", pool["misses"]),
+        ("wumpus_world_pool_rejected", "Generated boards dropped by WUMPUS_POOL_FILTER.", pool["rejected"]),
+        ("wumpus_metrics_enabled", "1 if timers and counters are recording.", int(METRICS.enabled)),
+    ]
+    return Response(METRICS.render(gauges), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/admin/profiles", methods=["GET"])
+def list_profiles():
+    """The kept profiles, oldest first."""
+    if not is_admin():
+        return jsonify({"error": "Admin token required"}), 403
+    return jsonify({"profiles": PROFILER.list(), "every": PROFILER.every})
+
+@app.route("/api/admin/profiles/<int:profile_id>", methods=["GET"])
+def download_profile(profile_id):
+    """
+    One profile: ?format=prof (default) is the binary cProfile dump for
+    pstats/snakeviz, ?format=text the top functions by cumulative time.
+    """
+    if not is_admin():
+        return jsonify({"error": "Admin token required"}), 403
+    record = PROFILER.get(profile_id)
+    if record is None:
+        return jsonify({"error": "No such profile, it may have been dropped from the ring"}), 404
+    fmt = request.args.get("format", "prof")
+    if fmt == "text":
+        return Response(record.text(), mimetype="text/plain")
+    if fmt != "prof":
+        return jsonify({"error": "format must be prof or text"}), 400
+    filename = f"{record.name}-{record.id}.prof"
+    return Response(
+        record.dump(),
+        mimetype="application/octet-stream",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
@@ -0,0 +1,368 @@
+"""
+Benchmarks for the decision path and the endpoints, at several board
+sizes and game stages (moves already played), on seeded boards.
+
+    python benchmark.py                                  # run, print a table
+    python benchmark.py --out run.json                   # also save the results
+    python benchmark.py --save-baseline                  # store as the baseline
+    python benchmark.py --sizes 5 64 --cases make_move   # a subset
+    python benchmark.py --memory                         # bytes per game instead
+
+Every run is compared against the baseline file when there is one; a
+case whose median got slower by more than --threshold is reported as a
+regression and the exit status is 1. Baselines are only comparable on
+the same machine.
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+# Benchmarks keep games in memory only, and run without background work
+# (speculative decisions, board pre-generation) competing with the timings
+os.environ["WUMPUS_DB"] = ""
+os.environ["WUMPUS_SPECULATE"] = "0"
+os.environ["WUMPUS_POOL_SIZE"] = "0"
+
+from game.agent import Agent
+from game.logic import get_best_move
+from game.persistence import decode_game, encode_game
+from game.probability import cache_clear as clear_hazard_cache
+from game.session import GameStore
+from game.world import World
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+
+def board_counts(size):
+    """Pit and wumpus counts at the default game's densities (3 and 1 per 24 free cells)."""
+    free = size * size - 1
+    return round(free * 3 / 24), max(1, round(free / 24))
+
+
+def staged_game(size, stage, seed):
+    """
+    (world, agent) after `stage` auto moves on a seeded board; boards where
+    the game ends sooner are skipped, so every state is still in play.
+    """
+    pits, wumpuses = board_counts(size)
+    for attempt in itertools.count():
+        random.seed(seed * 1000 + attempt)
+        world = World(size=size, pit_count=pits, wumpus_count=wumpuses)
+        agent = Agent(world)
+        while agent.history.total < stage and not agent.game_over:
+            agent.make_move()
+        if not agent.game_over:
+            return world, agent
+
+
+def _restorer(world, agent):
+    # Each call gives a fresh copy of this game state
+    blob = encode_game(world, agent)
+    return lambda: decode_game(blob)
+
+
+# Each case takes (size, stage, seed) and returns (op, reset): op is timed,
+# reset (or None) runs untimed before every op. A case may add a third
+# value, the number of items one op handles; its times are then per item.
+# Unstaged cases only run at stage 0.
+
+def case_get_best_move(size, stage, seed):
+    world, agent = staged_game(size, stage, seed)
+    grid = world.get_visible_grid(world.default_window())
+    top, left = world.default_window()[:2]
+    pos = [agent.pos[0] - top, agent.pos[1] - left]
+    return (lambda: get_best_move(grid, pos)), None
+
+
+def case_get_best_move_and_reason(size, stage, seed):
+    import app
+    world, agent = staged_game(size, stage, seed)
+    grid = world.get_visible_grid(world.default_window())
+    top, left = world.default_window()[:2]
+    pos = [agent.pos[0] - top, agent.pos[1] - left]
+    return (lambda: app.get_best_move_and_reason(grid, pos)), None
+
+
+def case_world_reset(size, stage, seed):
+    random.seed(seed)
+    pits, wumpuses = board_counts(size)
+    world = World(size=size, pit_count=pits, wumpus_count=wumpuses)
+    return world.reset, None
+
+
+def case_get_percepts(size, stage, seed):
+    world, _ = staged_game(size, stage, seed)
+    rng = random.Random(seed)
+    cells = itertools.cycle([(rng.randrange(size), rng.randrange(size)) for _ in range(1024)])
+    return (lambda: world.get_percepts(next(cells))), None
+
+
+def case_get_visible_grid(size, stage, seed):
+    world, _ = staged_game(size, stage, seed)
+    window = world.default_window()
+    return (lambda: world.get_visible_grid(window)), None
+
+
+def case_make_move(size, stage, seed):
+    restore = _restorer(*staged_game(size, stage, seed))
+    state = {}
+
+    def reset():
+        state["agent"] = restore()[1]
+        state["agent"].knowledge   # built untimed, as in a game already in memory
+
+    return (lambda: state["agent"].make_move()), reset
+
+
+def _client(size, stage, seed):
+    import app
+    client = app.app.test_client()
+    session_id = client.get(f"/api/init?size={size}").get_json()["session_id"]
+    game = app.games.get(session_id)
+    restore = _restorer(*staged_game(size, stage, seed))
+
+    def reset():
+        game.world, game.agent = restore()
+
+    return client, {"X-Session-Id": session_id}, reset
+
+
+def case_request_init(size, stage, seed):
+    client, headers, _ = _client(size, 0, seed)
+    return (lambda: client.get(f"/api/init?size={size}", headers=headers)), None
+
+
+def case_request_next_move(size, stage, seed):
+    client, headers, reset = _client(size, stage, seed)
+    return (lambda: client.post("/api/next-move", headers=headers, json={})), reset
+
+
+def case_request_preview(size, stage, seed):
+    client, headers, reset = _client(size, stage, seed)
+    reset()
+    body = client.post("/api/next-move", headers=headers, json={}).get_json()
+    reset()
+    top, left = body["viewport"]["top"], body["viewport"]["left"]
+    payload = {"visibleGrid": body["visible_grid"], "agentPos": [body["agent_pos"][0] - top, body["agent_pos"][1] - left]}
+    return (lambda: client.post("/api/preview-best-move", headers=headers, json=payload)), None
+
+
+PREVIEW_BATCH = 100
+
+
+def preview_items(size, stage, seed, count=PREVIEW_BATCH):
+    """`count` distinct preview payloads: the states from `stage` moves on in seeded games."""
+    items = {}
+    for game_seed in itertools.count(seed * 1000):
+        world, agent = staged_game(size, stage, game_seed)
+        while not agent.game_over and len(items) < count:
+            top, left, height, width = window = world.default_window()
+            grid = world.get_visible_grid(window)
+            pos = [agent.pos[0] - top, agent.pos[1] - left]
+            items[repr((grid, pos))] = {"visibleGrid": grid, "agentPos": pos}
+            agent.make_move()
+        if len(items) >= count:
+            return list(items.values())
+
+
+def case_request_preview_uncached(size, stage, seed):
+    # A preview of a state nobody asked for yet: no session, empty cache
+    import app
+    client = app.app.test_client()
+    items = itertools.cycle(preview_items(size, stage, seed))
+    return (lambda: client.post("/api/preview-best-move", json=next(items))), app.preview_solver.cache.clear
+
+
+def case_request_preview_batch(size, stage, seed):
+    # Timed per item, to compare with request_preview_uncached
+    import app
+    client = app.app.test_client()
+    payload = {"items": preview_items(size, stage, seed)}
+    op = lambda: client.post("/api/preview-best-move/batch", json=payload)
+    return op, app.preview_solver.cache.clear, len(payload["items"])
+
+
+CASES = {
+    "get_best_move": (case_get_best_move, True),
+    "get_best_move_and_reason": (case_get_best_move_and_reason, True),
+    "world_reset": (case_world_reset, False),
+    "get_percepts": (case_get_percepts, True),
+    "get_visible_grid": (case_get_visible_grid, True),
+    "make_move": (case_make_move, True),
+    "request_init": (case_request_init, False),
+    "request_next_move": (case_request_next_move, True),
+    "request_preview": (case_request_preview, True),
+    "request_preview_uncached": (case_request_preview_uncached, True),
+    "request_preview_batch": (case_request_preview_batch, True),
+}
+
+
+def measure(op, reset=None, min_time=0.2, max_samples=10000, min_samples=5):
+    """Per-call times in seconds, sampled until min_time of timed work."""
+    samples = []
+    timed = 0.0
+    while (timed < min_time or len(samples) < min_samples) and len(samples) < max_samples:
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        op()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed)
+        timed += elapsed
+    return samples
+
+
+def run(cases, sizes, stages, seed=0, min_time=0.2, progress=None):
+    results = []
+    for name in cases:
+        prepare, staged = CASES[name]
+        for size in sizes:
+            for stage in (stages if staged else [0]):
+                op, reset, *per_op = prepare(size, stage, seed)
+                items = per_op[0] if per_op else 1
+                samples = [sample / items for sample in measure(op, reset, min_time)]
+                result = {
+                    "case": name,
+                    "size": size,
+                    "stage": stage,
+                    "samples": len(samples),
+                    "median_us": statistics.median(samples) * 1e6,
+                    "min_us": min(samples) * 1e6,
+                    "mean_us": statistics.fmean(samples) * 1e6,
+                }
+                results.append(result)
+                if progress:
+                    progress(result)
+    return results
+
+
+def session_bytes(size, stage, seed=0, count=500):
+    """
+    Bytes per game held by a GameStore (tracemalloc): `count` games after
+    `stage` auto moves, measured hot (knowledge and decision built) and
+    again after GameSession.release(). The process-wide hazard cache is
+    emptied before each reading so only the games are counted.
+    """
+    pits, wumpuses = board_counts(size)
+    store = GameStore(size=size, pit_count=pits, wumpus_count=wumpuses)
+
+    def play(n):
+        played = []
+        for _ in range(n):
+            game = store.create()
+            while game.agent.history.total < stage and not game.agent.game_over:
+                game.agent.make_move()
+            game.agent.decide()
+            played.append(game)
+        return played
+
+    def reading():
+        clear_hazard_cache()
+        gc.collect()   # knowledge holds reference cycles (its path finder's fields)
+        return tracemalloc.get_traced_memory()[0]
+
+    random.seed(seed)
+    tracemalloc.start()
+    try:
+        start = reading()
+        played = play(count)
+        hot = reading()
+        for game in played:
+            game.release()
+        released = reading()
+    finally:
+        tracemalloc.stop()
+    return {"size": size, "stage": stage, "hot_bytes": (hot - start) / count, "released_bytes": (released - start) / count}
+
+
+def compare(results, baseline, threshold):
+    """(result, baseline median) pairs whose median regressed by more than threshold."""
+    previous = {(r["case"], r["size"], r["stage"]): r["median_us"] for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["case"], result["size"], result["stage"]))
+        if before is not None and result["median_us"] > before * (1 + threshold):
+            regressions.append((result, before))
+    return regressions
+
+
+def format_result(result, before=None):
+    line = (
+        f"{result['case']:<26} size={result['size']:<5} stage={result['stage']:<3} "
+        f"median={result['median_us']:>10.1f}us min={result['min_us']:>10.1f}us n={result['samples']}"
+    )
+    if before:
+        line += f"  ({result['median_us'] / before - 1:+.0%} vs baseline)"
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[5, 16, 64, 256])
+    parser.add_argument("--stages", nargs="+", type=int, default=[0, 5, 20],
+                        help="auto moves played before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds of timed work per case")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="slowdown of the median counted as a regression (default 0.25 = 25%%)")
+    parser.add_argument("--memory", action="store_true", help="report bytes per game in memory and exit")
+    args = parser.parse_args(argv)
+
+    if args.memory:
+        for size in args.sizes:
+            for stage in args.stages:
+                row = session_bytes(size, stage, args.seed)
+                print(f"size={size:<5} stage={stage:<3} hot={row['hot_bytes']:>9.0f}B released={row['released_bytes']:>9.0f}B", flush=True)
+        return
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    previous = {}
+    if baseline:
+        previous = {(r["case"], r["size"], r["stage"]): r["median_us"] for r in baseline["results"]}
+
+    results = run(
+        args.cases, args.sizes, args.stages, args.seed, args.min_time,
+        progress=lambda r: print(format_result(r, previous.get((r["case"], r["size"], r["stage"]))), flush=True),
+    )
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "min_time": args.min_time,
+        },
+        "results": results,
+    }
+    for path in filter(None, [args.out, args.baseline if args.save_baseline else None]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {path}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for result, before in regressions:
+                print("  " + format_result(result, before))
+            sys.exit(1)
+        print(f"\nno regressions over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,103 @@
 import random
-from flask import current_app
-from game.logic import get_best_move
+from array import array
+from game import history
+from game.cells import PIT, WUMPUS, GOLD, HAZARD
+from game.knowledge import Knowledge
+from game.logic import decide
+from game.metrics import METRICS
+from game.planner import Planner
+from game.profiling import profiled
 
 class Agent:
+    """
+    Plays one World. The visited cells live in the world's flags; the
+    agent's Knowledge is derived from them and can be dropped with
+    release() while the game is idle, then is rebuilt on next use.
+    """
+    __slots__ = (
+        "world", "pos", "game_over", "history", "planner", "epoch", "state_version",
+        "_checkpoints", "_knowledge", "_decision",
+    )
+
     def __init__(self, world):
         self.world = world
         self.pos = [0, 0]
-        self.visited = set()
-        self.visited.add(tuple(self.pos))
         self.game_over = False
-        self.move_history = []
+        self.history = history.MoveHistory()
+        self.planner = None
+        self.epoch = 0
+        self._reset_versions()
+        self.release()
+
+    @classmethod
+    def restore(cls, world, pos, game_over, move_history, epoch):
+        """
+        Agent for a restored World (see game.persistence). Its epoch moves
+        on past `epoch`, so clients get a full snapshot before any delta.
+        """
+        agent = cls.__new__(cls)
+        agent.world = world
+        agent.pos = list(pos)
+        world.agent_pos = agent.pos
+        agent.game_over = game_over
+        agent.history = move_history
+        agent.planner = None
+        agent.epoch = epoch
+        agent._reset_versions()
+        agent.release()
+        return agent
+
+    def _reset_versions(self):
+        # state_version counts state changes within one game (epoch). Each
+        # version remembers how far the reveal log and the history had grown,
+        # which is all a delta response needs: stored flat, two numbers per
+        # version.
+        self.epoch += 1
+        self.state_version = 0
+        self._checkpoints = array("I", (self.world.version, self.history.total))
+
+    def _bump_version(self):
+        self.state_version += 1
+        self._checkpoints.extend((self.world.version, self.history.total))
+
+    def checkpoint(self, state_version):
+        """(world version, moves made) at state_version, None if unknown."""
+        if 0 <= state_version <= self.state_version:
+            return tuple(self._checkpoints[2 * state_version:2 * state_version + 2])
+        return None
+
+    @property
+    def knowledge(self):
+        """
+        Deductions about the board, updated incrementally in make_move as
+        cells are revealed. Rebuilt from the world's reveal log, in reveal
+        order, after release().
+        """
+        if self._knowledge is None:
+            world = self.world
+            knowledge = Knowledge(world.size, pit_count=world.pit_count, wumpus_count=world.wumpus_count)
+            for pos in world.revealed():
+                knowledge.reveal(pos, world.get_visible_flags(pos))
+            self._knowledge = knowledge
+        return self._knowledge
+
+    def release(self):
+        """Drop the state derived from the world (knowledge, memoised decision, planner)."""
+        self._knowledge = None
+        self._decision = None
+        self.planner = None
 
     def get_percepts(self, pos):
         return self.world.get_percepts(pos)
     
     def reset(self):
         self.pos = [0, 0]
-        self.visited = set()
-        self.visited.add(tuple(self.pos))
         self.game_over = False
-        self.move_history = []
+        self.history.clear()
+        self.world.reset_visits()
         self.world.agent_pos = self.pos
-        self.world.visited = set()
-        self.world.visited.add(tuple(self.pos))
-        # Sync all agent's visited cells to world's visited_percepts
-        self.world.visited_percepts = {}
-        for pos in self.visited:
-            self.world.visited_percepts[pos] = self.world.get_percepts(pos)
+        self._reset_versions()
+        self.release()
 
     def _is_adjacent(self, pos1, pos2):
         r1, c1 = pos1
@@ -35,7 +106,6 @@ class Agent:
 
     def choose_best_move(self):
         r, c = self.pos
-        visible_grid = self.world.get_visible_grid()
 
         directions = [
             (r-1, c), (r+1, c), (r, c-1), (r, c+1),
@@ -47,10 +117,9 @@ class Agent:
         visited_safe = []
 
         for nr, nc in valid_moves:
-            cell = visible_grid[nr][nc]
-            if cell in ["pit", "wumpus"]:
+            if self.knowledge.flags_at((nr, nc)) & HAZARD:
                 continue  # dangerous
-            if (nr, nc) not in self.visited:
+            if not self.world.is_visited((nr, nc)):
                 unvisited_safe.append((nr, nc))
             else:
                 visited_safe.append((nr, nc))
@@ -64,77 +133,91 @@ class Agent:
         else:
             return None, "No safe or known options available."
 
-    def make_move(self, manual_pos=None):
+    def previous_cell(self):
+        """Cell the agent was on before its last move, None early in the game."""
+        return self.history.position(-2)
+
+    def decide(self):
+        """
+        Best move from the current state, as a logic.Decision. Memoised until
+        the state changes, so a preview followed by an auto move solves once.
+        """
+        prev_cell = self.previous_cell()
+        key = (self.world.version, tuple(self.pos), prev_cell)
+        if self._decision is None or self._decision[0] != key:
+            self._decision = (key, decide(self.knowledge, self.pos, prev_cell))
+        return self._decision[1]
+
+    def plan(self, budget=None, executor=None, workers=1):
+        """
+        Like decide(), but checked by the rollout planner (game.planner)
+        within `budget` seconds. The planner keeps its sampled boards for
+        the next move of this game.
+        """
+        if self.planner is None:
+            self.planner = Planner()
+        return self.planner.decide(
+            self.knowledge, self.pos, self.previous_cell(), self.decide(),
+            executor=executor, budget=budget, workers=workers, gold_count=self.world.gold_count,
+        )
+
+    @profiled("make_move")
+    def make_move(self, manual_pos=None, decision=None):
+        """
+        Apply a manual move, or an auto move. An auto move uses `decision`
+        when the caller already computed it for this state. Returns the
+        move's explanation; responses are built from the new state by
+        whoever needs one (app.build_response).
+        """
         if self.game_over:
-            return self._build_response("Game over.")
+            return "Game over."
 
         if manual_pos:
             # Validate manual move
             if not (0 <= manual_pos[0] < self.world.size and 0 <= manual_pos[1] < self.world.size):
-                return self._build_response("Invalid manual move: out of bounds.")
+                return "Invalid manual move: out of bounds."
             
             if not self._is_adjacent(self.pos, manual_pos):
-                return self._build_response("Invalid manual move: must move to a neighboring cell.")
+                return "Invalid manual move: must move to a neighboring cell."
             
             next_pos = manual_pos
-            reason = f"Manual move to {self._pos_to_label(next_pos)}."
+            code = history.MANUAL
         else:
             # Always use the backend's best move logic for auto-move
-            visible_grid = self.world.get_visible_grid()
-            agent_pos = self.pos
-            best_move = get_best_move(visible_grid, agent_pos)
-            if not best_move or best_move == list(agent_pos):
+            if decision is None:
+                decision = self.decide()
+            best_move = decision.move
+            if not best_move or best_move == list(self.pos):
                 self.game_over = True
-                return self._build_response("No safe moves left. Game over.")
+                METRICS.count_decision(decision.category)
+                METRICS.count_outcome("stuck")
+                self._bump_version()
+                return "No safe moves left. Game over."
+            METRICS.count_decision(decision.category)
             next_pos = tuple(best_move)
-            reason = f"Auto-move chosen to {self._pos_to_label(next_pos)}. Reason: Used best move logic from backend."
+            code = history.AUTO
 
         self.pos = list(next_pos)
-        self.visited.add(tuple(self.pos))
         self.world.agent_pos = self.pos
-        self.world.visited.add(tuple(self.pos))
-
-        cell = self.world.grid[self.pos[0]][self.pos[1]]
-        percepts = self.world.get_percepts(self.pos)
+        cell = self.world.visit(self.pos)
+        if self._knowledge is not None:
+            self._knowledge.reveal(self.pos, self.world.get_visible_flags(self.pos))
 
-        if cell == "pit":
+        if cell & PIT:
             self.game_over = True
-            reason += " Fell into a pit. 💀"
-        elif cell == "wumpus":
+            code |= history.PIT
+            METRICS.count_outcome("pit")
+        elif cell & WUMPUS:
             self.game_over = True
-            reason += " Eaten by the Wumpus! 🐉"
-        elif cell == "gold":
+            code |= history.WUMPUS
+            METRICS.count_outcome("wumpus")
+        elif cell & GOLD:
             self.game_over = True
-            reason += " Found the gold! 🏆"
-
-        # Store move label + reason in history for readability
-        self.move_history.append((self._pos_to_label(self.pos), reason))
-
-        return self._build_response(reason)
-
-    def _build_response(self, reason):
-        # Sync all agent's visited cells to world's visited_percepts
-        for pos in self.visited:
-            self.world.visited_percepts[pos] = self.world.get_percepts(pos)
-        string_cell_percepts = {f"{r},{c}": percepts for (r, c), percepts in self.world.visited_percepts.items()}
-        return {
-            "visible_grid": self.world.get_visible_grid(),
-            "agent_pos": self.pos,
-            "percepts": self.world.get_percepts(self.pos),
-            "move_reason": reason,
-            "game_over": self.game_over,
-            "move_history": self.move_history,
-            "board_labels": self._generate_board_labels(),
-            "cell_percepts": string_cell_percepts
-        }
-
-    def _generate_board_labels(self):
-        cols = ['A', 'B', 'C', 'D', 'E'][:self.world.size]
-        rows = list(range(1, self.world.size + 1))
-        return {'cols': cols, 'rows': rows}
-
-    def _pos_to_label(self, pos):
-        cols = ['A', 'B', 'C', 'D', 'E'][:self.world.size]
-        row_label = str(pos[0] + 1)
-        col_label = cols[pos[1]]
-        return f"{col_label}{row_label}"
+            code |= history.GOLD
+            METRICS.count_outcome("win")
+
+        # Position + reason code only, the text is rendered when read
+        self.history.append(self.pos, code)
+        self._bump_version()
+
+        return history.render_reason(self.pos, code)
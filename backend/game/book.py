@@ -0,0 +1,174 @@
+"""
+Opening book: precomputed decisions for the first moves of one board
+configuration (the default 5x5 game with 3 pits and 1 wumpus), built
+offline by game.build_book.
+
+The file is an open-addressing hash table of fixed-size records and is
+memory-mapped on first use, so loading it parses nothing but the header
+and a lookup reads one or two records:
+
+    header   MAGIC, then rows, cols, pit_count, wumpus_count, max_visited,
+             entries, slots
+    record   visited, breeze, stench masks (bit i = row-major cell i),
+             agent cell, step cell, category code, target cell, risk
+
+A state is keyed by which cells are visited and which of them show a
+breeze or stench, plus the agent's cell. The way back (prev_cell) is not
+part of the key: it only tells a return from a backtrack, which is
+decided again on lookup.
+"""
+import math
+import mmap
+import os
+import struct
+import threading
+
+from game.cells import BREEZE, STENCH, CONTENT
+
+MAGIC = b"WUMPBOOK"
+HEADER = struct.Struct("<8sHHHHIII")
+RECORD = struct.Struct("<IIIBBBBd")
+
+# Category codes in a record
+STUCK = 0
+SAFE = 1
+RISKY = 2
+VIA_VISITED = 3   # a return or backtrack, depending on prev_cell
+NO_CELL = 255
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "data", "opening_5x5.book")
+
+
+def state_key(knowledge, agent_pos):
+    """(visited, breeze, stench, agent) of a board of at most 32 cells, None if not bookable."""
+    cols = knowledge.cols
+    visited = breeze = stench = 0
+    for pos in knowledge.visited:
+        flags = knowledge.flags_at(pos)
+        if flags & CONTENT:
+            return None
+        bit = 1 << (pos[0] * cols + pos[1])
+        visited |= bit
+        if flags & BREEZE:
+            breeze |= bit
+        if flags & STENCH:
+            stench |= bit
+    return visited, breeze, stench, agent_pos[0] * cols + agent_pos[1]
+
+
+def _slot(key, slots):
+    visited, breeze, stench, agent = key
+    h = (visited * 0x9E3779B1) ^ (breeze * 0x85EBCA77) ^ (stench * 0xC2B2AE3D) ^ (agent * 0x27D4EB2F)
+    return (h ^ (h >> 29)) % slots
+
+
+def write_book(path, entries, rows, cols, pit_count, wumpus_count, max_visited):
+    """
+    Write a book file. `entries` maps state_key() tuples to
+    (step, code, target, risk) with cells as row-major indexes (target
+    may be None, risk may be None).
+    """
+    slots = max(1, 2 * len(entries))   # load factor 1/2 keeps probes short
+    table = bytearray(HEADER.size + slots * RECORD.size)
+    HEADER.pack_into(table, 0, MAGIC, rows, cols, pit_count, wumpus_count, max_visited, len(entries), slots)
+    used = bytearray(slots)
+    for key, (step, code, target, risk) in entries.items():
+        i = _slot(key, slots)
+        while used[i]:
+            i = (i + 1) % slots
+        used[i] = 1
+        RECORD.pack_into(
+            table, HEADER.size + i * RECORD.size, *key, step, code,
+            NO_CELL if target is None else target, math.nan if risk is None else risk,
+        )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(table)
+
+
+class OpeningBook:
+    """Read-only view of a book file, mapped lazily on the first lookup."""
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._map = None
+        self._config = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        with self._lock:
+            if self._config is not None:
+                return
+            try:
+                with open(self.path, "rb") as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                self._config = ()   # no book: every lookup misses
+                return
+            magic, *config = HEADER.unpack_from(data, 0)
+            if magic != MAGIC:
+                data.close()
+                self._config = ()
+                return
+            self._map = data
+            self._config = tuple(config)
+
+    def matches(self, knowledge):
+        """True when the book was built for this knowledge's board and counts."""
+        if self._config is None:
+            self._load()
+        if not self._config:
+            return False
+        rows, cols, pit_count, wumpus_count, max_visited, _, _ = self._config
+        return (
+            knowledge.rows == rows and knowledge.cols == cols
+            and knowledge.pit_count == pit_count and knowledge.wumpus_count == wumpus_count
+            and len(knowledge.visited) <= max_visited
+        )
+
+    def lookup(self, knowledge, agent_pos):
+        """
+        (step, code, target, risk) for this state with cells as (row, col),
+        or None when the book does not cover it.
+        """
+        if not self.matches(knowledge):
+            return None
+        key = state_key(knowledge, agent_pos)
+        if key is None:
+            return None
+        slots = self._config[-1]
+        cols = knowledge.cols
+        i = _slot(key, slots)
+        while True:
+            record = RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+            if not record[0]:
+                self.misses += 1
+                return None
+            if record[:4] == key:
+                break
+            i = (i + 1) % slots
+        self.hits += 1
+        _, _, _, _, step, code, target, risk = record
+        return (
+            divmod(step, cols),
+            code,
+            None if target == NO_CELL else divmod(target, cols),
+            None if math.isnan(risk) else risk,
+        )
+
+    def stats(self):
+        if self._config is None:
+            self._load()
+        lookups = self.hits + self.misses
+        return {
+            "loaded": bool(self._config),
+            "entries": self._config[-2] if self._config else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# WUMPUS_OPENING_BOOK= (empty) turns the book off
+BOOK = OpeningBook(os.environ.get("WUMPUS_OPENING_BOOK", DEFAULT_PATH))
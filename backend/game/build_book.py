@@ -0,0 +1,101 @@
+"""
+Offline builder for the opening book read by game.book.
+
+Walks every knowledge state the agent can reach in its first `depth`
+moves of the given configuration: from each state it plays the decision
+engine's move and, when that move enters a new cell, branches on every
+percept the cell could show (none, breeze, stench, both) that the pit and
+wumpus counts can still explain. Moves that end the game are not
+followed.
+
+    python -m game.build_book --depth 8
+    python -m game.build_book --depth 6 --out /tmp/openings.book
+"""
+import argparse
+import time
+
+from game import book
+from game.cells import BREEZE, STENCH, VISITED
+from game.knowledge import Knowledge
+from game.logic import BACKTRACK, RETURN, RISKY, SAFE, STUCK, decide
+from game.probability import hazard_probabilities
+
+CODES = {SAFE: book.SAFE, RISKY: book.RISKY, RETURN: book.VIA_VISITED, BACKTRACK: book.VIA_VISITED, STUCK: book.STUCK}
+
+PERCEPT_OUTCOMES = (0, BREEZE, STENCH, BREEZE | STENCH)
+
+
+def _knowledge(size, pit_count, wumpus_count, revealed):
+    knowledge = Knowledge(size, pit_count=pit_count, wumpus_count=wumpus_count)
+    for pos, flags in revealed:
+        knowledge.reveal(pos, flags)
+    return knowledge
+
+
+def enumerate_states(depth, size=5, pit_count=3, wumpus_count=1):
+    """
+    {state_key: (step, code, target, risk)} for every state reachable in
+    at most `depth` moves, cells as row-major indexes.
+    """
+    entries = {}
+    # A state is the revealed cells (in reveal order) plus the agent's cell
+    level = [((((0, 0), VISITED | flags),), (0, 0)) for flags in PERCEPT_OUTCOMES]
+    for move in range(depth + 1):
+        next_level = []
+        for revealed, agent_pos in level:
+            knowledge = _knowledge(size, pit_count, wumpus_count, revealed)
+            if hazard_probabilities(knowledge) is None:
+                continue   # no board of this configuration looks like this
+            key = book.state_key(knowledge, agent_pos)
+            if key in entries:
+                continue
+            decision = decide(knowledge, agent_pos)
+            target = decision.target
+            entries[key] = (
+                decision.move[0] * size + decision.move[1],
+                CODES[decision.category],
+                None if target is None else target[0] * size + target[1],
+                decision.trace.get("risk"),
+            )
+            if move == depth or decision.category == STUCK:
+                continue
+            step = tuple(decision.move)
+            if step in knowledge.visited:
+                next_level.append((revealed, step))
+                continue
+            for flags in PERCEPT_OUTCOMES:
+                next_level.append((revealed + ((step, VISITED | flags),), step))
+        level = next_level
+    return entries
+
+
+def build(path=book.DEFAULT_PATH, depth=8, size=5, pit_count=3, wumpus_count=1):
+    """Enumerate the opening states and write them to `path`. Returns the entry count."""
+    # Solve every state from scratch, not from an older book
+    saved, book.BOOK = book.BOOK, book.OpeningBook("")
+    try:
+        entries = enumerate_states(depth, size, pit_count, wumpus_count)
+    finally:
+        book.BOOK = saved
+    book.write_book(path, entries, size, size, pit_count, wumpus_count, max_visited=depth + 1)
+    return len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=8, help="moves covered from the start (default 8)")
+    parser.add_argument("--out", default=book.DEFAULT_PATH, help="book file to write")
+    parser.add_argument("--size", type=int, default=5)
+    parser.add_argument("--pits", type=int, default=3)
+    parser.add_argument("--wumpus", type=int, default=1)
+    args = parser.parse_args(argv)
+    if args.size * args.size > 32:
+        parser.error("the book format holds boards of at most 32 cells")
+
+    start = time.perf_counter()
+    count = build(args.out, args.depth, args.size, args.pits, args.wumpus)
+    print(f"{count} states to depth {args.depth} written to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Compact integer encoding of cells. Boards store these flags in bytearrays
+(CellGrid chunks, or row-major r * cols + c); the string forms ("pit",
+"breeze+stench", "unknown", ...) are only produced at the JSON boundary.
+"""
+from functools import lru_cache
+
+PIT = 1
+WUMPUS = 2
+GOLD = 4
+BREEZE = 8
+STENCH = 16
+VISITED = 32
+
+HAZARD = PIT | WUMPUS
+CONTENT = PIT | WUMPUS | GOLD
+PERCEPTS = BREEZE | STENCH
+
+CONTENT_NAMES = ((PIT, "pit"), (WUMPUS, "wumpus"), (GOLD, "gold"))
+PERCEPT_NAMES = ((BREEZE, "breeze"), (STENCH, "stench"))
+
+_NAME_FLAGS = {"pit": PIT, "wumpus": WUMPUS, "gold": GOLD, "breeze": BREEZE, "stench": STENCH}
+
+
+def content_name(flags):
+    """Actual content of a cell: "pit", "wumpus", "gold" or "empty"."""
+    for flag, name in CONTENT_NAMES:
+        if flags & flag:
+            return name
+    return "empty"
+
+
+def percept_names(flags):
+    """Percept flags as a list of names, e.g. ["breeze", "stench"]."""
+    return [name for flag, name in PERCEPT_NAMES if flags & flag]
+
+
+def _visible_name(flags):
+    if not flags & VISITED:
+        return "unknown"
+    if flags & CONTENT:
+        return content_name(flags)
+    names = percept_names(flags)
+    return "+".join(names) if names else "empty"
+
+
+# Visible flags fit in 6 bits, so every display string is precomputed
+VISIBLE_NAMES = tuple(_visible_name(flags) for flags in range(64))
+
+
+def visible_name(flags):
+    """Display string of a visible cell, e.g. "unknown", "pit", "breeze+stench"."""
+    return VISIBLE_NAMES[flags]
+
+
+def encode_visible(cell):
+    """Parse a display string from a client's visible grid back into flags."""
+    if cell == "unknown":
+        return 0
+    flags = VISITED
+    for part in cell.split("+"):
+        flags |= _NAME_FLAGS.get(part, 0)
+    return flags
+
+
+@lru_cache(maxsize=None)
+def _clear_table(flags):
+    # bytes.translate table that clears `flags` in every byte
+    return bytes(i & ~flags for i in range(256))
+
+
+class CellGrid:
+    """
+    Sparse rows x cols grid of cell flags. Cells live in square bytearray
+    chunks that are only allocated when something non-zero is written to
+    them, so memory follows the hazards and explored area rather than the
+    board area. Small boards fit in a single chunk.
+    """
+    CHUNK = 32
+    __slots__ = ("rows", "cols", "chunk", "_chunks", "__weakref__")
+
+    def __init__(self, rows, cols=None):
+        self.rows = rows
+        self.cols = rows if cols is None else cols
+        self.chunk = min(self.CHUNK, max(self.rows, self.cols, 1))
+        self._chunks = {}
+
+    @classmethod
+    def from_dense(cls, rows, cols, data):
+        """
+        Grid over a row-major buffer of rows * cols flag bytes (bytes,
+        bytearray or a memoryview, e.g. of a NumPy slice). A board that fits
+        in one chunk wraps a writable buffer without copying it; larger
+        boards copy the non-empty chunks.
+        """
+        grid = cls(rows, cols)
+        k = grid.chunk
+        if rows <= k and cols <= k and rows * cols == k * k:
+            grid._chunks[(0, 0)] = data if isinstance(data, (bytearray, memoryview)) else bytearray(data)
+            return grid
+        for r in range(rows):
+            row = data[r * cols:(r + 1) * cols]
+            if not any(row):
+                continue
+            for c, flags in enumerate(row):
+                if flags:
+                    grid.set(r, c, flags)
+        return grid
+
+    def get(self, r, c):
+        k = self.chunk
+        chunk = self._chunks.get((r // k, c // k))
+        if chunk is None:
+            return 0
+        return chunk[(r % k) * k + c % k]
+
+    def _chunk_for_write(self, r, c):
+        k = self.chunk
+        key = (r // k, c // k)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = self._chunks[key] = bytearray(k * k)
+        return chunk, (r % k) * k + c % k
+
+    def set(self, r, c, flags):
+        if not flags and (r // self.chunk, c // self.chunk) not in self._chunks:
+            return
+        chunk, i = self._chunk_for_write(r, c)
+        chunk[i] = flags
+
+    def add(self, r, c, flags):
+        """OR flags into a cell."""
+        chunk, i = self._chunk_for_write(r, c)
+        chunk[i] |= flags
+
+    def clear(self, flags):
+        """Clear flags in every cell."""
+        keep = _clear_table(flags)
+        for chunk in self._chunks.values():
+            chunk[:] = bytes(chunk).translate(keep)
+
+    def row(self, r, left, width):
+        """Flags of the cells (r, left) .. (r, left + width - 1) as bytes."""
+        k = self.chunk
+        cr, offset = divmod(r, k)
+        offset *= k
+        parts = []
+        c, end = left, left + width
+        while c < end:
+            cc, i = divmod(c, k)
+            n = min(k - i, end - c)
+            chunk = self._chunks.get((cr, cc))
+            parts.append(bytes(n) if chunk is None else chunk[offset + i:offset + i + n])
+            c += n
+        return b"".join(parts)
+
+    def items(self):
+        """Yield (r, c, flags) for every non-zero cell."""
+        k = self.chunk
+        for (cr, cc), chunk in self._chunks.items():
+            for i, flags in enumerate(chunk):
+                if flags:
+                    r, c = cr * k + i // k, cc * k + i % k
+                    yield r, c, flags
+
+    def nbytes(self):
+        """Bytes held by allocated chunks."""
+        return sum(len(chunk) for chunk in self._chunks.values())
@@ -0,0 +1,135 @@
+"""
+Compact move history: one position and one reason code per move, with the
+explanation text rendered only when an entry is read.
+
+Moves are numbered from 0 for the whole game. Only the last `limit` moves
+are kept (about 9 bytes each), so a long game's history stays bounded;
+older moves are reported as dropped by page().
+"""
+from array import array
+
+from game.utils import pos_to_label
+
+# Reason codes: how the move was chosen, in the low bits...
+MANUAL = 0
+AUTO = 1
+# ...and how it ended, in the high bits
+NO_OUTCOME = 0
+PIT = 1 << 2
+WUMPUS = 2 << 2
+GOLD = 3 << 2
+
+_KIND_MASK = 0b11
+_OUTCOME_MASK = 0b1100
+
+_OUTCOME_TEXT = {
+    NO_OUTCOME: "",
+    PIT: " Fell into a pit. 💀",
+    WUMPUS: " Eaten by the Wumpus! 🐉",
+    GOLD: " Found the gold! 🏆",
+}
+
+HISTORY_LIMIT = 10000
+RECENT_WINDOW = 50
+
+
+def render_reason(pos, code):
+    """The explanation text of a move to `pos` with reason `code`."""
+    label = pos_to_label(pos)
+    if code & _KIND_MASK == MANUAL:
+        text = f"Manual move to {label}."
+    else:
+        text = f"Auto-move chosen to {label}. Reason: Used best move logic from backend."
+    return text + _OUTCOME_TEXT[code & _OUTCOME_MASK]
+
+
+class MoveHistory:
+    __slots__ = ("limit", "total", "_rows", "_cols", "_codes")
+
+    def __init__(self, limit=HISTORY_LIMIT):
+        self.limit = limit
+        self.total = 0       # moves made this game
+        self._rows = array("i")
+        self._cols = array("i")
+        self._codes = bytearray()
+
+    def __len__(self):
+        return self.total
+
+    @property
+    def _base(self):
+        # Number of the oldest move held in the arrays
+        return self.total - len(self._codes)
+
+    @property
+    def first(self):
+        """Number of the oldest move still kept."""
+        return max(self._base, self.total - self.limit)
+
+    def clear(self):
+        self.total = 0
+        del self._rows[:], self._cols[:], self._codes[:]
+
+    @classmethod
+    def restore(cls, total, rows, cols, codes, limit=HISTORY_LIMIT):
+        """History of `total` moves whose last len(codes) are given."""
+        history = cls(limit)
+        history.total = total
+        history._rows = array("i", rows)
+        history._cols = array("i", cols)
+        history._codes = bytearray(codes)
+        return history
+
+    def kept(self):
+        """(rows, cols, codes) arrays of the moves still kept."""
+        start = self.first - self._base
+        return self._rows[start:], self._cols[start:], self._codes[start:]
+
+    def append(self, pos, code):
+        self._rows.append(pos[0])
+        self._cols.append(pos[1])
+        self._codes.append(code)
+        self.total += 1
+        # Drop the oldest moves in one go once twice the limit are held,
+        # which keeps appends amortised O(1)
+        excess = len(self._codes) - self.limit
+        if excess >= self.limit:
+            del self._rows[:excess], self._cols[:excess], self._codes[:excess]
+
+    def position(self, index):
+        """Position of move `index` (negative counts from the end), None if not kept."""
+        if index < 0:
+            index += self.total
+        if not self.first <= index < self.total:
+            return None
+        i = index - self._base
+        return (self._rows[i], self._cols[i])
+
+    def entries(self, start=0, stop=None):
+        """Moves start..stop-1 still kept, as [label, reason] pairs."""
+        base = self._base
+        start = max(start, self.first) - base
+        stop = (self.total if stop is None else min(stop, self.total)) - base
+        return [
+            [pos_to_label((self._rows[i], self._cols[i])),
+             render_reason((self._rows[i], self._cols[i]), self._codes[i])]
+            for i in range(start, stop)
+        ]
+
+    def recent(self, count=RECENT_WINDOW):
+        """The last `count` moves as [label, reason] pairs."""
+        return self.entries(self.total - count)
+
+    def page(self, offset=0, limit=100):
+        """One page of the history for the history endpoint."""
+        first = self.first
+        offset = max(offset, first)
+        entries = self.entries(offset, offset + limit)
+        next_offset = offset + len(entries)
+        return {
+            "offset": offset,
+            "total": self.total,
+            "first_kept": first,
+            "entries": entries,
+            "next_offset": next_offset if next_offset < self.total else None,
+        }
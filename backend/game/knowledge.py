@@ -0,0 +1,221 @@
+from game.cells import PIT, WUMPUS, VISITED, HAZARD, CONTENT, PERCEPTS, CellGrid, encode_visible
+from game.pathfinding import PathFinder
+from game.probability import hazard_probabilities
+from game.utils import DIRECTIONS
+
+# Hazards assumed per free cell when the caller does not know the counts
+# (e.g. a preview of a bare grid): the default 5x5 game's 3 pits and 1 wumpus
+DEFAULT_PIT_DENSITY = 3 / 24
+DEFAULT_WUMPUS_DENSITY = 1 / 24
+
+# Probabilities this close to 0 or 1 count as certain
+CERTAIN = 1e-9
+
+
+class Knowledge:
+    """
+    What the agent has deduced about the board, kept up to date as cells are
+    revealed instead of rescanning the whole visible grid for every decision.
+
+    Every unknown cell next to a visited cell (the frontier) keeps three
+    counters over its visited neighbours: how many there are, how many are
+    "white" (no breeze/stench, no hazard, no gold) and how many carry a
+    breeze or stench. Revealing a cell only touches its 8 neighbours.
+
+    Those counters give a quick classification; update_risk() then refines
+    it with exact hazard probabilities (see game.probability), given the
+    board's pit and wumpus counts.
+    """
+    __slots__ = (
+        "rows", "cols", "pit_count", "wumpus_count", "known_pits", "known_wumpuses", "cells",
+        "visited", "safe", "risky", "dangerous", "frontier", "risk", "_risk_version", "passable_version",
+        "bounds", "paths",
+    )
+
+    def __init__(self, rows, cols=None, pit_count=None, wumpus_count=None):
+        self.rows = rows
+        self.cols = rows if cols is None else cols
+        free = self.rows * self.cols - 1
+        self.pit_count = round(free * DEFAULT_PIT_DENSITY) if pit_count is None else pit_count
+        self.wumpus_count = max(1, round(free * DEFAULT_WUMPUS_DENSITY)) if wumpus_count is None else wumpus_count
+        self.known_pits = 0
+        self.known_wumpuses = 0
+        self.cells = CellGrid(self.rows, self.cols)  # visible flags, 0 = unknown
+        self.visited = set()
+        self.safe = set()
+        self.risky = set()
+        self.dangerous = set()
+        self.frontier = {}     # unknown pos -> [visited, white, percept] neighbour counts
+        self.risk = {}         # risky pos -> probability of a pit or wumpus
+        self._risk_version = None
+        # Bumped whenever a cell becomes passable or stops being passable (see
+        # is_passable): cached distance fields only depend on those cells
+        self.passable_version = 0
+        # Bounding box (top, left, bottom, right) of the visited cells
+        self.bounds = None
+        self.paths = PathFinder(self.rows, self.cols)
+
+    @classmethod
+    def from_visible_grid(cls, visible_grid, pit_count=None, wumpus_count=None):
+        rows = len(visible_grid)
+        cols = len(visible_grid[0]) if rows > 0 else 0
+        knowledge = cls(rows, cols, pit_count, wumpus_count)
+        for r in range(rows):
+            for c in range(cols):
+                flags = encode_visible(visible_grid[r][c])
+                if flags:
+                    knowledge.reveal((r, c), flags)
+        return knowledge
+
+    @classmethod
+    def from_flags(cls, rows, cols, flags, pit_count=None, wumpus_count=None):
+        """Build from a row-major sequence of visible flags (0 = unknown)."""
+        knowledge = cls(rows, cols, pit_count, wumpus_count)
+        for index, cell in enumerate(flags):
+            if cell:
+                knowledge.reveal(divmod(index, cols), cell)
+        return knowledge
+
+    def in_bounds(self, r, c):
+        return 0 <= r < self.rows and 0 <= c < self.cols
+
+    def search_window(self, margin=2):
+        """
+        Visited bounding box grown by `margin`, clipped to the board. Every
+        hazard and frontier cell lies within one cell of the visited box, so
+        with margin 2 shortest paths between cells in the box never need to
+        leave it.
+        """
+        if self.bounds is None:
+            return 0, 0, self.rows - 1, self.cols - 1
+        top, left, bottom, right = self.bounds
+        return (
+            max(top - margin, 0), max(left - margin, 0),
+            min(bottom + margin, self.rows - 1), min(right + margin, self.cols - 1),
+        )
+
+    def is_unknown(self, pos):
+        return pos not in self.visited
+
+    def is_passable(self, pos):
+        """
+        Cells a path may cross: visited ones without a pit or wumpus, and
+        unknown ones known to be safe.
+        """
+        if pos in self.visited:
+            return not self.flags_at(pos) & HAZARD
+        return pos in self.safe
+
+    def flags_at(self, pos):
+        """Visible flags of pos (see game.cells), 0 if unknown."""
+        return self.cells.get(pos[0], pos[1])
+
+    def reveal(self, pos, flags):
+        """
+        Record the visible flags of a newly visited cell and reclassify
+        the unknown cells around it.
+        """
+        pos = tuple(pos)
+        if pos in self.visited:
+            return
+        flags |= VISITED
+        self.visited.add(pos)
+        self.cells.set(pos[0], pos[1], flags)
+        if self.bounds is None:
+            self.bounds = (pos[0], pos[1], pos[0], pos[1])
+        else:
+            top, left, bottom, right = self.bounds
+            self.bounds = (min(top, pos[0]), min(left, pos[1]), max(bottom, pos[0]), max(right, pos[1]))
+
+        # The cell itself is no longer part of the frontier
+        was_passable = pos in self.safe
+        self.frontier.pop(pos, None)
+        self.risk.pop(pos, None)
+        self.safe.discard(pos)
+        self.risky.discard(pos)
+        is_hazard = bool(flags & HAZARD)
+        if is_hazard:
+            self.dangerous.add(pos)
+        else:
+            self.dangerous.discard(pos)
+        if was_passable == is_hazard:
+            self.passable_version += 1
+        if flags & PIT:
+            self.known_pits += 1
+        if flags & WUMPUS:
+            self.known_wumpuses += 1
+
+        has_percept = bool(flags & PERCEPTS)
+        is_white = not flags & (PERCEPTS | CONTENT)
+
+        r, c = pos
+        for dr, dc in DIRECTIONS:
+            nr, nc = r + dr, c + dc
+            if not self.in_bounds(nr, nc) or (nr, nc) in self.visited:
+                continue
+            counts = self.frontier.setdefault((nr, nc), [0, 0, 0])
+            counts[0] += 1
+            if is_white:
+                counts[1] += 1
+            if has_percept:
+                counts[2] += 1
+            self._classify((nr, nc), counts)
+
+    def _classify(self, pos, counts):
+        visited, white, percept = counts
+        if white:
+            self._set_class(pos, self.safe)
+        elif percept == visited:
+            self._set_class(pos, self.dangerous)
+        elif percept:
+            self._set_class(pos, self.risky)
+        else:
+            self._set_class(pos, None)
+
+    def _set_class(self, pos, cls):
+        """Move an unknown cell to the safe, risky or dangerous set (None: no set)."""
+        if cls is not None and pos in cls:
+            return
+        if cls is None and not (pos in self.safe or pos in self.risky or pos in self.dangerous):
+            return
+        if (pos in self.safe) != (cls is self.safe):
+            self.passable_version += 1
+        for other in (self.safe, self.risky, self.dangerous):
+            other.discard(pos)
+        if cls is not None:
+            cls.add(pos)
+
+    def update_risk(self):
+        """
+        Refine the classification with exact hazard probabilities: frontier
+        cells that cannot hold a hazard become safe, only certain hazards
+        stay dangerous, and every risky cell gets its probability in
+        self.risk. Recomputed only after a reveal. Sampled (inexact)
+        probabilities only fill in self.risk. A view the hazard counts
+        cannot explain (e.g. a hand-made preview grid) keeps the quick
+        classification.
+        """
+        if self._risk_version == len(self.visited):
+            return
+        self._risk_version = len(self.visited)
+        estimate = hazard_probabilities(self)
+        if estimate is None:
+            return
+        self.risk = {}
+        for pos, (pit, wumpus) in estimate.cells.items():
+            risk = pit + wumpus
+            if pos in estimate.sampled:
+                # A sample without a hazard here proves it is not certain,
+                # but no number of samples proves it safe
+                if pos in self.dangerous and risk < 1:
+                    self._set_class(pos, self.risky)
+                if pos in self.risky:
+                    self.risk[pos] = risk
+                continue
+            if risk <= CERTAIN:
+                self._set_class(pos, self.safe)
+            elif risk >= 1 - CERTAIN:
+                self._set_class(pos, self.dangerous)
+            else:
+                self._set_class(pos, self.risky)
+                self.risk[pos] = risk
@@ -1,130 +1,130 @@
-def get_best_move(visible_grid, agent_pos):
-    from collections import deque
-
-    rows = len(visible_grid)
-    cols = len(visible_grid[0]) if rows > 0 else 0
-    directions = [(-1,0),(1,0),(0,-1),(0,1),(-1,-1),(-1,1),(1,-1),(1,1)]
-
-    visited = set()
-    safe = set()
-    risky = set()
-    dangerous = set()
-
-    # 1. Mark visited cells
-    for r in range(rows):
-        for c in range(cols):
-            cell = visible_grid[r][c]
-            if cell != "unknown":
-                visited.add((r, c))
-                if cell in ("pit", "wumpus"):
-                    dangerous.add((r, c))
-
-    # 2. Deduce safe/risky/dangerous for unknown cells
-    for r in range(rows):
-        for c in range(cols):
-            if visible_grid[r][c] != "unknown":
-                continue
-            neighbor_percepts = []
-            has_white_neighbor = False
-            all_neighbors_breeze_or_stench = True
-            has_visited_neighbor = False
-            for dr, dc in directions:
-                nr, nc = r + dr, c + dc
-                if 0 <= nr < rows and 0 <= nc < cols and (nr, nc) in visited:
-                    has_visited_neighbor = True
-                    neighbor_cell = visible_grid[nr][nc]
-                    neighbor_percepts.append(neighbor_cell)
-                    if neighbor_cell not in ("pit", "wumpus", "gold") and "breeze" not in neighbor_cell and "stench" not in neighbor_cell:
-                        has_white_neighbor = True
-                    if "breeze" not in neighbor_cell and "stench" not in neighbor_cell:
-                        all_neighbors_breeze_or_stench = False
-            if not has_visited_neighbor:
-                continue
-            if has_white_neighbor:
-                safe.add((r, c))
-            elif all_neighbors_breeze_or_stench:
-                dangerous.add((r, c))
-            elif any("breeze" in n or "stench" in n for n in neighbor_percepts):
-                risky.add((r, c))
-
-    risky = risky - safe - dangerous
-
-    r, c = agent_pos
-    unvisited_neighbors = []
-    visited_neighbors = []
-    for dr, dc in directions:
-        nr, nc = r + dr, c + dc
-        if 0 <= nr < rows and 0 <= nc < cols:
-            if visible_grid[nr][nc] == "unknown":
-                unvisited_neighbors.append((nr, nc))
-            elif (nr, nc) in visited and visible_grid[nr][nc] not in ("pit", "wumpus"):
-                visited_neighbors.append((nr, nc))
-
-    all_unvisited_not_safe = all((nbr not in safe) for nbr in unvisited_neighbors) if unvisited_neighbors else False
-
-    prev_cell = None
-    # The following block is only relevant if you want to use move_history for best move logic
-    # Remove or adapt as needed if you want to keep logic.py independent of agent state
-
-    if all_unvisited_not_safe and visited_neighbors:
-        if len(visited_neighbors) == 1 and prev_cell and visited_neighbors[0] == prev_cell:
-            all_dangerous = True
-            for dr, dc in directions:
-                nr, nc = r + dr, c + dc
-                if 0 <= nr < rows and 0 <= nc < cols:
-                    cell = visible_grid[nr][nc]
-                    if cell not in ("pit", "wumpus") and (nr, nc) != prev_cell:
-                        all_dangerous = False
-                        break
-            if all_dangerous:
-                return list(prev_cell)
-        else:
-            for nbr in visited_neighbors:
-                if prev_cell is None or nbr != prev_cell:
-                    return list(nbr)
-
-    # BFS to find shortest path to an unvisited safe cell
-    queue = deque()
-    queue.append((tuple(agent_pos), []))
-    explored = set()
-    while queue:
-        (r, c), path = queue.popleft()
-        if (r, c) in explored:
-            continue
-        explored.add((r, c))
-        if (r, c) in safe and visible_grid[r][c] == "unknown":
-            if path:
-                return list(path[0])
-            else:
-                return [r, c]
-        for dr, dc in directions:
-            nr, nc = r + dr, c + dc
-            if 0 <= nr < rows and 0 <= nc < cols:
-                if (nr, nc) in dangerous:
-                    continue
-                if (nr, nc) not in explored:
-                    queue.append(((nr, nc), path + [(nr, nc)]))
-
-    # If no unvisited safe cell, try risky unknown cells (but not definite pits/wumpus)
-    queue = deque()
-    queue.append((tuple(agent_pos), []))
-    explored = set()
-    while queue:
-        (r, c), path = queue.popleft()
-        if (r, c) in explored:
-            continue
-        explored.add((r, c))
-        if (r, c) in risky and visible_grid[r][c] == "unknown":
-            if path:
-                return list(path[0])
-            else:
-                return [r, c]
-        for dr, dc in directions:
-            nr, nc = r + dr, c + dc
-            if 0 <= nr < rows and 0 <= nc < cols:
-                if (nr, nc) in dangerous:
-                    continue
-                if (nr, nc) not in explored:
-                    queue.append(((nr, nc), path + [(nr, nc)]))
-
-    return list(agent_pos)
+from game import book
+from game.knowledge import Knowledge
+from game.metrics import METRICS
+from game.profiling import profiled
+
+# Decision categories
+RETURN = "return"          # back to the previous cell on the way to a safe cell
+BACKTRACK = "backtrack"    # to another visited neighbour on the way to a safe cell
+SAFE = "safe"              # first step towards the nearest unvisited safe cell
+RISKY = "risky"            # first step towards the least likely hazard
+STUCK = "stuck"            # nothing reachable, stay in place
+PLANNED = "planned"        # overridden by the rollout planner (game.planner)
+
+
+class Decision:
+    """
+    Result of one pass of the decision engine. The explanation text is only
+    built when `reason` is read, so callers that just need the move pay
+    nothing for it.
+    """
+    def __init__(self, move, category, target=None, trace=None):
+        self.move = move           # [row, col]
+        self.category = category
+        self.target = target       # cell the move heads for, if any
+        self.trace = trace or {}   # facts the reason is rendered from
+        self._reason = None
+
+    @property
+    def reason(self):
+        if self._reason is None:
+            self._reason = _render_reason(self)
+        return self._reason
+
+
+def _render_reason(decision):
+    trace = decision.trace
+    category = decision.category
+    if category == RETURN:
+        return (
+            f"All unvisited neighbors are not marked safe. The nearest unvisited safe cell is {decision.target} "
+            f"and the way there leads back through the previous cell ({trace['prev_cell']}), so the best move is to return to it."
+        )
+    if category == BACKTRACK:
+        return (
+            f"All unvisited neighbors are not marked safe. The nearest unvisited safe cell is {decision.target}, "
+            f"so the agent backtracks through the visited neighbor {tuple(decision.move)} to avoid danger."
+        )
+    if category == SAFE:
+        if trace["in_place"]:
+            return "Current cell is an unvisited safe cell. Staying in place."
+        return (
+            f"Found a path to an unvisited safe cell at {decision.target}. "
+            f"The first step towards it is {tuple(decision.move)}. Safe cells are deduced from neighbors with no breeze or stench."
+        )
+    if category == RISKY:
+        if trace["in_place"]:
+            return "No unvisited safe cells found. Current cell is a risky cell."
+        risk = trace.get("risk")
+        odds = f" (hazard probability {risk:.0%}, the lowest of the reachable risky cells)" if risk is not None else ""
+        return (
+            f"No unvisited safe cells found. "
+            f"Found a path to a risky cell at {decision.target}, which is not definitely dangerous but may have some risk{odds}. "
+            f"The first step towards it is {tuple(decision.move)}."
+        )
+    if category == PLANNED:
+        return (
+            f"Rollout planner: moving to {tuple(decision.move)} scored {trace['value']:+.2f} on average "
+            f"over {trace['rollouts']} sampled boards, against {trace['default_value']:+.2f} for the "
+            f"default move {trace['default_move']} (win +1, death -1)."
+        )
+    return "No safe or risky moves found. Staying in place."
+
+
+def decide(knowledge, agent_pos, prev_cell=None):
+    """
+    The single decision engine used by the agent and every endpoint.
+    prev_cell is where the agent came from, used to tell a return from a
+    backtrack. Returns a Decision.
+    """
+    # Opening positions of the default game are precomputed (game.book)
+    entry = book.BOOK.lookup(knowledge, agent_pos)
+    if entry is not None:
+        return _book_decision(entry, agent_pos, prev_cell)
+
+    with METRICS.timer("deduction"):
+        knowledge.update_risk()
+
+    # One BFS pass over visited and safe cells: nearest unvisited safe cell,
+    # else the least likely hazard among the reachable risky cells
+    with METRICS.timer("bfs"):
+        step, target, category = knowledge.paths.find_target(agent_pos, knowledge)
+    if step is None:
+        return Decision(list(agent_pos), STUCK)
+
+    step = tuple(step)
+    if category == SAFE and step in knowledge.visited:
+        # Heading back through explored cells: no unknown neighbour is safe
+        category = RETURN if step == prev_cell else BACKTRACK
+        return Decision(list(step), category, target, {"prev_cell": prev_cell})
+
+    trace = {"in_place": target == tuple(agent_pos)}
+    if category == RISKY:
+        trace["risk"] = knowledge.risk.get(target)
+    return Decision(list(step), category, target, trace)
+
+
+def _book_decision(entry, agent_pos, prev_cell):
+    # The Decision decide() would have built for an opening book entry
+    step, code, target, risk = entry
+    if code == book.STUCK:
+        return Decision(list(agent_pos), STUCK)
+    if code == book.VIA_VISITED:
+        category = RETURN if step == prev_cell else BACKTRACK
+        return Decision(list(step), category, target, {"prev_cell": prev_cell})
+    trace = {"in_place": target == tuple(agent_pos)}
+    if code == book.RISKY:
+        trace["risk"] = risk
+        return Decision(list(step), RISKY, target, trace)
+    return Decision(list(step), SAFE, target, trace)
+
+
+@profiled("get_best_move")
+def get_best_move(visible_grid, agent_pos, knowledge=None, prev_cell=None):
+    """
+    Returns the best next cell as [row, col].
+    Pass the game's Knowledge to skip rebuilding it from visible_grid.
+    """
+    if knowledge is None:
+        knowledge = Knowledge.from_visible_grid(visible_grid)
+    return decide(knowledge, agent_pos, prev_cell).move
@@ -0,0 +1,172 @@
+"""
+Process-wide latency histograms and counters, rendered in the Prometheus
+text format by /metrics.
+
+Set WUMPUS_METRICS=0 to disable: timers are then one shared no-op context
+manager and the count_* helpers return straight away.
+
+    with METRICS.timer("bfs"):
+        ...
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# Seconds; the +Inf bucket is implied
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+_NULL_TIMER = nullcontext()
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values = {}   # label values -> [bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, (counts[:], total, n)) for key, (counts, total, n) in self._values.items())
+        for label_values, (counts, total, n) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {n}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+        return False
+
+
+class Metrics:
+    """The metrics this app records, see the module docstring."""
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.requests = Histogram(
+            "wumpus_request_seconds", "Request handling time by endpoint.", ("endpoint",))
+        self.phases = Histogram(
+            "wumpus_phase_seconds", "Time spent in each phase of a request.", ("phase",))
+        self.decisions = Counter(
+            "wumpus_decisions_total", "Auto moves played, by decision category.", ("category",))
+        self.outcomes = Counter(
+            "wumpus_games_total", "Finished games, by outcome.", ("outcome",))
+        self.speculation = Counter(
+            "wumpus_speculation_total", "Speculative next decisions, by outcome.", ("outcome",))
+        self.snapshot_errors = Counter(
+            "wumpus_snapshot_errors_total", "Failed snapshot writes and prunes, by operation.", ("operation",))
+        self._metrics = [self.requests, self.phases, self.decisions, self.outcomes, self.speculation,
+                         self.snapshot_errors]
+
+    def timer(self, phase):
+        """Context manager that records its duration under `phase`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.phases, (phase,))
+
+    def observe_request(self, endpoint, seconds):
+        if self.enabled:
+            self.requests.observe(seconds, endpoint)
+
+    def count_decision(self, category):
+        if self.enabled:
+            self.decisions.inc(category)
+
+    def count_outcome(self, outcome):
+        if self.enabled:
+            self.outcomes.inc(outcome)
+
+    def count_speculation(self, outcome):
+        if self.enabled:
+            self.speculation.inc(outcome)
+
+    def count_snapshot_error(self, operation):
+        if self.enabled:
+            self.snapshot_errors.inc(operation)
+
+    def render(self, gauges=()):
+        """
+        Prometheus text exposition of every metric, plus `gauges`: a list
+        of (name, help, value) read at scrape time.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for name, help, value in gauges:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics(enabled=os.environ.get("WUMPUS_METRICS", "1") != "0")
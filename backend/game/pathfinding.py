@@ -0,0 +1,177 @@
+from collections import OrderedDict, deque
+from functools import lru_cache
+
+from game.utils import DIRECTIONS
+
+
+@lru_cache(maxsize=16)
+def adjacency(rows, cols):
+    """
+    Precomputed 8-neighbour table for a board size: pos -> tuple of
+    in-bounds neighbour positions, in DIRECTIONS order.
+    """
+    table = {}
+    for r in range(rows):
+        for c in range(cols):
+            table[(r, c)] = tuple(
+                (r + dr, c + dc)
+                for dr, dc in DIRECTIONS
+                if 0 <= r + dr < rows and 0 <= c + dc < cols
+            )
+    return table
+
+
+# Boards up to this many cells get a precomputed adjacency table and
+# unbounded searches. Larger boards compute neighbours on the fly and only
+# search the explored area (see Knowledge.search_window).
+DENSE_LIMIT = 128 * 128
+
+
+class WindowAdjacency:
+    """
+    Adjacency computed on demand, restricted to a (top, left, bottom, right)
+    window. Same interface as the adjacency() table.
+    """
+    def __init__(self, window):
+        self.window = window
+
+    def __getitem__(self, pos):
+        top, left, bottom, right = self.window
+        r, c = pos
+        return tuple(
+            (r + dr, c + dc)
+            for dr, dc in DIRECTIONS
+            if top <= r + dr <= bottom and left <= c + dc <= right
+        )
+
+
+class DistanceField:
+    """
+    Parent-pointer BFS from one start cell. Every cell next to the explored
+    area is reached, but the search only continues through cells for which
+    passable(pos) is true, so a path never crosses a cell that is not
+    passable before its last step.
+    The search is expanded lazily: callers walk iter_order() and stop as
+    soon as they find what they need, and a later walk over the same field
+    resumes where the previous one stopped.
+    """
+    def __init__(self, start, adjacency, passable):
+        self.start = start
+        self.adjacency = adjacency
+        self.passable = passable
+        self.parent = {start: None}
+        self.dist = {start: 0}
+        self.order = []
+        self._queue = deque([start])
+
+    def _expand(self):
+        pos = self._queue.popleft()
+        self.order.append(pos)
+        if pos != self.start and not self.passable(pos):
+            return
+        parent = self.parent
+        next_dist = self.dist[pos] + 1
+        for nbr in self.adjacency[pos]:
+            if nbr in parent:
+                continue
+            parent[nbr] = pos
+            self.dist[nbr] = next_dist
+            self._queue.append(nbr)
+
+    def iter_order(self):
+        """Yield reachable cells in BFS order, expanding the search as needed."""
+        i = 0
+        while True:
+            if i == len(self.order):
+                if not self._queue:
+                    return
+                self._expand()
+            yield self.order[i]
+            i += 1
+
+    def first_step(self, target):
+        """First cell on the shortest path from start to target."""
+        if target == self.start:
+            return target
+        pos = target
+        while self.parent[pos] != self.start:
+            pos = self.parent[pos]
+        return pos
+
+
+class PathFinder:
+    """
+    Per-game pathfinding. Distance fields are cached by start cell, the
+    max_fields most recently used ones, and reused until the passable
+    cells they were built on change: revealing a cell or reclassifying
+    one that does not open or close a path keeps them.
+    """
+    max_fields = 16
+    __slots__ = ("dense", "adjacency", "_fields", "_version")
+
+    def __init__(self, rows, cols):
+        self.dense = rows * cols <= DENSE_LIMIT
+        self.adjacency = adjacency(rows, cols) if self.dense else None
+        self._fields = OrderedDict()
+        self._version = None
+
+    def field(self, start, passable, version, window=None):
+        """
+        Distance field from start. `version` identifies the passable cells,
+        `window` bounds the search on large boards; fields are reused until
+        either changes.
+        """
+        if window is not None:
+            version = (version, window)
+        if version != self._version:
+            self._fields.clear()
+            self._version = version
+        start = tuple(start)
+        field = self._fields.get(start)
+        if field is None:
+            adjacency = self.adjacency if window is None else WindowAdjacency(window)
+            field = self._fields[start] = DistanceField(start, adjacency, passable)
+            if len(self._fields) > self.max_fields:
+                self._fields.popitem(last=False)
+        else:
+            self._fields.move_to_end(start)
+        return field
+
+    def find_target(self, start, knowledge):
+        """
+        Single BFS pass over visited and safe cells that ranks safe targets
+        above risky ones: the nearest safe cell, else the risky cell with
+        the lowest hazard probability (the nearest one on ties).
+        Returns (first_step, target, category) where category is "safe" or
+        "risky", or (None, None, None) if no unvisited target is reachable.
+        """
+        window = None
+        if not self.dense:
+            top, left, bottom, right = knowledge.search_window()
+            r, c = start
+            window = (min(top, r), min(left, c), max(bottom, r), max(right, c))
+        field = self.field(start, knowledge.is_passable, knowledge.passable_version, window)
+        visited = knowledge.visited
+        safe = knowledge.safe
+        risky = knowledge.risky
+        risk = knowledge.risk
+        risky_target = None
+        lowest = None
+        # Stop as soon as every candidate target has been seen
+        remaining = len(safe) + len(risky)
+        for pos in field.iter_order():
+            if not remaining:
+                break
+            if pos in visited:
+                continue
+            if pos in safe:
+                return field.first_step(pos), pos, "safe"
+            if pos in risky:
+                remaining -= 1
+                pos_risk = risk.get(pos, 1.0)
+                if risky_target is None or pos_risk < lowest:
+                    risky_target = pos
+                    lowest = pos_risk
+        if risky_target is not None:
+            return field.first_step(risky_target), risky_target, "risky"
+        return None, None, None
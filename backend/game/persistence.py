@@ -0,0 +1,264 @@
+"""
+Crash-safe game snapshots in SQLite.
+
+Each game is saved as one compact binary blob (encode_game) holding only
+what cannot be recomputed: the board settings, the content cells (their
+percepts are rebuilt on load), the visited cells in reveal order, the
+agent's position and the kept move history. Its size grows with the
+hazards placed and the area explored, not with the board.
+
+SnapshotStore writes blobs from a background thread in batched
+transactions, with SQLite's write-ahead log, so a save on the request
+path is a dict insert. A crash loses at most the last flush interval of
+moves. Games are read back on first access by GameStore.get.
+
+One process owns a game at a time: a game loaded into memory is not
+re-read when another process saves it.
+"""
+import logging
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import weakref
+from array import array
+
+from game.agent import Agent
+from game.cells import CONTENT
+from game.history import MoveHistory
+from game.metrics import METRICS
+from game.world import World
+
+FORMAT = 1
+# format, size, pit/wumpus/gold counts, epoch, agent row/col, game over,
+# then the lengths of the content, visited and kept history arrays plus
+# the history's move total
+HEADER = struct.Struct("<BHIIIIHHBIIII")
+
+
+def _pack(values, typecode):
+    data = array(typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _unpack(blob, offset, count, typecode):
+    data = array(typecode)
+    end = offset + count * data.itemsize
+    data.frombytes(blob[offset:end])
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data, end
+
+
+log = logging.getLogger(__name__)
+
+# Encoded content cells per board (CellGrid): the layout never changes
+# during a game, so only the first save of a board scans it
+_content_cache = weakref.WeakKeyDictionary()
+_content_lock = threading.Lock()
+
+
+def _encode_content(world):
+    with _content_lock:
+        cached = _content_cache.get(world.cells)
+    if cached is None:
+        size = world.size
+        content = [(r * size + c, flags & CONTENT) for r, c, flags in world.cells.items() if flags & CONTENT]
+        cached = (len(content), _pack([index for index, _ in content], "I") + bytes(flags for _, flags in content))
+        with _content_lock:
+            _content_cache[world.cells] = cached
+    return cached
+
+
+def encode_game(world, agent):
+    """Binary snapshot of a World/Agent pair."""
+    size = world.size
+    n_content, content = _encode_content(world)
+    rows, cols, codes = agent.history.kept()
+    header = HEADER.pack(
+        FORMAT, size, world.pit_count, world.wumpus_count, world.gold_count, agent.epoch,
+        agent.pos[0], agent.pos[1], agent.game_over,
+        n_content, len(world.reveal_log), len(codes), agent.history.total,
+    )
+    return b"".join((
+        header,
+        content,
+        _pack(world.reveal_log, "I"),
+        _pack(rows, "i"),
+        _pack(cols, "i"),
+        bytes(codes),
+    ))
+
+
+def decode_game(blob):
+    """(world, agent) from encode_game's blob."""
+    (fmt, size, pit_count, wumpus_count, gold_count, epoch, row, col, game_over,
+     n_content, n_visited, n_history, history_total) = HEADER.unpack_from(blob, 0)
+    if fmt != FORMAT:
+        raise ValueError(f"Unknown snapshot format {fmt}")
+    offset = HEADER.size
+    indexes, offset = _unpack(blob, offset, n_content, "I")
+    flags = blob[offset:offset + n_content]
+    offset += n_content
+    visited, offset = _unpack(blob, offset, n_visited, "I")
+    rows, offset = _unpack(blob, offset, n_history, "i")
+    cols, offset = _unpack(blob, offset, n_history, "i")
+    codes = blob[offset:offset + n_history]
+
+    world = World.restore(
+        size, pit_count, wumpus_count, gold_count,
+        [(divmod(index, size), flag) for index, flag in zip(indexes, flags)],
+        [divmod(index, size) for index in visited],
+    )
+    history = MoveHistory.restore(history_total, rows, cols, codes)
+    agent = Agent.restore(world, (row, col), bool(game_over), history, epoch)
+    return world, agent
+
+
+class SnapshotStore:
+    """
+    Session id -> snapshot blob in a SQLite file, written behind by a
+    background thread every `flush_interval` seconds (sooner once
+    `batch_size` saves are waiting). With `max_age`, the same thread
+    deletes snapshots not saved for that many seconds, checking every
+    `prune_interval` seconds.
+    """
+    def __init__(self, path, flush_interval=0.05, batch_size=256, max_age=None, prune_interval=600):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self._pending = {}    # session id -> blob, None to delete
+        self._flushing = {}   # the batch being written, still readable
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.saves = 0
+        self.loads = 0
+        self.flushes = 0
+        self.pruned = 0
+        self.errors = 0
+
+        self._writer = self._connect()
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            "session_id TEXT PRIMARY KEY, saved_at REAL NOT NULL, snapshot BLOB NOT NULL)"
+        )
+        self._writer.execute("CREATE INDEX IF NOT EXISTS games_saved_at ON games (saved_at)")
+        self._reader = self._connect()
+        self._reader_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last commits on power loss, never corruption
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def save(self, session_id, blob):
+        with self._lock:
+            self._pending[session_id] = blob
+            self.saves += 1
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+
+    def delete(self, session_id):
+        with self._lock:
+            self._pending[session_id] = None
+
+    def load(self, session_id):
+        """The latest blob saved for session_id, None if there is none."""
+        with self._lock:
+            for batch in (self._pending, self._flushing):
+                if session_id in batch:
+                    return batch[session_id]
+        with self._reader_lock:
+            row = self._reader.execute(
+                "SELECT snapshot FROM games WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        self.loads += 1
+        return row[0]
+
+    def flush(self):
+        """Write every waiting save in one transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+        batch = self._flushing
+        writes = [(session_id, blob) for session_id, blob in batch.items() if blob is not None]
+        deletes = [(session_id,) for session_id, blob in batch.items() if blob is None]
+        conn = self._writer
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO games (session_id, saved_at, snapshot) "
+                "VALUES (?, julianday('now'), ?)", writes)
+            conn.executemany("DELETE FROM games WHERE session_id = ?", deletes)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            # Put the batch back unless newer saves replaced it meanwhile
+            with self._lock:
+                for session_id, blob in batch.items():
+                    self._pending.setdefault(session_id, blob)
+            raise
+        finally:
+            with self._lock:
+                self._flushing = {}
+        self.flushes += 1
+
+    def _prune(self):
+        # On the writer thread, between flushes: saves still waiting are
+        # written afterwards with a fresh saved_at, so they survive
+        cursor = self._writer.execute(
+            "DELETE FROM games WHERE saved_at < julianday('now') - ?", (self.max_age / 86400,))
+        self.pruned += cursor.rowcount
+
+    def _run(self):
+        last_prune = time.monotonic()
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # The batch is put back and retried with the next one
+                log.exception("Writing snapshots to %s failed", self.path)
+                METRICS.count_snapshot_error("flush")
+                self.errors += 1
+            if self.max_age is not None and time.monotonic() - last_prune >= self.prune_interval:
+                last_prune = time.monotonic()
+                try:
+                    self._prune()
+                except sqlite3.Error:
+                    log.exception("Pruning snapshots in %s failed", self.path)
+                    METRICS.count_snapshot_error("prune")
+                    self.errors += 1
+
+    def close(self):
+        """Stop the writer thread after a last flush."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self._writer.close()
+        self._reader.close()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending, "saves": self.saves, "loads": self.loads,
+            "flushes": self.flushes, "pruned": self.pruned, "errors": self.errors,
+        }
@@ -0,0 +1,260 @@
+"""
+Optional Monte-Carlo rollout planner.
+
+For each decision it samples complete boards consistent with everything
+the agent has seen, plays every candidate first step forward on each of
+them with the regular decision engine (logic.decide) as the rollout
+policy, and keeps the step with the best mean outcome. The engine's own
+move is kept unless another step is better by more than two standard
+errors, so sampling noise alone never changes the agent's play.
+
+Rollouts run until a time budget is spent, spread over a process pool
+when one is given. Sampled boards are kept between decisions: when the
+next state only adds observations to the previous one, the boards that
+still match are reused and only the shortfall is sampled again.
+
+Boards are sampled exactly (uniform hazard placement conditioned on the
+percepts) by rejection, so the planner is meant for small boards; above
+PLAN_LIMIT cells it returns the engine's decision unchanged.
+"""
+import math
+import random
+import time
+
+from game.cells import PIT, WUMPUS, GOLD, BREEZE, STENCH, VISITED, CONTENT, PERCEPTS
+from game.knowledge import Knowledge
+from game.logic import PLANNED, STUCK, Decision, decide
+from game.metrics import METRICS
+from game.utils import DIRECTIONS
+
+PLAN_LIMIT = 16 * 16
+DEFAULT_BUDGET = 0.2           # seconds per decision
+MAX_WORLDS = 512               # sampled boards kept for reuse
+SAMPLE_ATTEMPTS = 2000         # rejection attempts per board before giving up
+
+REWARDS = {"win": 1.0, "stuck": 0.0, "pit": -1.0, "wumpus": -1.0}
+
+
+def _neighbours(index, rows, cols):
+    r, c = divmod(index, cols)
+    return [
+        (r + dr) * cols + c + dc
+        for dr, dc in DIRECTIONS
+        if 0 <= r + dr < rows and 0 <= c + dc < cols
+    ]
+
+
+class _Sampler:
+    """Draws boards consistent with a set of observations."""
+    def __init__(self, rows, cols, flags, pit_count, wumpus_count, gold_count, rng):
+        self.rows = rows
+        self.cols = cols
+        self.pit_count = pit_count
+        self.wumpus_count = wumpus_count
+        self.gold_count = gold_count
+        self.rng = rng
+        visited = [i for i, cell in enumerate(flags) if cell & VISITED]
+        unvisited = [i for i, cell in enumerate(flags) if not cell & VISITED and i != 0]
+        self.free = [i for i, cell in enumerate(flags) if not cell & VISITED]
+        # Per hazard kind: cells that may hold it (no neighbour reported its
+        # absence) and the neighbourhoods that must hold at least one
+        self.kinds = []
+        for percept in (BREEZE, STENCH):
+            ruled_out = set()
+            required = []
+            for i in visited:
+                around = _neighbours(i, rows, cols)
+                if flags[i] & percept:
+                    required.append(around)
+                else:
+                    ruled_out.update(around)
+            allowed = [i for i in unvisited if i not in ruled_out]
+            self.kinds.append((allowed, [set(around) - ruled_out for around in required]))
+
+    def _place(self, kind, count):
+        allowed, required = self.kinds[kind]
+        if count > len(allowed):
+            return None
+        for _ in range(SAMPLE_ATTEMPTS):
+            chosen = set(self.rng.sample(allowed, count))
+            if all(group & chosen for group in required):
+                return chosen
+        return None
+
+    def sample(self):
+        """One board as a bytearray of cell flags, None if none was found in time."""
+        for _ in range(SAMPLE_ATTEMPTS):
+            pits = self._place(0, self.pit_count)
+            wumpuses = self._place(1, self.wumpus_count)
+            if pits is None or wumpuses is None:
+                return None
+            if pits & wumpuses:
+                continue   # the two kinds never share a cell
+            cells = bytearray(self.rows * self.cols)
+            for hazards, flag, percept in ((pits, PIT, BREEZE), (wumpuses, WUMPUS, STENCH)):
+                for i in hazards:
+                    cells[i] |= flag | percept
+                    for j in _neighbours(i, self.rows, self.cols):
+                        cells[j] |= percept
+            golds = [i for i in self.free if not cells[i] & CONTENT]
+            for i in self.rng.sample(golds, min(self.gold_count, len(golds))):
+                cells[i] |= GOLD
+            return cells
+        return None
+
+
+def _rollout(cells, state, first_step):
+    # Play first_step, then the decision engine, on one sampled board
+    rows, cols, flags, pit_count, wumpus_count, pos, _ = state
+    knowledge = Knowledge.from_flags(rows, cols, flags, pit_count, wumpus_count)
+    step = first_step
+    for _ in range(rows * cols * 4):
+        if step not in knowledge.visited:
+            cell = cells[step[0] * cols + step[1]]
+            if cell & PIT:
+                return "pit"
+            if cell & WUMPUS:
+                return "wumpus"
+            if cell & GOLD:
+                return "win"
+            knowledge.reveal(step, VISITED | (cell & PERCEPTS))
+        prev, pos = pos, step
+        decision = decide(knowledge, pos, prev)
+        if decision.category == STUCK or tuple(decision.move) == pos:
+            return "stuck"
+        step = tuple(decision.move)
+    return "stuck"
+
+
+def run_rollouts(task):
+    """
+    Process pool task: roll every candidate out on the given boards, then
+    on newly sampled ones until the deadline. Returns ({candidate: [sum,
+    sum of squares, count]}, new boards).
+    """
+    state, candidates, worlds, seed, deadline = task
+    rows, cols, flags, pit_count, wumpus_count, pos, gold_count = state
+    sampler = None
+    totals = {candidate: [0.0, 0.0, 0] for candidate in candidates}
+    sampled = []
+    worlds = iter(worlds)
+    while time.time() < deadline:
+        cells = next(worlds, None)
+        if cells is None:
+            if sampler is None:
+                sampler = _Sampler(rows, cols, flags, pit_count, wumpus_count, gold_count, random.Random(seed))
+            cells = sampler.sample()
+            if cells is None:
+                break
+            sampled.append(bytes(cells))
+        for candidate in candidates:
+            reward = REWARDS[_rollout(cells, state, candidate)]
+            total = totals[candidate]
+            total[0] += reward
+            total[1] += reward * reward
+            total[2] += 1
+    return totals, sampled
+
+
+def _mean_and_error(total):
+    value, squares, n = total
+    if not n:
+        return 0.0, math.inf
+    mean = value / n
+    variance = max(squares / n - mean * mean, 0.0)
+    return mean, math.sqrt(variance / n)
+
+
+class Planner:
+    """
+    Rollout planner for one game. Keeps the boards it sampled so the next
+    decision can reuse them (see the module docstring).
+    """
+    def __init__(self, budget=DEFAULT_BUDGET, max_worlds=MAX_WORLDS, seed=None):
+        self.budget = budget
+        self.max_worlds = max_worlds
+        self.rng = random.Random(seed)
+        self._evidence = None     # (config, {index: flags}) the kept boards match
+        self._worlds = []
+        self._last = None         # (state, totals) of the previous decision
+
+    def _reusable_worlds(self, config, evidence):
+        # Boards sampled for an earlier state that this state extends
+        if self._evidence is None or self._evidence[0] != config:
+            return []
+        old = self._evidence[1]
+        if any(evidence.get(i) != cell for i, cell in old.items()):
+            return []
+        added = [(i, cell & PERCEPTS) for i, cell in evidence.items() if i not in old]
+        return [
+            cells for cells in self._worlds
+            if all(not cells[i] & CONTENT and cells[i] & PERCEPTS == percepts for i, percepts in added)
+        ]
+
+    def decide(self, knowledge, agent_pos, prev_cell, decision, executor=None, budget=None,
+               workers=1, gold_count=1):
+        """
+        The planned Decision for this state; `decision` is the engine's
+        own, returned as is when the planner keeps it.
+        """
+        rows, cols = knowledge.rows, knowledge.cols
+        if rows * cols > PLAN_LIMIT or decision.category == STUCK:
+            return decision
+        pos = tuple(agent_pos)
+        candidates = [
+            (pos[0] + dr, pos[1] + dc) for dr, dc in DIRECTIONS
+            if knowledge.in_bounds(pos[0] + dr, pos[1] + dc) and (pos[0] + dr, pos[1] + dc) not in knowledge.dangerous
+        ]
+        heuristic = tuple(decision.move)
+        if heuristic not in candidates or len(candidates) < 2:
+            return decision
+
+        with METRICS.timer("planning"):
+            flags = bytes(knowledge.flags_at(divmod(i, cols)) for i in range(rows * cols))
+            config = (rows, cols, knowledge.pit_count, knowledge.wumpus_count, gold_count)
+            evidence = {i: cell for i, cell in enumerate(flags) if cell}
+            state = (rows, cols, flags, knowledge.pit_count, knowledge.wumpus_count, pos, gold_count)
+            kept = self._reusable_worlds(config, evidence)
+
+            worlds = kept
+            totals = {candidate: [0.0, 0.0, 0] for candidate in candidates}
+            if self._last is not None and self._last[0] == state:
+                # Same state as last time (e.g. a retry): keep its rollouts
+                # and spend this budget on new boards only
+                totals = self._last[1]
+                worlds = []
+
+            deadline = time.time() + (self.budget if budget is None else budget)
+            if executor is None or workers <= 1:
+                tasks = [(state, candidates, worlds, self.rng.getrandbits(32), deadline)]
+                results = [run_rollouts(tasks[0])]
+            else:
+                tasks = [
+                    (state, candidates, worlds[i::workers], self.rng.getrandbits(32), deadline)
+                    for i in range(workers)
+                ]
+                results = list(executor.map(run_rollouts, tasks))
+
+            for task_totals, sampled in results:
+                for candidate, (value, squares, n) in task_totals.items():
+                    total = totals[candidate]
+                    total[0] += value
+                    total[1] += squares
+                    total[2] += n
+                kept = kept + sampled
+            self._evidence = (config, evidence)
+            self._worlds = kept[-self.max_worlds:]
+            self._last = (state, totals)
+
+        scores = {candidate: _mean_and_error(total) for candidate, total in totals.items()}
+        best = max(candidates, key=lambda candidate: scores[candidate][0])
+        best_value, best_error = scores[best]
+        value, error = scores[heuristic]
+        if best == heuristic or best_value - value <= 2 * math.hypot(best_error, error):
+            return decision
+        return Decision(list(best), PLANNED, None, {
+            "value": best_value,
+            "default_move": heuristic,
+            "default_value": value,
+            "rollouts": totals[best][2],
+        })
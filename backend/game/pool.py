@@ -0,0 +1,139 @@
+"""
+Warm pool of pre-generated worlds, so /api/init takes a finished board
+instead of placing hazards by rejection sampling on the request path.
+
+Boards are pooled per configuration (size, pit_count, wumpus_count,
+gold_count). The configurations given at construction are always pooled;
+any other one starts being pooled on its first miss, up to `max_configs`
+of them (least recently requested dropped first), and boards above
+MAX_POOLED_CELLS never are. A background thread tops every pool up to
+`size` boards, at most `rate` boards a second so it does not compete
+with requests for the interpreter. An optional `filter` (e.g.
+gold_reachable) rejects boards before they are pooled; on a miss the
+caller generates its board as before, unfiltered.
+
+The thread draws boards from its own random.Random, so the random
+module's sequence seen by the rest of the process is left alone.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+from game.cells import GOLD, HAZARD
+from game.world import World
+
+MAX_POOLED_CELLS = 256 * 256
+
+
+def gold_reachable(world):
+    """True if some gold can be reached from the start without stepping on a pit or wumpus."""
+    cells = world.cells
+    size = world.size
+    seen = {(0, 0)}
+    queue = deque(seen)
+    while queue:
+        r, c = queue.popleft()
+        if cells.get(r, c) & GOLD:
+            return True
+        for nr in range(max(r - 1, 0), min(r + 2, size)):
+            for nc in range(max(c - 1, 0), min(c + 2, size)):
+                if (nr, nc) not in seen and not cells.get(nr, nc) & HAZARD:
+                    seen.add((nr, nc))
+                    queue.append((nr, nc))
+    return False
+
+
+FILTERS = {"solvable": gold_reachable}
+
+
+class WorldPool:
+    """Pools of ready boards per configuration, see the module docstring."""
+    def __init__(self, size=32, rate=200.0, filter=None, max_configs=4, configs=(), seed=None):
+        self.size = size
+        self.rate = rate
+        self.filter = filter
+        self.max_configs = max_configs
+        self._pinned = set(configs)
+        self._pools = OrderedDict((config, deque()) for config in configs)   # least recently requested first
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._rng = random.Random(seed)
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.rejected = 0
+        self._thread = None
+        if size:
+            self._thread = threading.Thread(target=self._run, name="world-pool", daemon=True)
+            self._thread.start()
+
+    def take(self, config):
+        """
+        A fresh World for `config`, or None when its pool is empty (or it
+        is not pooled) and the caller has to generate one itself.
+        """
+        if not self.size or config[0] * config[0] > MAX_POOLED_CELLS:
+            return None
+        with self._lock:
+            pool = self._pools.get(config)
+            if pool is None:
+                self._pools[config] = pool = deque()
+                self._drop_configs()
+            else:
+                self._pools.move_to_end(config)
+            world = pool.popleft() if pool else None
+            if world is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self._wake.set()
+        return world
+
+    def _drop_configs(self):
+        # Under the lock: forget the least recently requested unpinned pools
+        surplus = len(self._pools) - len(self._pinned) - self.max_configs
+        for config in [config for config in self._pools if config not in self._pinned][:max(surplus, 0)]:
+            del self._pools[config]
+
+    def _next_config(self):
+        # The configuration with the fewest ready boards, None when all are full
+        with self._lock:
+            short = [(len(pool), config) for config, pool in self._pools.items() if len(pool) < self.size]
+        return min(short)[1] if short else None
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            config = self._next_config()
+            if config is None:
+                self._wake.wait()
+                continue
+            world = World(*config, rng=self._rng)
+            self.generated += 1
+            if self.filter is not None and not self.filter(world):
+                self.rejected += 1
+            else:
+                with self._lock:
+                    pool = self._pools.get(config)
+                    if pool is not None and len(pool) < self.size:
+                        pool.append(world)
+            if self.rate:
+                time.sleep(1 / self.rate)
+
+    def stats(self):
+        with self._lock:
+            ready = sum(len(pool) for pool in self._pools.values())
+            configs = len(self._pools)
+        lookups = self.hits + self.misses
+        return {
+            "ready": ready,
+            "configs": configs,
+            "size": self.size,
+            "rate": self.rate,
+            "hits": self.hits,
+            "misses": self.misses,
+            "generated": self.generated,
+            "rejected": self.rejected,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,179 @@
+"""
+Memoised decisions for /api/preview-best-move.
+
+Knowledge states are canonicalised under the 8 symmetries of the square
+board (rotations and reflections), so mirror-image states share one cache
+entry. The cached Decision lives in canonical coordinates and is mapped
+back to the caller's orientation on the way out. Under a symmetry the
+mapped move has the same category and path length as a direct solve; only
+ties between equally good moves may be broken differently.
+"""
+from functools import lru_cache
+
+from game.cache import LRUCache
+from game.cells import encode_visible
+from game.knowledge import Knowledge
+from game.logic import Decision, decide
+
+_encode = lru_cache(maxsize=256)(encode_visible)
+
+# Larger boards are only cached as sent: trying 8 orientations costs more
+# than the rare mirror-image hit saves
+SYMMETRY_LIMIT = 64 * 64
+
+
+def _transforms(n):
+    # (r, c) -> (r', c') for the 8 elements of the dihedral group
+    m = n - 1
+    return (
+        lambda r, c: (r, c),
+        lambda r, c: (c, m - r),
+        lambda r, c: (m - r, m - c),
+        lambda r, c: (m - c, r),
+        lambda r, c: (r, m - c),
+        lambda r, c: (m - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (m - c, m - r),
+    )
+
+
+@lru_cache(maxsize=16)
+def symmetry_tables(rows, cols):
+    """
+    For each symmetry of a rows x cols board, a (source, forward) pair of
+    index tables: source[j] is the original index that lands on j, and
+    forward[i] is where original index i lands. Non-square boards, and
+    boards larger than SYMMETRY_LIMIT cells, only get the identity.
+    """
+    square = rows == cols and rows * cols <= SYMMETRY_LIMIT
+    transforms = _transforms(rows) if square else _transforms(rows)[:1]
+    tables = []
+    for transform in transforms:
+        forward = [0] * (rows * cols)
+        source = [0] * (rows * cols)
+        for r in range(rows):
+            for c in range(cols):
+                tr, tc = transform(r, c)
+                forward[r * cols + c] = tr * cols + tc
+                source[tr * cols + tc] = r * cols + c
+        tables.append((tuple(source), tuple(forward)))
+    return tuple(tables)
+
+
+def solve_key(key):
+    """Decision for a CanonicalState key, in canonical coordinates."""
+    rows, cols, flags, agent_index, prev_index = key
+    knowledge = Knowledge.from_flags(rows, cols, flags)
+    prev_cell = divmod(prev_index, cols) if prev_index >= 0 else None
+    return decide(knowledge, divmod(agent_index, cols), prev_cell)
+
+
+def _solve_keys(keys):
+    # Process pool task for PreviewSolver.decide_many
+    return [solve_key(key) for key in keys]
+
+
+class CanonicalState:
+    """A knowledge state in canonical orientation plus the way back."""
+    def __init__(self, visible_grid, agent_pos, prev_cell=None):
+        rows = len(visible_grid)
+        cols = len(visible_grid[0]) if rows > 0 else 0
+        if any(len(row) != cols for row in visible_grid):
+            raise ValueError("visibleGrid rows must all have the same length")
+        flat = bytes(_encode(cell) for row in visible_grid for cell in row)
+        agent_index = agent_pos[0] * cols + agent_pos[1]
+        prev_index = prev_cell[0] * cols + prev_cell[1] if prev_cell else -1
+
+        best = None
+        for source, forward in symmetry_tables(rows, cols):
+            key = (
+                bytes(map(flat.__getitem__, source)),
+                forward[agent_index],
+                forward[prev_index] if prev_index >= 0 else -1,
+            )
+            if best is None or key < best[0]:
+                best = (key, source)
+
+        self.rows = rows
+        self.cols = cols
+        self.key = (rows, cols) + best[0]
+        self._source = best[1]
+
+    def _from_canonical(self, pos):
+        if pos is None:
+            return None
+        return divmod(self._source[pos[0] * self.cols + pos[1]], self.cols)
+
+    def solve(self):
+        """Decide in canonical coordinates."""
+        return solve_key(self.key)
+
+    def restore(self, decision):
+        """Map a canonical Decision back to the caller's orientation."""
+        trace = dict(decision.trace)
+        if trace.get("prev_cell") is not None:
+            trace["prev_cell"] = self._from_canonical(trace["prev_cell"])
+        return Decision(
+            list(self._from_canonical(decision.move)),
+            decision.category,
+            self._from_canonical(decision.target),
+            trace,
+        )
+
+
+class PreviewSolver:
+    """Canonicalising LRU/TTL memo in front of logic.decide."""
+    def __init__(self, maxsize=4096, ttl=600):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def decide(self, visible_grid, agent_pos, prev_cell=None):
+        state = CanonicalState(visible_grid, agent_pos, prev_cell)
+        decision = self.cache.get(state.key)
+        if decision is None:
+            decision = state.solve()
+            self.cache.set(state.key, decision)
+        return state.restore(decision)
+
+    def decide_many(self, items, executor=None, workers=1, min_chunk=4):
+        """
+        Decide a batch of (visible_grid, agent_pos) items. States that are
+        the same up to symmetry are solved once, cached ones not at all, and
+        the rest are split evenly over the `workers` processes of `executor`
+        (a process pool), in chunks of at least min_chunk states since a
+        state takes about a millisecond to solve and a round trip to a
+        worker about 200 microseconds.
+        Returns (results, stats): results has one Decision or ValueError per
+        item, in input order.
+        """
+        results = [None] * len(items)
+        states = [None] * len(items)
+        decisions = {}
+        for i, (visible_grid, agent_pos) in enumerate(items):
+            try:
+                state = CanonicalState(visible_grid, agent_pos)
+            except ValueError as e:
+                results[i] = e
+                continue
+            states[i] = state
+            if state.key not in decisions:
+                decisions[state.key] = self.cache.get(state.key)
+
+        missing = [key for key, decision in decisions.items() if decision is None]
+        chunk_size = max(min_chunk, -(-len(missing) // workers))
+        if executor is not None and len(missing) > chunk_size:
+            chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+            solved = [decision for chunk in executor.map(_solve_keys, chunks) for decision in chunk]
+        else:
+            solved = _solve_keys(missing)
+        for key, decision in zip(missing, solved):
+            decisions[key] = decision
+            self.cache.set(key, decision)
+
+        for i, state in enumerate(states):
+            if state is not None:
+                results[i] = state.restore(decisions[state.key])
+        stats = {"items": len(items), "unique": len(decisions), "solved": len(missing)}
+        return results, stats
+
+    def stats(self):
+        return self.cache.stats()
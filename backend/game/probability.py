@@ -0,0 +1,470 @@
+"""
+Hazard probabilities for the frontier (unknown cells next to a visited
+cell), by counting the pit/wumpus placements consistent with what the
+agent has seen.
+
+Every visited cell with known percepts constrains its unknown neighbours:
+a breeze means at least one pit among them, no breeze means none, and the
+same for stench and wumpuses. Frontier cells linked by an "at least one"
+constraint form a component. Each component is solved on its own by
+enumerating its consistent assignments, grouped by how many pits and
+wumpuses they use; the groups are then weighted by the number of ways to
+put the remaining hazards on the unconstrained unknown cells, which gives
+exact probabilities for the board's pit and wumpus counts.
+
+Solved components are cached by shape (cell kinds and constraints, not
+board position), so an unchanged component is not enumerated again on the
+next move, nor in another game. A component too large to enumerate is
+sampled instead and its probabilities are estimates.
+"""
+import math
+import random
+
+from game.cache import LRUCache
+from game.cells import PIT, WUMPUS, BREEZE, STENCH, HAZARD, CONTENT
+from game.utils import DIRECTIONS
+
+BOTH = PIT | WUMPUS
+
+# Components with more cells, or whose enumeration visits more search
+# nodes than NODE_BUDGET, are sampled
+EXACT_LIMIT = 24
+NODE_BUDGET = 200000
+SAMPLE_SWEEPS = 400
+SAMPLE_BURN_IN = 50
+
+# Largest (pits, wumpuses) table combined exactly across components. Above
+# it (huge boards with many hazards) components are weighted by the hazard
+# densities instead, which is what the exact weights tend to anyway.
+COMBINE_LIMIT = 256
+
+# Component shape -> (table, exact), shared by every game
+_components = LRUCache(maxsize=4096)
+
+
+class HazardProbabilities:
+    """
+    Result of hazard_probabilities(). `cells` maps every frontier cell to
+    its (pit, wumpus) probability, `outside` is the same for an unknown
+    cell off the frontier and `sampled` holds the cells whose values are
+    sampled estimates rather than exact.
+    """
+    def __init__(self, cells, outside, sampled):
+        self.cells = cells
+        self.outside = outside
+        self.sampled = sampled
+
+    def risk(self, pos):
+        """Probability that pos holds a pit or a wumpus."""
+        pit, wumpus = self.cells.get(tuple(pos), self.outside)
+        return pit + wumpus
+
+
+class _TooLarge(Exception):
+    pass
+
+
+def _neighbours(knowledge, pos):
+    r, c = pos
+    for dr, dc in DIRECTIONS:
+        nr, nc = r + dr, c + dc
+        if knowledge.in_bounds(nr, nc):
+            yield nr, nc
+
+
+def _constraints(knowledge):
+    """
+    (allowed, groups): allowed maps each frontier cell to the hazard kinds
+    it may hold (PIT/WUMPUS mask), groups lists the "at least one" sets as
+    (kind, frozenset of cells). None if a constraint cannot be met.
+    """
+    visited = knowledge.visited
+    table = knowledge.paths.adjacency
+    if table is not None:
+        neighbours = table.__getitem__
+    else:
+        def neighbours(pos):
+            return _neighbours(knowledge, pos)
+    allowed = dict.fromkeys(knowledge.frontier, BOTH)
+    sources = {nbr for pos in allowed for nbr in neighbours(pos) if nbr in visited}
+    raw = set()
+    for pos in sources:
+        flags = knowledge.flags_at(pos)
+        if flags & CONTENT:
+            # Hazard and gold cells do not show their percepts
+            continue
+        unknown = []
+        known = 0
+        for nbr in neighbours(pos):
+            if nbr in visited:
+                known |= knowledge.flags_at(nbr) & HAZARD
+            else:
+                unknown.append(nbr)
+        for kind, percept in ((PIT, BREEZE), (WUMPUS, STENCH)):
+            if not flags & percept:
+                for nbr in unknown:
+                    allowed[nbr] &= ~kind
+            elif not known & kind:
+                raw.add((kind, frozenset(unknown)))
+
+    groups = []
+    for kind, members in raw:
+        members = frozenset(pos for pos in members if allowed[pos] & kind)
+        if not members:
+            return None
+        groups.append((kind, members))
+    return allowed, groups
+
+
+def _components_of(allowed, groups):
+    """Split the constrained cells into independent components: lists of (cells, groups)."""
+    parent = {}
+
+    def find(pos):
+        while parent[pos] != pos:
+            parent[pos] = parent[parent[pos]]
+            pos = parent[pos]
+        return pos
+
+    for _, members in groups:
+        members = iter(members)
+        first = next(members)
+        parent.setdefault(first, first)
+        root = find(first)
+        for pos in members:
+            parent.setdefault(pos, pos)
+            other = find(pos)
+            if other != root:
+                parent[other] = root
+    # Cells limited to one kind but in no group are components of their own
+    for pos, mask in allowed.items():
+        if mask and mask != BOTH and pos not in parent:
+            parent[pos] = pos
+
+    cells = {}
+    for pos in parent:
+        cells.setdefault(find(pos), []).append(pos)
+    grouped = {root: [] for root in cells}
+    for group in groups:
+        grouped[find(next(iter(group[1])))].append(group)
+    return [(sorted(cells[root]), grouped[root]) for root in cells]
+
+
+def _shape(cells, groups, allowed):
+    """Position-free cache key of a component."""
+    index = {pos: i for i, pos in enumerate(cells)}
+    return (
+        tuple(allowed[pos] for pos in cells),
+        tuple(sorted((kind, tuple(sorted(index[pos] for pos in members))) for kind, members in groups)),
+    )
+
+
+def _enumerate(masks, groups):
+    """
+    Every consistent assignment, as {(pits, wumpuses): [count, pit hits,
+    wumpus hits]} with per-cell hit counts. Cells with the same kinds and
+    the same groups are interchangeable, so the search picks how many of
+    each such class hold a pit or a wumpus and counts the arrangements
+    instead of visiting them. Raises _TooLarge past NODE_BUDGET search
+    nodes.
+    """
+    n = len(masks)
+    member_of = [[] for _ in range(n)]
+    for g, (_, members) in enumerate(groups):
+        for i in members:
+            member_of[i].append(g)
+    classes = {}
+    for i in range(n):
+        classes.setdefault((masks[i], tuple(member_of[i])), []).append(i)
+    classes = list(classes.items())
+
+    kinds = [kind for kind, _ in groups]
+    hits = [0] * len(groups)
+    left = [0] * len(groups)
+    options = []
+    for (mask, class_groups), cells in classes:
+        for g in class_groups:
+            left[g] += 1
+        k = len(cells)
+        max_pits = k if mask & PIT else 0
+        max_wumpuses = k if mask & WUMPUS else 0
+        options.append([
+            (a, b, math.comb(k, a) * math.comb(k - a, b))
+            for a in range(max_pits + 1)
+            for b in range(min(max_wumpuses, k - a) + 1)
+        ])
+    chosen = [None] * len(classes)
+    found = {}   # (pits, wumpuses) -> [count, pits per class, wumpuses per class]
+    nodes = 0
+
+    def walk(i, pits, wumpuses, ways):
+        nonlocal nodes
+        nodes += 1
+        if nodes > NODE_BUDGET:
+            raise _TooLarge
+        if i == len(classes):
+            entry = found.get((pits, wumpuses))
+            if entry is None:
+                entry = found[(pits, wumpuses)] = [0, [0] * len(classes), [0] * len(classes)]
+            entry[0] += ways
+            for j, (a, b, _) in enumerate(chosen):
+                entry[1][j] += ways * a
+                entry[2][j] += ways * b
+            return
+        class_groups = classes[i][0][1]
+        for a, b, count in options[i]:
+            ok = True
+            for g in class_groups:
+                left[g] -= 1
+                hits[g] += a if kinds[g] == PIT else b
+                if not hits[g] and not left[g]:
+                    ok = False
+            if ok:
+                chosen[i] = (a, b, count)
+                walk(i + 1, pits + a, wumpuses + b, ways * count)
+            for g in class_groups:
+                left[g] += 1
+                hits[g] -= a if kinds[g] == PIT else b
+
+    walk(0, 0, 0, 1)
+
+    # Each cell of a class of k holds 1/k of the class's hazards
+    table = {}
+    for key, (count, class_pits, class_wumpuses) in found.items():
+        pit_hits = [0] * n
+        wumpus_hits = [0] * n
+        for ((_, _), cells), pits, wumpuses in zip(classes, class_pits, class_wumpuses):
+            for j in cells:
+                pit_hits[j] = pits // len(cells)
+                wumpus_hits[j] = wumpuses // len(cells)
+        table[key] = [count, pit_hits, wumpus_hits]
+    return table
+
+
+def _sample(masks, groups, seed):
+    """
+    Gibbs sample of the consistent assignments, uniform over them, in the
+    same table format as _enumerate (counts are sample counts). None if no
+    starting assignment was found.
+    """
+    rng = random.Random(seed)
+    n = len(masks)
+    member_of = [[] for _ in range(n)]
+    for g, (_, members) in enumerate(groups):
+        for i in members:
+            member_of[i].append(g)
+    kinds = [kind for kind, _ in groups]
+
+    # Greedy start: put the group's hazard on a free member of each unmet group
+    state = [0] * n
+    for kind, members in groups:
+        if any(state[i] == kind for i in members):
+            continue
+        free = [i for i in members if not state[i]]
+        if not free:
+            return None
+        state[rng.choice(free)] = kind
+    hits = [sum(state[i] == kind for i in members) for kind, members in groups]
+
+    table = {}
+    for sweep in range(SAMPLE_SWEEPS + SAMPLE_BURN_IN):
+        for i in range(n):
+            options = []
+            for s in (0, PIT, WUMPUS):
+                if s and not masks[i] & s:
+                    continue
+                if all(hits[g] - (state[i] == kinds[g]) + (s == kinds[g]) for g in member_of[i]):
+                    options.append(s)
+            s = rng.choice(options)
+            for g in member_of[i]:
+                hits[g] += (s == kinds[g]) - (state[i] == kinds[g])
+            state[i] = s
+        if sweep < SAMPLE_BURN_IN:
+            continue
+        pits = state.count(PIT)
+        wumpuses = state.count(WUMPUS)
+        entry = table.get((pits, wumpuses))
+        if entry is None:
+            entry = table[(pits, wumpuses)] = [0, [0] * n, [0] * n]
+        entry[0] += 1
+        for j, s in enumerate(state):
+            if s == PIT:
+                entry[1][j] += 1
+            elif s == WUMPUS:
+                entry[2][j] += 1
+    return table
+
+
+def solve_component(shape):
+    """(table, exact) for a component shape, cached."""
+    cached = _components.get(shape)
+    if cached is not None:
+        return cached
+    masks, groups = shape
+    table = None
+    exact = len(masks) <= EXACT_LIMIT
+    if exact:
+        try:
+            table = _enumerate(masks, groups)
+        except _TooLarge:
+            exact = False
+    if not exact:
+        table = _sample(masks, groups, hash(shape))
+    if table is not None:
+        table = {key: (count, tuple(pits), tuple(wumpuses)) for key, (count, pits, wumpuses) in table.items()}
+    _components.set(shape, (table, exact))
+    return table, exact
+
+
+def _log_comb(n, k):
+    if k < 0 or k > n:
+        return -math.inf
+    return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+
+
+def _convolve(a, b, max_pits, max_wumpuses):
+    out = {}
+    for (p1, w1), x in a.items():
+        for (p2, w2), y in b.items():
+            key = (p1 + p2, w1 + w2)
+            if key[0] <= max_pits and key[1] <= max_wumpuses:
+                out[key] = out.get(key, 0.0) + x * y
+    # Only ratios matter, keep the numbers in float range
+    scale = max(out.values(), default=0.0)
+    if scale:
+        out = {key: value / scale for key, value in out.items()}
+    return out
+
+
+def _exact_weights(tables, free, pits, wumpuses):
+    """
+    Weight of each (pits, wumpuses) group of each component given the
+    other components and the `free` unconstrained cells, plus the expected
+    (pits, wumpuses) left for the free cells. None if nothing fits.
+    """
+    counts = [{key: float(entry[0]) for key, entry in table.items()} for table in tables]
+    prefix = [{(0, 0): 1.0}]
+    for dist in counts:
+        prefix.append(_convolve(prefix[-1], dist, pits, wumpuses))
+    suffix = [{(0, 0): 1.0}]
+    for dist in reversed(counts):
+        suffix.append(_convolve(suffix[-1], dist, pits, wumpuses))
+    suffix.reverse()
+
+    log_prior = {}
+
+    def prior(p, w):
+        value = log_prior.get((p, w))
+        if value is None:
+            rest = pits - p
+            value = log_prior[(p, w)] = _log_comb(free, rest) + _log_comb(free - rest, wumpuses - w)
+        return value
+
+    total = prefix[-1]
+    top = max((prior(*key) for key in total), default=-math.inf)
+    if top == -math.inf:
+        return None
+
+    def scaled(p, w):
+        if p > pits or w > wumpuses:
+            return 0.0
+        return math.exp(prior(p, w) - top)
+
+    weights = []
+    for i, table in enumerate(tables):
+        others = _convolve(prefix[i], suffix[i + 1], pits, wumpuses)
+        weights.append({
+            (p, w): sum(x * scaled(p + op, w + ow) for (op, ow), x in others.items())
+            for p, w in table
+        })
+
+    mass = expected_pits = expected_wumpuses = 0.0
+    for (p, w), x in total.items():
+        x *= scaled(p, w)
+        mass += x
+        expected_pits += x * (pits - p)
+        expected_wumpuses += x * (wumpuses - w)
+    if not mass:
+        return None
+    return weights, (expected_pits / mass, expected_wumpuses / mass)
+
+
+def _density_weights(tables, free, pits, wumpuses):
+    """Approximate _exact_weights with independent per-cell hazard densities."""
+    cells = free + sum(len(next(iter(table.values()))[1]) for table in tables if table)
+    if not cells:
+        return None
+    pit_rate = pits / cells
+    wumpus_rate = wumpuses / cells
+    empty_rate = 1.0 - pit_rate - wumpus_rate
+    if empty_rate <= 0:
+        return None
+    weights = [
+        {(p, w): (pit_rate / empty_rate) ** p * (wumpus_rate / empty_rate) ** w for p, w in table}
+        for table in tables
+    ]
+    return weights, (pit_rate * free, wumpus_rate * free)
+
+
+def hazard_probabilities(knowledge):
+    """
+    HazardProbabilities for the knowledge's frontier, or None when what
+    was seen cannot be explained by its pit and wumpus counts.
+    """
+    constraints = _constraints(knowledge)
+    if constraints is None:
+        return None
+    allowed, groups = constraints
+
+    components = []
+    for cells, component_groups in _components_of(allowed, groups):
+        table, exact = solve_component(_shape(cells, component_groups, allowed))
+        if not table:
+            return None
+        components.append((cells, table, exact))
+
+    constrained = sum(len(cells) for cells, _, _ in components)
+    safe = sum(1 for mask in allowed.values() if not mask)
+    free = knowledge.rows * knowledge.cols - len(knowledge.visited) - constrained - safe
+    pits = knowledge.pit_count - knowledge.known_pits
+    wumpuses = knowledge.wumpus_count - knowledge.known_wumpuses
+    if pits < 0 or wumpuses < 0:
+        return None
+
+    tables = [table for _, table, _ in components]
+    max_pits = min(pits, sum(max(p for p, _ in table) for table in tables))
+    max_wumpuses = min(wumpuses, sum(max(w for _, w in table) for table in tables))
+    if (max_pits + 1) * (max_wumpuses + 1) <= COMBINE_LIMIT:
+        combined = _exact_weights(tables, free, pits, wumpuses)
+    else:
+        combined = _density_weights(tables, free, pits, wumpuses)
+    if combined is None:
+        return None
+    weights, (outside_pits, outside_wumpuses) = combined
+    outside = (outside_pits / free, outside_wumpuses / free) if free else (0.0, 0.0)
+
+    probabilities = {}
+    sampled = set()
+    for (cells, table, exact), weight in zip(components, weights):
+        mass = sum(entry[0] * weight[key] for key, entry in table.items())
+        if not mass:
+            return None
+        for j, pos in enumerate(cells):
+            pit = sum(entry[1][j] * weight[key] for key, entry in table.items()) / mass
+            wumpus = sum(entry[2][j] * weight[key] for key, entry in table.items()) / mass
+            probabilities[pos] = (pit, wumpus)
+        if not exact:
+            sampled.update(cells)
+
+    for pos, mask in allowed.items():
+        if pos not in probabilities:
+            probabilities[pos] = outside if mask else (0.0, 0.0)
+    return HazardProbabilities(probabilities, outside, sampled)
+
+
+def cache_stats():
+    return _components.stats()
+
+
+def cache_clear():
+    _components.clear()
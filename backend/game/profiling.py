@@ -0,0 +1,128 @@
+"""
+Opt-in cProfile sampling for request handlers and hot game calls.
+
+A profile is taken for one request in every WUMPUS_PROFILE_EVERY (0, the
+default, turns sampling off) or for a request that asks for it with the
+X-Profile header. Agent.make_move and logic.get_best_move are wrapped
+with profiled(): called outside a profiled request (simulator, scripts)
+they are sampled the same way on their own, inside one they are simply
+part of it. The last WUMPUS_PROFILE_KEEP profiles are kept in memory and
+served by the admin endpoints in app.py.
+
+cProfile only sees the thread it runs on, and only one profile runs at a
+time; a request that would start a second one is not profiled.
+"""
+import cProfile
+import functools
+import io
+import itertools
+import marshal
+import os
+import pstats
+import threading
+import time
+from collections import deque
+
+
+class ProfileRecord:
+    """One finished profile."""
+    def __init__(self, record_id, name, started_at, duration, profile):
+        self.id = record_id
+        self.name = name
+        self.started_at = started_at
+        self.duration = duration
+        self._profile = profile
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+        }
+
+    def dump(self):
+        """The profile in the binary format of cProfile's dump_stats (.prof)."""
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)
+
+    def text(self, sort="cumulative", limit=50):
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+class Profiler:
+    def __init__(self, every=0, keep=20):
+        self.every = every
+        self.records = deque(maxlen=keep)
+        self._ids = itertools.count(1)
+        self._calls = itertools.count(1)
+        self._busy = threading.Lock()
+        self._local = threading.local()
+
+    def _sampled(self):
+        return self.every > 0 and next(self._calls) % self.every == 0
+
+    def active(self):
+        """True while this thread is being profiled."""
+        return getattr(self._local, "profile", None) is not None
+
+    def start(self, force=False):
+        """
+        Start profiling this thread if it is sampled (or `force`) and no
+        other profile is running. Returns a token for stop(), or None.
+        """
+        if self.active() or not (force or self._sampled()):
+            return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        self._local.profile = profile
+        token = (profile, time.time(), time.perf_counter())
+        profile.enable()
+        return token
+
+    def stop(self, token, name):
+        """Finish the profile started with `token` and keep it as `name`."""
+        if token is None:
+            return None
+        profile, started_at, start = token
+        profile.disable()
+        duration = time.perf_counter() - start
+        self._local.profile = None
+        self._busy.release()
+        record = ProfileRecord(next(self._ids), name, started_at, duration, profile)
+        self.records.append(record)
+        return record
+
+    def get(self, record_id):
+        for record in list(self.records):
+            if record.id == record_id:
+                return record
+        return None
+
+    def list(self):
+        return [record.to_dict() for record in list(self.records)]
+
+
+PROFILER = Profiler(
+    every=int(os.environ.get("WUMPUS_PROFILE_EVERY", "0")),
+    keep=int(os.environ.get("WUMPUS_PROFILE_KEEP", "20")),
+)
+
+
+def profiled(name):
+    """Decorator: sample calls to the function as profiles named `name` (see module docstring)."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if PROFILER.every <= 0 or PROFILER.active():
+                return func(*args, **kwargs)
+            token = PROFILER.start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                PROFILER.stop(token, name)
+        return wrapper
+    return decorate
@@ -0,0 +1,206 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from game.world import World
+from game.agent import Agent
+from game.persistence import decode_game, encode_game
+
+
+class GameSession:
+    """
+    One client's game: its own World/Agent pair plus a lock, so requests
+    for the same game are serialised while different games never contend.
+    """
+    __slots__ = ("id", "world", "agent", "lock", "speculation", "last_used")
+
+    def __init__(self, session_id, world, agent):
+        self.id = session_id
+        self.world = world
+        self.agent = agent
+        self.lock = threading.Lock()
+        # ((epoch, state_version), Decision) precomputed by game.speculation
+        self.speculation = None
+        self.last_used = time.monotonic()
+
+    def replace_world(self, world):
+        """
+        Start over on a different world (e.g. another board size). Epochs
+        keep counting up so deltas against the old game are never served.
+        """
+        epoch = self.agent.epoch
+        self.world = world
+        self.agent = Agent(world)
+        self.agent.epoch += epoch
+        self.speculation = None
+
+    def release(self):
+        """Drop what the game can rebuild (see Agent.release) while it sits idle."""
+        self.agent.release()
+        self.speculation = None
+
+
+class GameStore:
+    """
+    Session-keyed store of games. The store lock only guards the dict
+    lookup/insert; all game state is mutated under the per-session lock.
+    With `snapshots` (a game.persistence.SnapshotStore) games are saved
+    with save() and games not in memory are loaded on first access.
+
+    Games are kept in least recently used order. A game idle for more
+    than `idle_ttl` seconds, or the oldest once there are more than
+    `max_sessions`, is evicted from memory; with snapshots it is loaded
+    again on its next request, without them it is gone. Only the
+    `hot_sessions` most recently used games keep their solver state
+    (knowledge, memoised decisions, planner), the others are released to
+    their compact form and rebuild it on next use. None disables a limit.
+    Eviction happens as games are accessed; with `sweep_interval` a
+    background thread also sweeps out expired games every that many
+    seconds, so they leave memory while no requests come in.
+
+    Memory per default 5x5 game (`python benchmark.py --memory`): about
+    1.7 KB released (plus 9 bytes per move of history) and 5 to 10 KB hot, so
+    100k released games take about 170 MB. A hot game is mostly its
+    Knowledge; a released one is the session, lock, board and history
+    objects themselves.
+    """
+    def __init__(self, size=5, pit_count=3, wumpus_count=1, gold_count=1, snapshots=None,
+                 max_sessions=None, idle_ttl=None, hot_sessions=None, sweep_interval=None):
+        self.size = size
+        self.pit_count = pit_count
+        self.wumpus_count = wumpus_count
+        self.gold_count = gold_count
+        self.snapshots = snapshots
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.hot_sessions = hot_sessions
+        self._sessions = OrderedDict()   # session id -> game, least recently used first
+        self._hot = OrderedDict()        # the games holding solver state, same order
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.releases = 0
+        self._sweeper = None
+        if sweep_interval and idle_ttl is not None:
+            self._sweeper = threading.Thread(
+                target=self._sweep_every, args=(sweep_interval,), name="session-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def new_world(self, size=None, pit_count=None, wumpus_count=None, gold_count=None):
+        """A World with the store defaults for any setting left as None."""
+        return World(
+            size=self.size if size is None else size,
+            pit_count=self.pit_count if pit_count is None else pit_count,
+            wumpus_count=self.wumpus_count if wumpus_count is None else wumpus_count,
+            gold_count=self.gold_count if gold_count is None else gold_count,
+        )
+
+    def _new_game(self, session_id):
+        world = self.new_world()
+        agent = Agent(world)
+        return GameSession(session_id, world, agent)
+
+    def _touch(self, game):
+        # Under the store lock: mark game as just used, evict expired and
+        # surplus games, and return the games that fell out of the hot set
+        game.last_used = time.monotonic()
+        self._sessions.move_to_end(game.id)
+        self._hot[game.id] = game
+        self._hot.move_to_end(game.id)
+        self._evict(game.last_used, keep=game)
+        cooled = []
+        if self.hot_sessions is not None:
+            while len(self._hot) > self.hot_sessions:
+                cooled.append(self._hot.popitem(last=False)[1])
+        return cooled
+
+    def _evict(self, now, keep=None):
+        # Oldest first; a game whose lock is held is in use and stays
+        for _ in range(len(self._sessions)):
+            session_id, game = next(iter(self._sessions.items()))
+            expired = self.idle_ttl is not None and now - game.last_used > self.idle_ttl
+            surplus = self.max_sessions is not None and len(self._sessions) > self.max_sessions
+            if not (expired or surplus):
+                break
+            if game is keep or game.lock.locked():
+                self._sessions.move_to_end(session_id)
+                continue
+            del self._sessions[session_id]
+            self._hot.pop(session_id, None)
+            self.evictions += 1
+
+    def _cool(self, games):
+        for game in games:
+            # Skipped when in use, it is hot again on its next access anyway
+            if game.lock.acquire(blocking=False):
+                try:
+                    game.release()
+                finally:
+                    game.lock.release()
+                self.releases += 1
+
+    def _insert(self, game):
+        with self._lock:
+            # Another request may have loaded it meanwhile: keep that one
+            game = self._sessions.setdefault(game.id, game)
+            cooled = self._touch(game)
+        self._cool(cooled)
+        return game
+
+    def create(self):
+        # Build the world outside the store lock, only the insert is shared
+        session_id = uuid.uuid4().hex
+        return self._insert(self._new_game(session_id))
+
+    def get(self, session_id):
+        if not session_id:
+            return None
+        cooled = []
+        with self._lock:
+            game = self._sessions.get(session_id)
+            if game is not None:
+                cooled = self._touch(game)
+        self._cool(cooled)
+        if game is None and self.snapshots is not None:
+            game = self._load(session_id)
+        return game
+
+    def _load(self, session_id):
+        blob = self.snapshots.load(session_id)
+        if blob is None:
+            return None
+        world, agent = decode_game(blob)
+        return self._insert(GameSession(session_id, world, agent))
+
+    def sweep(self):
+        """Evict the games idle for longer than idle_ttl."""
+        with self._lock:
+            self._evict(time.monotonic())
+
+    def _sweep_every(self, interval):
+        while True:
+            time.sleep(interval)
+            self.sweep()
+
+    def save(self, game):
+        """Snapshot a game whose lock is held; a no-op without a snapshot store."""
+        if self.snapshots is not None:
+            self.snapshots.save(game.id, encode_game(game.world, game.agent))
+
+    def get_or_create(self, session_id):
+        game = self.get(session_id)
+        if game is None:
+            game = self.create()
+        return game
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "hot": len(self._hot),
+                "evictions": self.evictions,
+                "releases": self.releases,
+            }
@@ -0,0 +1,192 @@
+"""
+Headless batch simulator: plays seeded games with World/Agent directly,
+no Flask involved, spread across a process pool.
+
+    python -m game.simulate -n 2000 --strategy logic agent
+    python -m game.simulate -n 2000 --worlds numpy   # boards from game.worldgen
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from game.world import World
+from game.agent import Agent
+
+OUTCOMES = ("win", "pit", "wumpus", "stuck")
+
+
+def _logic_step(agent):
+    # Agent.make_move without a manual position uses logic.get_best_move
+    agent.make_move()
+
+
+def _agent_step(agent):
+    move, _ = agent.choose_best_move()
+    if move is None:
+        agent.game_over = True
+        return
+    agent.make_move(manual_pos=tuple(move))
+
+
+# Per-move budget of the "rollout" strategy, kept small so batches finish
+ROLLOUT_BUDGET = 0.05
+
+
+def _rollout_step(agent):
+    agent.make_move(decision=agent.plan(ROLLOUT_BUDGET))
+
+
+STRATEGIES = {
+    "logic": _logic_step,
+    "agent": _agent_step,
+    "rollout": _rollout_step,
+}
+
+
+def play_game(seed, strategy="logic", size=5, pit_count=3, wumpus_count=1, gold_count=1, max_moves=None, cells=None):
+    """
+    Play one game to the end and return {"seed", "outcome", "moves"}.
+    The world depends only on the seed, so every strategy sees the same boards.
+    `cells` plays a pre-generated board (row-major flag bytes, see
+    game.worldgen) instead of a random one.
+    A game that runs out of moves or hits max_moves counts as "stuck".
+    """
+    random.seed(seed)
+    if cells is None:
+        world = World(size=size, pit_count=pit_count, wumpus_count=wumpus_count, gold_count=gold_count)
+    else:
+        world = World.wrap(bytearray(cells), size, pit_count, wumpus_count, gold_count)
+    agent = Agent(world)
+    step = STRATEGIES[strategy]
+    if max_moves is None:
+        max_moves = size * size * 4
+
+    steps = 0
+    while not agent.game_over and steps < max_moves:
+        step(agent)
+        steps += 1
+    moves = agent.history.total
+
+    cell = world.cell_name(agent.pos)
+    if cell == "gold":
+        outcome = "win"
+    elif cell in ("pit", "wumpus"):
+        outcome = cell
+    else:
+        outcome = "stuck"
+    return {"seed": seed, "outcome": outcome, "moves": moves}
+
+
+def _play_chunk(args):
+    seeds, kwargs, boards = args
+    if boards is None:
+        return [play_game(seed, **kwargs) for seed in seeds]
+    return [play_game(seed, cells=cells, **kwargs) for seed, cells in zip(seeds, boards)]
+
+
+def run_batch(games, strategy="logic", seed=0, workers=None, chunk_size=64, worlds="random", **world_kwargs):
+    """
+    Play `games` games with seeds seed..seed+games-1 and return a summary
+    dict with outcome rates, moves per game and games/sec.
+    worlds="numpy" generates all boards up front with game.worldgen (seeded
+    by `seed`) instead of one World.reset per game.
+    """
+    start = time.perf_counter()
+    seeds = list(range(seed, seed + games))
+    kwargs = dict(world_kwargs, strategy=strategy)
+    boards = [None] * games
+    if worlds == "numpy":
+        from game.worldgen import generate_worlds
+        board_kwargs = {key: value for key, value in world_kwargs.items() if key != "max_moves"}
+        boards = [board.tobytes() for board in generate_worlds(games, seed=seed, **board_kwargs)]
+    chunks = [
+        (seeds[i:i + chunk_size], kwargs, None if worlds != "numpy" else boards[i:i + chunk_size])
+        for i in range(0, len(seeds), chunk_size)
+    ]
+
+    results = []
+    if workers == 1:
+        for chunk in chunks:
+            results.extend(_play_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_results in pool.map(_play_chunk, chunks):
+                results.extend(chunk_results)
+    elapsed = time.perf_counter() - start
+
+    counts = {outcome: 0 for outcome in OUTCOMES}
+    total_moves = 0
+    for result in results:
+        counts[result["outcome"]] += 1
+        total_moves += result["moves"]
+    n = len(results) or 1
+    return {
+        "strategy": strategy,
+        "worlds": worlds,
+        "games": len(results),
+        "rates": {outcome: counts[outcome] / n for outcome in OUTCOMES},
+        "counts": counts,
+        "moves_per_game": total_moves / n,
+        "seconds": elapsed,
+        "games_per_sec": len(results) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def format_summary(summary):
+    rates = summary["rates"]
+    return (
+        f"{summary['strategy']:<8} games={summary['games']:<6} "
+        f"win={rates['win']:.1%} pit={rates['pit']:.1%} "
+        f"wumpus={rates['wumpus']:.1%} stuck={rates['stuck']:.1%} "
+        f"moves/game={summary['moves_per_game']:.2f} "
+        f"games/sec={summary['games_per_sec']:.0f}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play seeded Wumpus games headlessly.")
+    parser.add_argument("-n", "--games", type=int, default=1000)
+    parser.add_argument("--strategy", nargs="+", choices=sorted(STRATEGIES), default=["logic"],
+                        help="one or more strategies, all played on the same seeds")
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--size", type=int, default=5)
+    parser.add_argument("--pits", type=int, default=3)
+    parser.add_argument("--wumpus", type=int, default=1)
+    parser.add_argument("--gold", type=int, default=1)
+    parser.add_argument("--max-moves", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="process pool size, 1 runs in-process")
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--worlds", choices=["random", "numpy"], default="random",
+                        help="numpy: generate every board up front (needs numpy)")
+    parser.add_argument("--json", action="store_true", help="print summaries as JSON")
+    args = parser.parse_args(argv)
+
+    summaries = []
+    for strategy in args.strategy:
+        summaries.append(run_batch(
+            args.games,
+            strategy=strategy,
+            seed=args.seed,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            worlds=args.worlds,
+            size=args.size,
+            pit_count=args.pits,
+            wumpus_count=args.wumpus,
+            gold_count=args.gold,
+            max_moves=args.max_moves,
+        ))
+
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        for summary in summaries:
+            print(format_summary(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Speculative precomputation of each game's next decision.
+
+After a request changes a game, schedule() queues the decision for the
+new state on a background thread: it takes the game lock, runs
+Agent.decide() (hazard probabilities and path search) and renders the
+reason, and stores the result on the session against the (epoch,
+state_version) it was computed for. The next next-move or preview for
+that state is answered by lookup() without solving anything. A state that
+moved on before the worker got to it is skipped, and invalidate() (called
+on manual moves) drops a pending or stored result.
+
+WUMPUS_SPECULATE=0 turns it off.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from game.metrics import METRICS
+
+
+class Speculator:
+    def __init__(self, enabled=True, workers=1):
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speculate") if enabled else None
+        self._pending = {}   # session id -> future
+        self._lock = threading.Lock()
+
+    def schedule(self, game):
+        """Queue the next decision of a game whose lock is held."""
+        if not self.enabled or game.agent.game_over:
+            return
+        version = (game.agent.epoch, game.agent.state_version)
+        future = self._executor.submit(self._run, game, version)
+        with self._lock:
+            previous = self._pending.get(game.id)
+            self._pending[game.id] = future
+        if previous is not None:
+            previous.cancel()
+        future.add_done_callback(lambda done: self._forget(game.id, done))
+
+    def _forget(self, session_id, future):
+        with self._lock:
+            if self._pending.get(session_id) is future:
+                del self._pending[session_id]
+
+    def _run(self, game, version):
+        with game.lock:
+            agent = game.agent
+            if (agent.epoch, agent.state_version) != version or agent.game_over:
+                METRICS.count_speculation("stale")
+                return
+            decision = agent.decide()
+            decision.reason   # rendered now, not on the request path
+            game.speculation = (version, decision)
+        METRICS.count_speculation("computed")
+
+    def invalidate(self, game):
+        """Drop the pending and stored decision of a game whose lock is held."""
+        with self._lock:
+            future = self._pending.pop(game.id, None)
+        if future is not None and future.cancel():
+            METRICS.count_speculation("cancelled")
+        game.speculation = None
+
+    def lookup(self, game):
+        """The precomputed Decision for the game's current state, or None."""
+        if not self.enabled:
+            return None
+        speculation = game.speculation
+        agent = game.agent
+        if speculation is not None and speculation[0] == (agent.epoch, agent.state_version):
+            METRICS.count_speculation("hit")
+            return speculation[1]
+        METRICS.count_speculation("miss")
+        return None
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+
+SPECULATOR = Speculator(enabled=os.environ.get("WUMPUS_SPECULATE", "1") != "0")
@@ -0,0 +1,45 @@
+# 8-neighbourhood offsets, in the order every search and scan visits them
+DIRECTIONS = [(-1,0),(1,0),(0,-1),(0,1),(-1,-1),(-1,1),(1,-1),(1,1)]
+
+
+def column_label(col):
+    """Spreadsheet-style column label: 0 -> A, 25 -> Z, 26 -> AA, 27 -> AB."""
+    if col < 0:
+        raise ValueError(f"Invalid column: {col}")
+    label = ""
+    col += 1
+    while col:
+        col, rem = divmod(col - 1, 26)
+        label = chr(65 + rem) + label
+    return label
+
+
+def column_index(label):
+    """Inverse of column_label: A -> 0, AA -> 26."""
+    col = 0
+    for ch in label.upper():
+        if not "A" <= ch <= "Z":
+            raise ValueError(f"Invalid column label: {label!r}")
+        col = col * 26 + ord(ch) - 64
+    return col - 1
+
+
+def pos_to_label(pos):
+    """[row, col] -> board label, e.g. [2, 1] -> "B3", [0, 27] -> "AB1"."""
+    return f"{column_label(pos[1])}{pos[0] + 1}"
+
+
+def label_to_pos(label):
+    """Board label -> (row, col), e.g. "B3" -> (2, 1)."""
+    split = len(label) - len(label.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"))
+    if not split or not label[split:].isdigit():
+        raise ValueError(f"Invalid board label: {label!r}")
+    return int(label[split:]) - 1, column_index(label[:split])
+
+
+def board_labels(top, left, height, width):
+    """Column and row labels of a (top, left, height, width) board window."""
+    return {
+        "cols": [column_label(c) for c in range(left, left + width)],
+        "rows": list(range(top + 1, top + height + 1)),
+    }
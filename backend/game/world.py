@@ -1,12 +1,80 @@
 import random
+from array import array
+
+from game.cells import (
+    PIT, WUMPUS, GOLD, BREEZE, STENCH, VISITED, HAZARD, CONTENT, PERCEPTS,
+    VISIBLE_NAMES, CellGrid, content_name, percept_names, visible_name,
+)
+
+
+# bytes.translate table keeping only the VISITED bit of each cell
+_VISITED_ONLY = bytes(flags & VISITED for flags in range(256))
+
+# Side of the window sent to clients by default on boards larger than this
+VIEWPORT_SIZE = 64
+
 
 class World:
-    def __init__(self, size=5, pit_count=3, wumpus_count=1, gold_count=1):
+    """
+    One board. Content, percept and VISITED flags share a byte per cell in
+    `cells` (see game.cells), so the visited cells need no set of their
+    own; the visible grid and the per-cell percepts are derived from those
+    flags when asked for.
+    """
+    __slots__ = ("size", "pit_count", "wumpus_count", "gold_count", "cells", "agent_pos", "reveal_log")
+
+    def __init__(self, size=5, pit_count=3, wumpus_count=1, gold_count=1, rng=None):
         self.size = size
         self.pit_count = pit_count
         self.wumpus_count = wumpus_count
         self.gold_count = gold_count
-        self.reset()
+        self.reset(rng)
+
+    @classmethod
+    def wrap(cls, cells, size, pit_count=None, wumpus_count=None, gold_count=None):
+        """
+        World over an existing board: `cells` is a row-major buffer of
+        size * size content and percept flags, e.g. one board of
+        game.worldgen.WorldBatch. Counts left as None are read from the
+        board. reset_visits() replays the same board; reset() draws a new
+        random one.
+        """
+        world = cls.__new__(cls)
+        world.size = size
+        world.cells = CellGrid.from_dense(size, size, cells)
+        counts = {PIT: 0, WUMPUS: 0, GOLD: 0}
+        if None in (pit_count, wumpus_count, gold_count):
+            for _, _, flags in world.cells.items():
+                for flag in counts:
+                    if flags & flag:
+                        counts[flag] += 1
+        world.pit_count = counts[PIT] if pit_count is None else pit_count
+        world.wumpus_count = counts[WUMPUS] if wumpus_count is None else wumpus_count
+        world.gold_count = counts[GOLD] if gold_count is None else gold_count
+        world.cells.clear(VISITED)
+        world.reveal_log = array("I")
+        world.reset_visits()
+        return world
+
+    @classmethod
+    def restore(cls, size, pit_count, wumpus_count, gold_count, content, visited):
+        """
+        World rebuilt from its content cells, as (pos, flag) pairs, and its
+        visited cells in reveal order (see game.persistence).
+        """
+        world = cls.__new__(cls)
+        world.size = size
+        world.pit_count = pit_count
+        world.wumpus_count = wumpus_count
+        world.gold_count = gold_count
+        world.cells = CellGrid(size)
+        for pos, flag in content:
+            world._place(pos, flag)
+        world.agent_pos = [0, 0]
+        world.reveal_log = array("I")
+        for pos in visited:
+            world.visit(pos)
+        return world
 
     def to_dict(self):
         return {
@@ -17,110 +85,218 @@ class World:
             'pits': list(self.pits),
         }
 
-    def reset(self):
-        self.grid = [["empty" for _ in range(self.size)] for _ in range(self.size)]
-
-        # Place multiple wumpuses
-        self.wumpus_positions = set()
-        while len(self.wumpus_positions) < self.wumpus_count:
-            pos = (random.randint(0, self.size - 1), random.randint(0, self.size - 1))
-            if pos != (0, 0) and pos not in self.wumpus_positions:
-                self.wumpus_positions.add(pos)
-                self.grid[pos[0]][pos[1]] = "wumpus"
-
-        # Place multiple golds
-        self.gold_positions = set()
-        while len(self.gold_positions) < self.gold_count:
-            pos = (random.randint(0, self.size - 1), random.randint(0, self.size - 1))
-            if pos != (0, 0) and pos not in self.wumpus_positions and pos not in self.gold_positions:
-                self.gold_positions.add(pos)
-                self.grid[pos[0]][pos[1]] = "gold"
-
-        # Place multiple pits
-        self.pits = set()
-        while len(self.pits) < self.pit_count:
-            pos = (random.randint(0, self.size - 1), random.randint(0, self.size - 1))
-            if pos != (0, 0) and pos not in self.wumpus_positions and pos not in self.gold_positions and pos not in self.pits:
-                self.pits.add(pos)
-                self.grid[pos[0]][pos[1]] = "pit"
+    @property
+    def pits(self):
+        return self._positions(PIT)
+
+    @property
+    def wumpus_positions(self):
+        return self._positions(WUMPUS)
+
+    @property
+    def gold_positions(self):
+        return self._positions(GOLD)
+
+    def _positions(self, flag):
+        return {(r, c) for r, c, flags in self.cells.items() if flags & flag}
+
+    def reset(self, rng=None):
+        """New random board; `rng` (a random.Random) defaults to the random module."""
+        # Content flags (PIT/WUMPUS/GOLD) plus the precomputed percept flags
+        # (BREEZE/STENCH), stored sparsely: only chunks around hazards exist
+        self.cells = CellGrid(self.size)
+
+        # Place multiple wumpuses, then golds, then pits, never on the start
+        # cell or on top of each other
+        rng = random if rng is None else rng
+        self._place_random(WUMPUS, self.wumpus_count, rng)
+        self._place_random(GOLD, self.gold_count, rng, self.wumpus_count)
+        self._place_random(PIT, self.pit_count, rng, self.wumpus_count + self.gold_count)
 
         self.agent_pos = [0, 0]
-        self.grid[0][0] = "empty"
-        self.visited = set()
-        self.visited.add((0, 0))
-        self.visited_percepts = {}
-        self.visited_percepts[(0, 0)] = self.get_percepts((0, 0))
+        self.reveal_log = array("I")
+        self.visit((0, 0))
 
-    def place_entities(self, entity, count):
+    def _place_random(self, flag, count, rng=random, occupied=0):
+        """
+        Put `count` entities on random free cells, `occupied` being how many
+        cells already hold one. Sparse boards draw cells until a free one
+        comes up; dense ones, where that could retry for a long time, sample
+        the free cells without replacement.
+        """
+        size = self.size
+        if count * 4 > size * size - 1 - occupied:
+            free = [
+                (r, c) for r in range(size) for c in range(size)
+                if (r, c) != (0, 0) and not self.cells.get(r, c) & CONTENT
+            ]
+            for pos in rng.sample(free, count):
+                self._place(pos, flag)
+            return
         placed = 0
         while placed < count:
-            r = random.randint(0, self.size - 1)
-            c = random.randint(0, self.size - 1)
-            # Avoid start cell and no overlapping entities
-            if (r, c) == (0, 0):
-                continue
-            if self.grid[r][c] == "empty":
-                self.grid[r][c] = entity
+            pos = (rng.randint(0, self.size - 1), rng.randint(0, self.size - 1))
+            if pos != (0, 0) and not self.cells.get(*pos) & CONTENT:
+                self._place(pos, flag)
                 placed += 1
 
+    def reset_visits(self):
+        """Forget every visited cell except the start."""
+        self.agent_pos = [0, 0]
+        for r, c in self.revealed():
+            self.cells.set(r, c, self.cells.get(r, c) & ~VISITED)
+        # Visited cells in reveal order, as r * size + c; version is its length
+        self.reveal_log = array("I")
+        self.visit((0, 0))
+
+    @property
+    def version(self):
+        return len(self.reveal_log)
+
+    def is_visited(self, pos):
+        return bool(self.cells.get(pos[0], pos[1]) & VISITED)
+
+    def revealed(self, start=0):
+        """Visited cells in reveal order from version `start`, as (r, c)."""
+        size = self.size
+        return [divmod(index, size) for index in self.reveal_log[start:]]
+
+    def cell_percepts(self, cells=None):
+        """
+        "r,c" -> percept names of the given cells (every visited cell by
+        default), as sent to clients.
+        """
+        if cells is None:
+            cells = self.revealed()
+        return {f"{r},{c}": percept_names(self.cells.get(r, c) & PERCEPTS) for r, c in cells}
+
+    def _place(self, pos, flag):
+        """Put an entity on the board and add its percept to the 3x3 around it."""
+        r, c = pos
+        self.cells.set(r, c, (self.cells.get(r, c) & PERCEPTS) | flag)
+        percept = BREEZE if flag == PIT else STENCH if flag == WUMPUS else 0
+        if percept:
+            for nr in range(max(r - 1, 0), min(r + 2, self.size)):
+                for nc in range(max(c - 1, 0), min(c + 2, self.size)):
+                    self.cells.add(nr, nc, percept)
+
+    def place_entities(self, entity, count):
+        flag = {"pit": PIT, "wumpus": WUMPUS, "gold": GOLD}[entity]
+        self._place_random(flag, count)
+
     def in_bounds(self, r, c):
         return 0 <= r < self.size and 0 <= c < self.size
 
+    def cell_at(self, pos):
+        """Content flags (PIT/WUMPUS/GOLD) at pos, 0 for an empty cell."""
+        return self.cells.get(pos[0], pos[1]) & CONTENT
+
+    def cell_name(self, pos):
+        """Content of pos as "pit", "wumpus", "gold" or "empty"."""
+        return content_name(self.cell_at(pos))
+
+    def percept_flags(self, pos):
+        """
+        BREEZE if pos is next to (or on) a pit, STENCH if next to (or on)
+        a wumpus, adjacency including diagonals. Precomputed by reset().
+        """
+        return self.cells.get(pos[0], pos[1]) & PERCEPTS
+
     def get_percepts(self, pos):
         """
         Return list of percepts at given position:
         - 'breeze' if adjacent to pit
         - 'stench' if adjacent to wumpus
         """
-        r, c = pos
-        percepts = []
-
-        # Adjacent (including diagonals) cells to check
-        neighbors = [
-            (r-1, c), (r+1, c), (r, c-1), (r, c+1),
-            (r-1, c-1), (r-1, c+1), (r+1, c-1), (r+1, c+1)
-        ]
+        return percept_names(self.percept_flags(pos))
 
-        for nr, nc in neighbors:
-            if self.in_bounds(nr, nc):
-                if self.grid[nr][nc] == "pit" and "breeze" not in percepts:
-                    percepts.append("breeze")
-                if self.grid[nr][nc] == "wumpus" and "stench" not in percepts:
-                    percepts.append("stench")
-
-        # Include percepts of the current cell
-        if self.grid[r][c] == "pit" and "breeze" not in percepts:
-            percepts.append("breeze")
-        if self.grid[r][c] == "wumpus" and "stench" not in percepts:
-            percepts.append("stench")
+    def get_visible_flags(self, pos):
+        """
+        Visible flags of a visited cell: VISITED plus its actual content if
+        any, otherwise its percepts.
+        """
+        flags = self.cells.get(pos[0], pos[1]) | VISITED
+        if flags & CONTENT:
+            return VISITED | (flags & CONTENT)
+        return flags
 
-        return percepts
+    def get_visible_cell(self, pos):
+        """
+        Display value of a visited cell: actual content if any, otherwise
+        its percepts joined with '+' (e.g. "breeze+stench"), or "empty".
+        """
+        return visible_name(self.get_visible_flags(pos))
 
-    def get_visible_grid(self):
+    def get_visible_grid(self, window=None):
         """
         Returns a grid for display where:
         - visited cells show actual content or perceptual info (breeze, stench)
         - others show 'unknown'
+        window=(top, left, height, width) limits it to a viewport, clipped to
+        the board. Rows without a visited cell are one shared list, so rows
+        must not be mutated.
         """
+        top, left, height, width = self.clip_window(window)
+        unknown = ["unknown"] * width
         visible_grid = []
-        for r in range(self.size):
-            row = []
-            for c in range(self.size):
-                if (r, c) in self.visited:
-                    # Prioritize actual content over percepts if available
-                    if self.grid[r][c] != "empty":
-                        row.append(self.grid[r][c])
-                    else:
-                        percepts = self.visited_percepts.get((r, c), [])
-                        if percepts:
-                            row.append("+".join(percepts))  # e.g., "breeze+stench"
-                        else:
-                            row.append("empty")  # or some other default
-                else:
-                    row.append("unknown")
+        for r in range(top, top + height):
+            flags = self.cells.row(r, left, width)
+            # Visited cells of the row, found with bytes.find rather than a
+            # Python loop over every cell
+            seen = flags.translate(_VISITED_ONLY)
+            c = seen.find(VISITED)
+            if c < 0:
+                visible_grid.append(unknown)
+                continue
+            row = unknown[:]
+            while c >= 0:
+                # Stored flags with the VISITED bit index VISIBLE_NAMES directly
+                row[c] = VISIBLE_NAMES[flags[c]]
+                c = seen.find(VISITED, c + 1)
             visible_grid.append(row)
         return visible_grid
 
+    def clip_window(self, window=None):
+        """(top, left, height, width) clipped to the board; None is the whole board."""
+        if window is None:
+            return 0, 0, self.size, self.size
+        top, left, height, width = window
+        top = min(max(top, 0), self.size)
+        left = min(max(left, 0), self.size)
+        height = min(max(height, 0), self.size - top)
+        width = min(max(width, 0), self.size - left)
+        return top, left, height, width
+
+    def window_around(self, pos, span):
+        """span x span window centred on pos, shifted to stay on the board."""
+        span = min(span, self.size)
+        top = min(max(pos[0] - span // 2, 0), self.size - span)
+        left = min(max(pos[1] - span // 2, 0), self.size - span)
+        return top, left, span, span
+
+    def default_window(self, pos=None):
+        """
+        Window sent to clients: the whole board, or VIEWPORT_SIZE around the
+        agent (or pos). It moves in steps of a quarter window, so most moves
+        keep the client's window and can be answered with a delta.
+        """
+        if self.size <= VIEWPORT_SIZE:
+            return 0, 0, self.size, self.size
+        r, c = self.agent_pos if pos is None else pos
+        step = VIEWPORT_SIZE // 4
+        return self.window_around((r // step * step + step // 2, c // step * step + step // 2), VIEWPORT_SIZE)
+
+    def visit(self, pos):
+        """
+        Mark pos as visited. Returns the content flags of the cell.
+        """
+        r, c = pos
+        flags = self.cells.get(r, c)
+        if not flags & VISITED:
+            self.cells.add(r, c, VISITED)
+            self.reveal_log.append(r * self.size + c)
+        return flags & CONTENT
+
     def move_agent(self, new_pos):
         """
         Move agent to new_pos, update visited cells.
@@ -133,15 +309,9 @@ class World:
             raise ValueError("Move out of bounds")
 
         self.agent_pos = [r, c]
-        self.visited.add((r, c))
-
-        cell = self.grid[r][c]
-        percepts = self.get_percepts((r, c))
-
-        # Always update visited_percepts for every visited cell
-        self.visited_percepts[(r, c)] = percepts
+        self.visit((r, c))
 
-        return cell, percepts
+        return self.cell_name((r, c)), self.get_percepts((r, c))
 
     def is_safe(self, pos):
         """
@@ -150,8 +320,7 @@ class World:
         r, c = pos
         if not self.in_bounds(r, c):
             return False
-        cell = self.grid[r][c]
-        return cell not in ("pit", "wumpus")
+        return not self.cell_at(pos) & HAZARD
 
     def print_debug(self):
         """
@@ -169,5 +338,5 @@ class World:
                 if (r, c) == tuple(self.agent_pos):
                     row_str += "A "
                 else:
-                    row_str += symbol_map.get(self.grid[r][c], "?") + " "
+                    row_str += symbol_map.get(self.cell_name((r, c)), "?") + " "
             print(row_str)
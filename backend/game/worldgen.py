@@ -0,0 +1,91 @@
+"""
+Vectorised world generation with NumPy: B boards of N x N cells at once,
+for training and evaluation sets. Needs numpy, which the game itself does
+not.
+
+Each board is a uint8 array of the same cell flags World uses (see
+game.cells): content cells are sampled without replacement from every
+cell but the start, and the breeze/stench fields are 3x3 neighbourhood
+sums of the pit/wumpus masks, the same box World._place adds percepts to.
+
+    batch = WorldBatch(1000, seed=7)
+    world = batch.world(0)    # a World over batch.cells[0], no copy
+"""
+import numpy as np
+
+from game.cells import PIT, WUMPUS, GOLD, BREEZE, STENCH
+from game.world import World
+
+
+def neighbourhood_any(mask):
+    """(B, N, N) bool: True where the 3x3 box around a cell holds a True cell of mask."""
+    padded = np.pad(mask, ((0, 0), (1, 1), (1, 1)))
+    n_rows, n_cols = mask.shape[1:]
+    total = np.zeros(mask.shape, dtype=np.uint8)
+    for dr in range(3):
+        for dc in range(3):
+            total += padded[:, dr:dr + n_rows, dc:dc + n_cols]
+    return total > 0
+
+
+def generate_worlds(batch, size=5, pit_count=3, wumpus_count=1, gold_count=1, seed=None):
+    """
+    (batch, size, size) uint8 array of boards with content and percept
+    flags. The same seed (an int or a sequence of ints, as for
+    numpy.random.default_rng) always gives the same boards.
+    """
+    placed = wumpus_count + gold_count + pit_count
+    free = size * size - 1
+    if placed > free:
+        raise ValueError("Too many pits, wumpuses and golds for the board size")
+
+    rng = np.random.default_rng(seed)
+    cells = np.zeros((batch, size * size), dtype=np.uint8)
+    if placed:
+        # The `placed` smallest of one random key per free cell, in key
+        # order: a uniform sample without replacement, uniformly ordered
+        keys = rng.random((batch, free))
+        chosen = np.argpartition(keys, placed - 1, axis=1)[:, :placed]
+        order = np.argsort(np.take_along_axis(keys, chosen, axis=1), axis=1)
+        chosen = np.take_along_axis(chosen, order, axis=1) + 1  # skip the start cell
+        flags = np.repeat(
+            np.array([WUMPUS, GOLD, PIT], dtype=np.uint8),
+            [wumpus_count, gold_count, pit_count],
+        )
+        np.put_along_axis(cells, chosen, np.broadcast_to(flags, chosen.shape), axis=1)
+
+    cells = cells.reshape(batch, size, size)
+    cells[neighbourhood_any((cells & PIT) > 0)] |= BREEZE
+    cells[neighbourhood_any((cells & WUMPUS) > 0)] |= STENCH
+    return cells
+
+
+class WorldBatch:
+    """
+    A batch of generated boards plus World objects over its slices. The
+    worlds write to the batch's array, so keep the batch alive while they
+    are used.
+    """
+    def __init__(self, batch, size=5, pit_count=3, wumpus_count=1, gold_count=1, seed=None):
+        self.size = size
+        self.pit_count = pit_count
+        self.wumpus_count = wumpus_count
+        self.gold_count = gold_count
+        self.cells = generate_worlds(batch, size, pit_count, wumpus_count, gold_count, seed)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def world(self, index):
+        """World wrapping board `index` (its flags are not copied)."""
+        return World.wrap(
+            memoryview(self.cells[index].reshape(-1)),
+            self.size,
+            pit_count=self.pit_count,
+            wumpus_count=self.wumpus_count,
+            gold_count=self.gold_count,
+        )
+
+    def worlds(self):
+        for index in range(len(self.cells)):
+            yield self.world(index)
@@ -0,0 +1,273 @@
+"""
+HTTP load generator: simulated players against a local backend, with
+throughput, error rate and p50/p95/p99 latency per endpoint.
+
+Each player follows the frontend's call pattern: /api/init, a
+preview-best-move, then next-move (or, with --manual-ratio, a manual move
+to a random neighbour) followed by another preview, with delta requests
+(epoch/stateVersion) like App.jsx, and a new game when one ends.
+
+    python loadtest.py                           # starts its own server on a free port
+    python loadtest.py --clients 1 5 10 20 --duration 15
+    python loadtest.py --url http://127.0.0.1:5000 --clients 8
+
+Without --url a server is started with `app.run(threaded=True)` and games
+in memory only (WUMPUS_DB empty). Only the standard library is used.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+ENDPOINTS = ("init", "preview", "next_move", "manual_move")
+
+# Moves of history a client keeps, HISTORY_WINDOW in App.jsx
+HISTORY_WINDOW = 50
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Recorder:
+    """Latencies and errors per endpoint, shared by all players."""
+    def __init__(self):
+        self.latencies = {endpoint: [] for endpoint in ENDPOINTS}
+        self.errors = {endpoint: 0 for endpoint in ENDPOINTS}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def summary(self, elapsed):
+        rows = {}
+        for endpoint in ENDPOINTS:
+            values = sorted(self.latencies[endpoint])
+            if not values:
+                continue
+            rows[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / len(values),
+                "rps": len(values) / elapsed,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+            }
+        return rows
+
+
+def apply_response(state, data):
+    # App.jsx applyResponse: merge a delta into the state we hold
+    if not data.get("delta") or state is None:
+        return data
+    top, left = state["viewport"]["top"], state["viewport"]["left"]
+    grid = [row[:] for row in state["visible_grid"]]
+    for r, c, cell in data["changed_cells"]:
+        row, col = r - top, c - left
+        if 0 <= row < len(grid) and 0 <= col < len(grid[row]):
+            grid[row][col] = cell
+    merged = dict(state)
+    merged.update({k: v for k, v in data.items() if k not in ("changed_cells", "delta", "base_version")})
+    merged["visible_grid"] = grid
+    merged["cell_percepts"] = {**state["cell_percepts"], **data["cell_percepts"]}
+    merged["move_history"] = (state["move_history"] + data["move_history"])[-HISTORY_WINDOW:]
+    return merged
+
+
+class Player(threading.Thread):
+    def __init__(self, host, port, recorder, stop, manual_ratio, think_time, init_query, seed):
+        super().__init__(daemon=True)
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+        self.recorder = recorder
+        self.stop = stop
+        self.manual_ratio = manual_ratio
+        self.think_time = think_time
+        self.init_query = init_query
+        self.rng = random.Random(seed)
+        self.session_id = None
+        self.state = None
+
+    def call(self, endpoint, method, path, body=None):
+        headers = {"Content-Type": "application/json"}
+        if self.session_id:
+            headers["X-Session-Id"] = self.session_id
+        payload = json.dumps(body).encode() if body is not None else None
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            raw = response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.recorder.record(endpoint, time.perf_counter() - start, False)
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - start, ok)
+        return json.loads(raw) if ok else None
+
+    def since(self):
+        return {"epoch": self.state["epoch"], "stateVersion": self.state["state_version"]}
+
+    def restart(self):
+        data = self.call("init", "GET", "/api/init" + self.init_query)
+        if data is not None:
+            self.session_id = data["session_id"]
+        self.state = data
+
+    def preview(self):
+        top, left = self.state["viewport"]["top"], self.state["viewport"]["left"]
+        pos = self.state["agent_pos"]
+        self.call("preview", "POST", "/api/preview-best-move", {
+            "visibleGrid": self.state["visible_grid"],
+            "agentPos": [pos[0] - top, pos[1] - left],
+        })
+
+    def move(self):
+        if self.rng.random() < self.manual_ratio:
+            size = self.state["board_size"]
+            r, c = self.state["agent_pos"]
+            options = [
+                [r + dr, c + dc] for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+                if (dr or dc) and 0 <= r + dr < size and 0 <= c + dc < size
+            ]
+            data = self.call("manual_move", "POST", "/api/manual-move", {"move": self.rng.choice(options), **self.since()})
+        else:
+            data = self.call("next_move", "POST", "/api/next-move", self.since())
+        if data is None:
+            self.state = None
+        else:
+            self.state = apply_response(self.state, data)
+
+    def run(self):
+        while not self.stop.is_set():
+            if self.state is None or self.state["game_over"]:
+                self.restart()
+                if self.state is None:
+                    time.sleep(0.1)   # server unreachable, don't spin
+                    continue
+                self.preview()
+            self.move()
+            if self.state is not None:
+                self.preview()
+            if self.think_time:
+                time.sleep(self.think_time)
+        self.conn.close()
+
+
+def run_level(host, port, clients, duration, manual_ratio=0.0, think_time=0.0, init_query="", seed=0):
+    """Run `clients` players for `duration` seconds; per-endpoint summary."""
+    recorder = Recorder()
+    stop = threading.Event()
+    players = [
+        Player(host, port, recorder, stop, manual_ratio, think_time, init_query, seed + i)
+        for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for player in players:
+        player.start()
+    time.sleep(duration)
+    stop.set()
+    for player in players:
+        player.join()
+    return recorder.summary(time.perf_counter() - start)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, env=None):
+    """Start app.py's app on 127.0.0.1:port in a child process and wait for it."""
+    code = f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"
+    server = subprocess.Popen(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "WUMPUS_DB": "", **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/metrics")
+            conn.getresponse().read()
+            conn.close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not start within 30s")
+
+
+def format_level(clients, rows):
+    lines = [f"clients={clients}"]
+    for endpoint, row in rows.items():
+        lines.append(
+            f"  {endpoint:<12} req={row['requests']:<7} rps={row['rps']:>8.1f} "
+            f"err={row['error_rate']:>6.2%} p50={row['p50_ms']:>7.2f}ms "
+            f"p95={row['p95_ms']:>7.2f}ms p99={row['p99_ms']:>7.2f}ms"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="server to test; default: start one locally")
+    parser.add_argument("--clients", nargs="+", type=int, default=[10],
+                        help="concurrent players, one run per value")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--manual-ratio", type=float, default=0.0,
+                        help="share of moves made as manual moves to a random neighbour")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds a player waits between moves")
+    parser.add_argument("--size", type=int, help="board size passed to /api/init")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        server = start_server(port)
+    init_query = f"?size={args.size}" if args.size else ""
+
+    results = []
+    try:
+        for clients in args.clients:
+            rows = run_level(host, port, clients, args.duration, args.manual_ratio, args.think_time, init_query, args.seed)
+            results.append({"clients": clients, "duration": args.duration, "endpoints": rows})
+            print(format_level(clients, rows), flush=True)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
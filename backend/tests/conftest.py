@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+# The app under test keeps games in memory, generates boards on request
+# and decides moves on the request thread
+os.environ.setdefault("WUMPUS_DB", "")
+os.environ.setdefault("WUMPUS_POOL_SIZE", "0")
+os.environ.setdefault("WUMPUS_SPECULATE", "0")
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+@pytest.fixture
+def session(client):
+    """Headers of a new game session."""
+    return {"X-Session-Id": client.get("/api/init").get_json()["session_id"]}
@@ -0,0 +1,36 @@
+import random
+
+from game import book
+from game.agent import Agent
+from game.knowledge import Knowledge
+from game.logic import decide
+from game.world import World
+
+
+def knowledge_of(world):
+    knowledge = Knowledge(world.size, pit_count=world.pit_count, wumpus_count=world.wumpus_count)
+    for pos in world.revealed():
+        knowledge.reveal(pos, world.get_visible_flags(pos))
+    return knowledge
+
+
+def test_book_moves_match_the_engine(monkeypatch):
+    no_book = book.OpeningBook(path="/nonexistent/opening.book")
+    hits = 0
+    for seed in range(40):
+        random.seed(seed)
+        world = World()
+        agent = Agent(world)
+        while not agent.game_over:
+            pos, prev_cell = list(agent.pos), agent.previous_cell()
+            if book.BOOK.lookup(knowledge_of(world), pos) is not None:
+                hits += 1
+                from_book = decide(knowledge_of(world), pos, prev_cell)
+                monkeypatch.setattr(book, "BOOK", no_book)
+                solved = decide(knowledge_of(world), pos, prev_cell)
+                monkeypatch.undo()
+                assert (from_book.move, from_book.category, from_book.target) == \
+                    (solved.move, solved.category, solved.target)
+                assert from_book.reason == solved.reason
+            agent.make_move()
+    assert hits > 40
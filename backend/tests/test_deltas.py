@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from app import build_response, games
+from loadtest import apply_response
+
+COMPARED = ("visible_grid", "viewport", "cell_percepts", "move_history", "agent_pos",
+            "percepts", "game_over", "state_version", "history_total")
+
+
+def delta_body(state):
+    return {"epoch": state["epoch"], "stateVersion": state["state_version"]}
+
+
+def assert_matches_snapshot(state, session):
+    snapshot = build_response(games.get(session["X-Session-Id"]))
+    for key in COMPARED:
+        assert state[key] == snapshot[key], key
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_auto_move_deltas_rebuild_the_snapshot(client, session, seed):
+    random.seed(seed)
+    state = client.get("/api/init", headers=session).get_json()
+    deltas = 0
+    while not state["game_over"]:
+        data = client.post("/api/next-move", headers=session, json=delta_body(state)).get_json()
+        deltas += data["delta"]
+        state = apply_response(state, data)
+        assert_matches_snapshot(state, session)
+    assert deltas
+
+
+def test_deltas_follow_the_window_on_large_boards(client, session):
+    state = client.get("/api/init?size=100&pits=0&wumpus=0&gold=0", headers=session).get_json()
+    for step in range(1, 90):
+        moves = [[step, step]]
+        if step % 10 == 0:
+            # Not adjacent: answered with a delta that changes nothing
+            moves.insert(0, [step + 1, step + 1])
+        for move in moves:
+            data = client.post("/api/manual-move", headers=session, json=dict(delta_body(state), move=move)).get_json()
+            state = apply_response(state, data)
+            assert_matches_snapshot(state, session)
+    assert state["viewport"]["top"] > 0
@@ -0,0 +1,51 @@
+from game import history
+from game.history import MoveHistory
+
+
+def filled(moves, limit=history.HISTORY_LIMIT):
+    moves_made = MoveHistory(limit)
+    for i in range(moves):
+        moves_made.append((i % 7, i % 5), history.AUTO)
+    return moves_made
+
+
+def test_pages_cover_the_history_in_order():
+    moves = filled(250)
+    entries, offset = [], 0
+    while offset is not None:
+        page = moves.page(offset, 100)
+        assert page["offset"] == offset and page["total"] == 250
+        entries += page["entries"]
+        offset = page["next_offset"]
+    assert entries == moves.entries()
+    assert len(entries) == 250
+    assert entries[3] == ["D4", history.render_reason((3, 3), history.AUTO)]
+
+
+def test_dropped_moves_are_reported():
+    moves = filled(25, limit=10)
+    assert moves.first == 15
+    page = moves.page(0, 4)
+    assert (page["offset"], page["first_kept"], page["next_offset"]) == (15, 15, 19)
+    assert page["entries"] == moves.entries(15, 19)
+    assert moves.position(14) is None
+    assert moves.position(15) == (15 % 7, 15 % 5)
+    assert moves.position(-1) == (24 % 7, 24 % 5)
+
+
+def test_last_page_and_past_the_end():
+    moves = filled(5)
+    assert moves.page(3, 100)["entries"] == moves.entries(3)
+    assert moves.page(3, 100)["next_offset"] is None
+    assert moves.page(10, 100)["entries"] == []
+    assert moves.recent(2) == moves.entries(3)
+
+
+def test_outcomes_are_rendered():
+    moves = MoveHistory()
+    moves.append((0, 1), history.MANUAL)
+    moves.append((1, 1), history.AUTO | history.GOLD)
+    assert moves.entries() == [
+        ["B1", "Manual move to B1."],
+        ["B2", "Auto-move chosen to B2. Reason: Used best move logic from backend. Found the gold! 🏆"],
+    ]
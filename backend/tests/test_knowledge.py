@@ -0,0 +1,6 @@
+from game.logic import get_best_move
+
+
+def test_path_does_not_cross_visible_pit():
+    # The only unknown cell lies behind a visited pit: no move is safe
+    assert get_best_move([["empty", "pit", "empty", "unknown"]], [0, 0]) == [0, 0]
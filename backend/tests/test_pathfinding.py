@@ -0,0 +1,33 @@
+import random
+
+from game.agent import Agent
+from game.pathfinding import PathFinder
+from game.world import World
+
+
+def test_cached_fields_match_fresh_searches():
+    reused = 0
+    for seed in range(30):
+        random.seed(seed)
+        world = World(8, pit_count=6, wumpus_count=2, gold_count=1)
+        agent = Agent(world)
+        while not agent.game_over:
+            knowledge = agent.knowledge
+            knowledge.update_risk()
+            start = tuple(agent.pos)
+            reused += start in knowledge.paths._fields and knowledge.paths._version == knowledge.passable_version
+            fresh = PathFinder(knowledge.rows, knowledge.cols).find_target(start, knowledge)
+            assert knowledge.paths.find_target(start, knowledge) == fresh
+            agent.make_move()
+    assert reused
+
+
+def test_reveal_that_opens_no_path_keeps_the_version():
+    world = World.restore(4, 1, 0, 0, [((0, 2), 1)], [(0, 0)])
+    agent = Agent(world)
+    knowledge = agent.knowledge
+    version = knowledge.passable_version
+    # (0, 1) was already known safe and shows a breeze: nothing opens or closes
+    assert (0, 1) in knowledge.safe
+    knowledge.reveal((0, 1), world.get_visible_flags((0, 1)))
+    assert knowledge.passable_version == version
@@ -0,0 +1,83 @@
+import random
+import time
+
+from game.agent import Agent
+from game.metrics import METRICS
+from game.persistence import SnapshotStore, decode_game, encode_game
+from game.world import World
+
+
+def played_game(seed, size=8, moves=30):
+    random.seed(seed)
+    world = World(size, pit_count=4, wumpus_count=1, gold_count=1)
+    agent = Agent(world)
+    for _ in range(moves):
+        if agent.game_over:
+            break
+        agent.make_move()
+    return world, agent
+
+
+def test_snapshot_round_trip():
+    for seed in range(10):
+        world, agent = played_game(seed)
+        restored_world, restored_agent = decode_game(encode_game(world, agent))
+
+        assert restored_world.to_dict() == world.to_dict()
+        assert restored_world.revealed() == world.revealed()
+        assert restored_world.get_visible_grid() == world.get_visible_grid()
+        assert restored_agent.pos == agent.pos
+        assert restored_agent.game_over == agent.game_over
+        assert restored_agent.history.page() == agent.history.page()
+        # A restored game asks for a full snapshot before any delta
+        assert restored_agent.epoch > agent.epoch
+        if not agent.game_over:
+            assert restored_agent.decide().move == agent.decide().move
+
+
+def test_store_saves_loads_and_deletes(tmp_path):
+    store = SnapshotStore(str(tmp_path / "games.db"))
+    store.save("a", b"first")
+    store.save("a", b"second")
+    assert store.load("a") == b"second"   # still waiting to be written
+    store.flush()
+    assert store.load("a") == b"second"
+    store.delete("a")
+    store.flush()
+    assert store.load("a") is None
+    store.close()
+
+
+def test_store_prunes_old_snapshots(tmp_path):
+    store = SnapshotStore(str(tmp_path / "games.db"), max_age=60, prune_interval=0.05)
+    store.save("old", b"x")
+    store.flush()
+    # Saved two minutes ago
+    store._writer.execute("UPDATE games SET saved_at = saved_at - 120 / 86400.0")
+    store.save("new", b"y")
+    deadline = time.monotonic() + 5
+    while not store.stats()["pruned"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert store.stats()["pruned"] == 1
+    assert store.load("old") is None
+    assert store.load("new") == b"y"
+    store.close()
+
+
+def test_failed_writes_are_logged_and_counted(tmp_path, caplog):
+    store = SnapshotStore(str(tmp_path / "games.db"), flush_interval=0.01)
+    store._writer.execute("DROP TABLE games")
+    store.save("a", b"x")
+    deadline = time.monotonic() + 5
+    while not store.stats()["errors"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.stats()["errors"]
+    assert "Writing snapshots" in caplog.text
+    assert 'operation="flush"' in "\n".join(METRICS.snapshot_errors.render())
+    assert store.load("a") == b"x"   # kept for the next attempt
+    store._writer.execute(
+        "CREATE TABLE games (session_id TEXT PRIMARY KEY, saved_at REAL NOT NULL, snapshot BLOB NOT NULL)")
+    store.close()
+    reopened = SnapshotStore(str(tmp_path / "games.db"))
+    assert reopened.load("a") == b"x"
+    reopened.close()
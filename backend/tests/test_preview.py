@@ -0,0 +1,71 @@
+import random
+
+from game.agent import Agent
+from game.cells import encode_visible
+from game.knowledge import Knowledge
+from game.logic import decide
+from game.preview import CanonicalState, PreviewSolver, _transforms
+from game.world import World
+
+
+def states(seed, size, moves=12):
+    """(visible_grid, agent_pos) after each move of a played game."""
+    random.seed(seed)
+    world = World(size, pit_count=3, wumpus_count=1, gold_count=1)
+    agent = Agent(world)
+    found = [(world.get_visible_grid(), list(agent.pos))]
+    for _ in range(moves):
+        agent.make_move()
+        if agent.game_over:
+            break
+        found.append((world.get_visible_grid(), list(agent.pos)))
+    return found
+
+
+def transformed(visible_grid, agent_pos, transform):
+    size = len(visible_grid)
+    grid = [[None] * size for _ in range(size)]
+    for r in range(size):
+        for c in range(size):
+            tr, tc = transform(r, c)
+            grid[tr][tc] = visible_grid[r][c]
+    return grid, list(transform(*agent_pos))
+
+
+def test_mirror_images_share_one_entry_and_map_back():
+    for seed in range(6):
+        for visible_grid, agent_pos in states(seed, 5 + seed % 2):
+            transforms = _transforms(len(visible_grid))
+            # Symmetries of the state itself: their images of a move are as good
+            invariant = [t for t in transforms if transformed(visible_grid, agent_pos, t) == (visible_grid, agent_pos)]
+            solver = PreviewSolver()
+            direct = decide(Knowledge.from_visible_grid(visible_grid), agent_pos)
+            first = solver.decide(visible_grid, agent_pos)
+            assert first.category == direct.category
+            for transform in transforms:
+                grid, pos = transformed(visible_grid, agent_pos, transform)
+                decision = solver.decide(grid, pos)
+                # The one cached decision, seen in this orientation
+                assert decision.move in [list(transform(*s(*first.move))) for s in invariant]
+                assert decision.category == first.category
+            assert solver.stats()["size"] == 1
+
+
+def test_canonical_cells_map_back_to_the_callers():
+    visible_grid, agent_pos = states(3, 5)[-1]
+    for transform in _transforms(5):
+        grid, pos = transformed(visible_grid, agent_pos, transform)
+        state = CanonicalState(grid, pos)
+        canonical = state.key[2]
+        for index in range(25):
+            r, c = state._from_canonical(divmod(index, 5))
+            assert canonical[index] == encode_visible(grid[r][c])
+        assert state._from_canonical(divmod(state.key[3], 5)) == tuple(pos)
+
+
+def test_batch_matches_single_previews():
+    items = [item for seed in range(4) for item in states(seed, 5)]
+    batch, stats = PreviewSolver().decide_many(items)
+    single = PreviewSolver()
+    assert [d.move for d in batch] == [single.decide(*item).move for item in items]
+    assert stats["unique"] <= stats["items"] == len(items)
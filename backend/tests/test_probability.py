@@ -0,0 +1,64 @@
+import itertools
+import random
+
+import pytest
+
+from game.cells import HAZARD
+from game.knowledge import Knowledge
+from game.probability import hazard_probabilities
+from game.world import World
+
+
+def brute_force(world, visited):
+    """
+    (pit, wumpus) probability of every unvisited cell, counting every
+    placement of the board's pits and wumpuses that shows the same cells.
+    """
+    size = world.size
+    seen = {pos: world.get_visible_flags(pos) for pos in visited}
+    unknown = [(r, c) for r in range(size) for c in range(size) if (r, c) not in seen and (r, c) != (0, 0)]
+    totals = {pos: [0, 0] for pos in unknown}
+    count = 0
+    for pits in itertools.combinations(unknown, world.pit_count):
+        rest = [pos for pos in unknown if pos not in pits]
+        for wumpuses in itertools.combinations(rest, world.wumpus_count):
+            content = [(pos, 1) for pos in pits] + [(pos, 2) for pos in wumpuses]
+            candidate = World.restore(size, world.pit_count, world.wumpus_count, 0, content, [])
+            if any(candidate.get_visible_flags(pos) != flags for pos, flags in seen.items()):
+                continue
+            count += 1
+            for pos in pits:
+                totals[pos][0] += 1
+            for pos in wumpuses:
+                totals[pos][1] += 1
+    return {pos: (pit / count, wumpus / count) for pos, (pit, wumpus) in totals.items()}
+
+
+def explored(world, steps, rng):
+    """Safe cells a walk from the start could have revealed."""
+    visited = [(0, 0)]
+    for _ in range(steps):
+        options = [
+            (r, c) for vr, vc in visited for r in range(vr - 1, vr + 2) for c in range(vc - 1, vc + 2)
+            if world.in_bounds(r, c) and (r, c) not in visited and not world.cell_at((r, c)) & HAZARD
+        ]
+        if not options:
+            break
+        visited.append(rng.choice(options))
+    return visited
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_probabilities_match_brute_force(seed):
+    rng = random.Random(seed)
+    world = World(4, pit_count=2, wumpus_count=1, gold_count=0, rng=rng)
+    visited = explored(world, rng.randint(0, 4), rng)
+    knowledge = Knowledge(4, pit_count=2, wumpus_count=1)
+    for pos in visited:
+        knowledge.reveal(pos, world.get_visible_flags(pos))
+
+    result = hazard_probabilities(knowledge)
+    assert not result.sampled
+    for pos, (pit, wumpus) in brute_force(world, visited).items():
+        expected = result.cells.get(pos, result.outside)
+        assert expected == pytest.approx((pit, wumpus)), pos
@@ -0,0 +1,85 @@
+import time
+
+from game import session
+from game.persistence import SnapshotStore
+from game.session import GameStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_games_are_evicted():
+    store = GameStore(max_sessions=2)
+    a, b = store.create(), store.create()
+    store.get(a.id)          # b is now the least recently used
+    c = store.create()
+    assert store.get(b.id) is None
+    assert store.get(a.id) is a and store.get(c.id) is c
+    assert store.stats()["evictions"] == 1
+
+
+def test_idle_games_expire(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session.time, "monotonic", clock)
+    store = GameStore(idle_ttl=60)
+    a, b = store.create(), store.create()
+    clock.now += 30
+    store.get(b.id)
+    clock.now += 40
+    store.sweep()
+    assert store.get(a.id) is None
+    assert store.get(b.id) is b
+
+
+def test_games_in_use_are_not_evicted(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session.time, "monotonic", clock)
+    store = GameStore(idle_ttl=60)
+    game = store.create()
+    clock.now += 120
+    with game.lock:
+        store.sweep()
+    assert len(store) == 1
+    store.sweep()
+    assert len(store) == 0
+
+
+def test_sweeper_thread_evicts_idle_games():
+    store = GameStore(idle_ttl=0.05, sweep_interval=0.02)
+    store.create()
+    deadline = time.monotonic() + 5
+    while len(store) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert len(store) == 0
+
+
+def test_only_hot_games_keep_solver_state():
+    store = GameStore(hot_sessions=1)
+    a = store.create()
+    a.agent.decide()
+    assert a.agent._knowledge is not None
+    store.create()
+    assert a.agent._knowledge is None
+    assert store.stats() == {"sessions": 2, "hot": 1, "evictions": 0, "releases": 1}
+    # Rebuilt on next use
+    assert store.get(a.id).agent.decide().move
+
+
+def test_evicted_games_reload_from_snapshots(tmp_path):
+    snapshots = SnapshotStore(str(tmp_path / "games.db"))
+    store = GameStore(snapshots=snapshots, max_sessions=1)
+    a = store.create()
+    with a.lock:
+        a.agent.make_move()
+        store.save(a)
+    store.create()
+    reloaded = store.get(a.id)
+    assert reloaded is not a
+    assert reloaded.agent.pos == a.agent.pos
+    assert reloaded.world.get_visible_grid() == a.world.get_visible_grid()
+    snapshots.close()
@@ -0,0 +1,35 @@
+import pytest
+
+from game.utils import column_index, column_label, label_to_pos, pos_to_label
+
+
+@pytest.mark.parametrize("col, label", [(0, "A"), (25, "Z"), (26, "AA"), (27, "AB"), (701, "ZZ"), (702, "AAA")])
+def test_column_label(col, label):
+    assert column_label(col) == label
+    assert column_index(label) == col
+
+
+@pytest.mark.parametrize("col", [-1, -2, -27])
+def test_column_label_rejects_negative_columns(col):
+    with pytest.raises(ValueError):
+        column_label(col)
+
+
+def test_pos_to_label_round_trip():
+    for pos in [(0, 0), (2, 1), (0, 27), (4095, 4095)]:
+        assert label_to_pos(pos_to_label(pos)) == pos
+    assert pos_to_label([2, 1]) == "B3"
+
+
+@pytest.mark.parametrize("label", ["", "B", "3", "B0x", "1B"])
+def test_label_to_pos_rejects_bad_labels(label):
+    with pytest.raises(ValueError):
+        label_to_pos(label)
+
+
+@pytest.mark.parametrize("move", [[0, -2], [-1, 0], [5, 0], [0, 1.5], [True, 1], "A1", [1]])
+def test_manual_move_rejects_off_board_moves(client, session, move):
+    response = client.post("/api/manual-move", headers=session, json={"move": move})
+    assert response.status_code == 400
+    # The session is still usable afterwards
+    assert client.post("/api/manual-move", headers=session, json={"move": [0, 1]}).status_code == 200
@@ -4,20 +4,56 @@ import Grid from './components/Grid';
 import Explanation from './components/Explanation';
 import './App.css';
 
+// Top-left board cell of the window the server sent (the whole board on small boards)
+const viewportOrigin = state => [state.viewport?.top || 0, state.viewport?.left || 0];
+
+// The server sends at most this many recent moves, /api/history has the rest
+const HISTORY_WINDOW = 50;
+
+// Merge a server response into the state we hold. Delta responses only carry
+// newly revealed cells, percepts and history entries since our stateVersion.
+// Changed cells are in board coordinates; those outside our window are skipped.
+const applyResponse = (prev, data) => {
+  if (!data.delta || !prev) return data;
+  const { changed_cells: changedCells, delta, base_version: baseVersion, ...rest } = data;
+  const [top, left] = viewportOrigin(prev);
+  const visibleGrid = prev.visible_grid.slice();
+  changedCells.forEach(([r, c, cell]) => {
+    const row = r - top;
+    const col = c - left;
+    if (row < 0 || row >= visibleGrid.length || col < 0 || col >= visibleGrid[row].length) return;
+    visibleGrid[row] = visibleGrid[row].slice();
+    visibleGrid[row][col] = cell;
+  });
+  return {
+    ...prev,
+    ...rest,
+    visible_grid: visibleGrid,
+    cell_percepts: { ...prev.cell_percepts, ...data.cell_percepts },
+    move_history: [...prev.move_history, ...data.move_history].slice(-HISTORY_WINDOW),
+  };
+};
+
 function App() {
   const [gameState, setGameState] = useState(null);
   const [manualMove, setManualMove] = useState('');
   const [bestMove, setBestMove] = useState(null);
   const [bestMoveReason, setBestMoveReason] = useState('');
-  
+  const [sessionId, setSessionId] = useState(null);
+
+  // Every game request carries the session id returned by /api/init
+  const sessionHeaders = (id = sessionId) => (id ? { 'X-Session-Id': id } : {});
+  // Tells the server which state we already hold so it can reply with a delta
+  const sinceBody = () => (gameState ? { epoch: gameState.epoch, stateVersion: gameState.state_version } : {});
 
   useEffect(() => {
     restartGame();
   }, []);
 
   const restartGame = () => {
-    axios.get('http://localhost:5000/api/init')
+    axios.get('http://localhost:5000/api/init', { headers: sessionHeaders() })
       .then(res => {
+        setSessionId(res.data.session_id);
         setGameState(res.data);
         setTimeout(() => {
           previewBestMove(res.data);
@@ -28,17 +64,20 @@ function App() {
   
   const previewBestMove = (state = gameState) => {
     if (!state) return;
+    // The preview is solved on the window we hold, in window coordinates
+    const [top, left] = viewportOrigin(state);
   
     axios.post('http://localhost:5000/api/preview-best-move', {
       visibleGrid: state.visible_grid,
-      agentPos: state.agent_pos
+      agentPos: [state.agent_pos[0] - top, state.agent_pos[1] - left]
     }, {
       headers: {
-        'Content-Type': 'application/json'
+        'Content-Type': 'application/json',
+        ...sessionHeaders(state.session_id)
       }
     })  
     .then(res => {
-      setBestMove(res.data.best_move);
+      setBestMove([res.data.best_move[0] + top, res.data.best_move[1] + left]);
       setBestMoveReason(res.data.reason);
     })
     .catch(() => {
@@ -50,25 +89,45 @@ function App() {
   
 
   const handleNextMove = () => {
-    axios.post('http://localhost:5000/api/next-move')
+    axios.post('http://localhost:5000/api/next-move', sinceBody(), { headers: sessionHeaders() })
       .then(res => {
-        setGameState(res.data);
-        previewBestMove();
+        const next = applyResponse(gameState, res.data);
+        setGameState(next);
+        previewBestMove(next);
       })
       .catch(console.error);
   };
 
+  // Let the server play the game out, streaming each move as it is computed
+  const handleAutoplay = () => {
+    if (!sessionId) return;
+    const source = new EventSource(`http://localhost:5000/api/autoplay?session_id=${sessionId}&delay=0.3`);
+    let latest = gameState;
+    source.addEventListener('move', e => {
+      latest = applyResponse(latest, JSON.parse(e.data));
+      setGameState(latest);
+    });
+    source.addEventListener('done', () => {
+      source.close();
+      previewBestMove(latest);
+    });
+    source.onerror = () => source.close();
+  };
+
   const handleManualMove = () => {
-    if (!manualMove.match(/^[A-E][1-5]$/i)) {
+    // Spreadsheet-style labels: A1, B3, ..., AA12 on boards wider than 26
+    const match = manualMove.trim().toUpperCase().match(/^([A-Z]+)([1-9][0-9]*)$/);
+    if (!match) {
       alert("Invalid move format! Use format like A1, B3, etc.");
       return;
     }
-    const col = manualMove[0].toUpperCase().charCodeAt(0) - 65;
-    const row = parseInt(manualMove[1], 10) - 1;
-    axios.post('http://localhost:5000/api/manual-move', { move: [row, col] })
+    const col = [...match[1]].reduce((n, ch) => n * 26 + ch.charCodeAt(0) - 64, 0) - 1;
+    const row = parseInt(match[2], 10) - 1;
+    axios.post('http://localhost:5000/api/manual-move', { move: [row, col], ...sinceBody() }, { headers: sessionHeaders() })
       .then(res => {
-        setGameState(res.data);
-        previewBestMove();
+        const next = applyResponse(gameState, res.data);
+        setGameState(next);
+        previewBestMove(next);
       })
       .catch(console.error);
   };
@@ -83,6 +142,7 @@ function App() {
         visibleGrid={gameState.visible_grid}
         agentPos={gameState.agent_pos}
         boardLabels={gameState.board_labels}
+        origin={viewportOrigin(gameState)}
         bestMove={bestMove}
         percepts={gameState.percepts}
         cellPercepts={gameState.cell_percepts}
@@ -100,6 +160,7 @@ function App() {
 
       <div style={{ margin: '10px 0' }}>
         <button onClick={handleNextMove} disabled={gameState.game_over}>Next Auto Move</button>
+        <button onClick={handleAutoplay} disabled={gameState.game_over}>Autoplay</button>
       </div>
 
       <div>
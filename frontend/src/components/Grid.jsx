@@ -1,14 +1,16 @@
 import React from 'react';
 import './Grid.css';
 
-const Grid = ({ visibleGrid = [], agentPos = [0, 0], boardLabels = { cols: [], rows: [] }, bestMove, percepts = [], cellPercepts = {} }) => {
+const Grid = ({ visibleGrid = [], agentPos = [0, 0], boardLabels = { cols: [], rows: [] }, bestMove, percepts = [], cellPercepts = {}, origin = [0, 0] }) => {
+  // visibleGrid may be a window of a larger board starting at origin (board row, col)
+  const [top, left] = origin;
   const { cols = [], rows = [] } = boardLabels;
 
   console.log("cellPercepts prop:", cellPercepts); // Debugging line
 
   const getCellStyle = (r, c) => {
     const cell = visibleGrid[r][c];
-    const isCurrentCell = agentPos[0] === r && agentPos[1] === c;
+    const isCurrentCell = agentPos[0] === r + top && agentPos[1] === c + left;
 
     if (cell === 'unknown') {
       return { backgroundColor: '#777' };
@@ -22,7 +24,7 @@ const Grid = ({ visibleGrid = [], agentPos = [0, 0], boardLabels = { cols: [], r
     }
 
     // For any visited cell, use persistent percepts if available
-    const persistent = cellPercepts[`${r},${c}`];
+    const persistent = cellPercepts[`${r + top},${c + left}`];
     if (persistent && persistent.includes("breeze")) return { backgroundColor: 'cyan' };
     if (persistent && persistent.includes("stench")) return { backgroundColor: 'lightgreen' };
 
@@ -42,10 +44,10 @@ const Grid = ({ visibleGrid = [], agentPos = [0, 0], boardLabels = { cols: [], r
           <tr key={r}>
             <td className="row-label">{rows[r]}</td>
             {row.map((cell, c) => {
-              const isBestMove = bestMove && bestMove[0] === r && bestMove[1] === c;
+              const isBestMove = bestMove && bestMove[0] === r + top && bestMove[1] === c + left;
               let content = '';
 
-              if (agentPos[0] === r && agentPos[1] === c) {
+              if (agentPos[0] === r + top && agentPos[1] === c + left) {
                 content = '🤖';
               } else if (cell.includes('gold')) {
                 content = '🏆';